@@ -5,6 +5,9 @@ from google.cloud import aiplatform
 from google.cloud.aiplatform.matching_engine.matching_engine_index_datapoint import MatchingEngineIndexDatapoint
 from vertexai.language_models import TextEmbeddingModel
 import time
+# Run from jira-story-generator/ as `python -m components.files.BatchIngestion` so utils.* resolves.
+from utils.chunker import chunk_text
+from utils.upsert_writer import UpsertWriter
 
 # --- CONFIG ---
 PROJECT_ID = "llmdemo-466101"
@@ -18,6 +21,7 @@ SERVICE_ACCOUNT_JSON = "/Users/bhavanakajal/Documents/GitHub/GCPAI-Projects/keys
 aiplatform.init(project=PROJECT_ID, location=REGION, credentials=aiplatform.gapic.helpers.from_service_account_file(SERVICE_ACCOUNT_JSON))
 embed_model = TextEmbeddingModel.from_pretrained(EMBED_MODEL)
 index_endpoint = aiplatform.MatchingEngineIndexEndpoint(index_endpoint_name=f"projects/{PROJECT_ID}/locations/{REGION}/indexEndpoints/{INDEX_ID}")
+writer = UpsertWriter(send=lambda batch: index_endpoint.upsert_datapoints(deployed_index_id=INDEX_ID, datapoints=batch))
 
 def extract_confluence_text(url):
     try:
@@ -28,10 +32,6 @@ def extract_confluence_text(url):
         print(f"Failed to fetch {url}: {e}")
         return ""
 
-def chunk_text(text, max_words=200):
-    words = text.split()
-    return [" ".join(words[i:i + max_words]) for i in range(0, len(words), max_words)]
-
 def embed_and_upload_chunks(chunks):
     embeddings = embed_model.get_embeddings(chunks)
     datapoints = []
@@ -42,8 +42,12 @@ def embed_and_upload_chunks(chunks):
             metadata={"text": chunk}
         )
         datapoints.append(dp)
-    # Upload in batches (if large, you can chunk here)
-    index_endpoint.upsert_datapoints(deployed_index_id=INDEX_ID, datapoints=datapoints)
+    # Upload in size-bounded batches, in parallel, retrying failed batches
+    report = writer.write(datapoints)
+    for b in report.batches:
+        status = "ok" if b.error is None else f"FAILED ({b.error})"
+        print(f"  batch {b.batch}: {b.datapoints} datapoints, {b.bytes} bytes, {b.latency:.2f}s, {status}")
+    return report
 
 def batch_ingest_confluence(url_list):
     for url in url_list:
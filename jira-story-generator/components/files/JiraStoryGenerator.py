@@ -8,15 +8,19 @@ from vertexai.generative_models import GenerativeModel
 from google.oauth2 import service_account
 from google.cloud import aiplatform
 from google.cloud.aiplatform_v1 import IndexServiceClient
-from google.cloud.aiplatform_v1.types import IndexDatapoint, UpsertDatapointsRequest
+from google.cloud.aiplatform_v1.types import IndexDatapoint
 from google.cloud.aiplatform.matching_engine.matching_engine_index_endpoint import MatchingEngineIndexEndpoint
 from bs4 import BeautifulSoup
-from PyPDF2 import PdfReader
 import base64
 import requests
 import uuid
 import requests
 from requests.auth import HTTPBasicAuth
+# Run from jira-story-generator/ with `python -m streamlit run components/files/JiraStoryGenerator.py` so utils.* resolves.
+from utils.chunker import chunk_text
+from utils.embedder import get_embed_model, embed_batched
+from utils.pdf_processor import PDFProcessor
+from utils.upsert_writer import UpsertWriter
 
 # --- LOAD .env ---
 load_dotenv()
@@ -44,6 +48,8 @@ aiplatform.init(project=PROJECT_ID, location=REGION, credentials=creds)
 embed_model = TextEmbeddingModel.from_pretrained(EMBED_MODEL)
 gen_model = GenerativeModel(MODEL)
 
+pdf_processor = PDFProcessor(os.getenv("PDF_CACHE_PATH", "./pdf_cache"), max_cache_bytes=int(os.getenv("PDF_CACHE_MAX_MB", "256")) * 2**20)
+
 index_endpoint = MatchingEngineIndexEndpoint(index_endpoint_name=f"projects/{PROJECT_ID}/locations/{REGION}/indexEndpoints/{ENDPOINT_ID}")
 
 # --- FUNCTIONS ---
@@ -77,49 +83,39 @@ def extract_confluence_text(page_id):
         st.error(f"Failed to fetch Confluence page content: {response.status_code} {response.text}")
         return ""
 
-def chunk_text(text, max_words=200):
-    words = text.split()
-    return [" ".join(words[i:i + max_words]) for i in range(0, len(words), max_words) if words[i:i + max_words]]
-
-
-from vertexai.language_models import TextEmbeddingModel
-
 def embed_and_store_chunks(chunks):
     valid_chunks = [chunk for chunk in chunks if chunk.strip()]
     if not valid_chunks:
         st.warning("⚠️ No valid content to embed.")
         return
 
-    model = TextEmbeddingModel.from_pretrained("text-embedding-005")
+    model = get_embed_model("text-embedding-005")  # loaded once per process
 
+    vectors, failures = embed_batched(model, valid_chunks)
+    for start, e in failures:
+        st.error(f"❌ Failed to embed chunks {start}+: {e}")
+
+    # 🔍 Check for any embedding issues; keep the chunks that did embed correctly
     embeddings = []
-    for chunk in valid_chunks:
-        try:
-            embedding = model.get_embeddings(texts=[chunk])[0]  # ✅ Call one-by-one (batch size = 1)
-            embeddings.append(embedding)
-        except Exception as e:
-            st.error(f"❌ Failed to embed chunk: {e}")
-            return
-
-    # 🔍 Check for any embedding issues
-    invalid_dims = []
-    for i, embed in enumerate(embeddings):
-        if not embed.values or len(embed.values) != EXPECTED_DIM:
-            invalid_dims.append((i, len(embed.values) if embed.values else 0))
-
-    if invalid_dims:
-        for i, dim in invalid_dims:
-            st.error(f"❌ Embedding {i} has dimension {dim}, expected {EXPECTED_DIM}")
+    for i, values in enumerate(vectors):
+        if values is None:
+            continue
+        if len(values) != EXPECTED_DIM:
+            st.error(f"❌ Embedding {i} has dimension {len(values)}, expected {EXPECTED_DIM}")
+            continue
+        embeddings.append(values)
+
+    if not embeddings:
         return
 
     # ✅ All embeddings valid, proceed to upsert
     datapoints = [
         IndexDatapoint(
             datapoint_id=f"chunk-{uuid.uuid4()}",
-            feature_vector=embed.values,
+            feature_vector=values,
             restricts=[]
         )
-        for embed in embeddings
+        for values in embeddings
     ]
 
     client = IndexServiceClient(
@@ -129,16 +125,12 @@ def embed_and_store_chunks(chunks):
     index = client.get_index(name=INDEX_ID)
     print(index)
     INDEX_ID2="projects/885301403345/locations/us-east1/indexes/4784151014313820160"
-    upsert_request = UpsertDatapointsRequest(
-        index=INDEX_ID2,
-        datapoints=datapoints
-    )
-
-    try:
-        client.upsert_datapoints(request=upsert_request)
-        st.success(f"✅ Successfully upserted {len(datapoints)} datapoints.")
-    except Exception as e:
-        st.error(f"🚫 Failed to upsert datapoints: {e}")
+    report = UpsertWriter(client, INDEX_ID2).write(datapoints)
+    if report.upserted:
+        st.success(f"✅ Successfully upserted {report.upserted} datapoints.")
+    for b in report.batches:
+        if b.error:
+            st.error(f"🚫 Failed to upsert batch {b.batch} ({b.datapoints} datapoints): {b.error}")
     
 
 def query_relevant_chunks(query, top_k=3):
@@ -190,10 +182,8 @@ if st.button("🚀 Generate Jira Story"):
 
     # Process PDFs
     for file in uploaded_files or []:
-        if file.type == "application/pdf":
-            pdf_reader = PdfReader(file)
-            full_text = " ".join(page.extract_text() or "" for page in pdf_reader.pages)
-            chunks = chunk_text(full_text)
+        chunks = pdf_processor.extract_text_chunks([file], chunk_text)
+        if chunks:
             embed_and_store_chunks(chunks)
             context_chunks.extend(chunks[:3])
 
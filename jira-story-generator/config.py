@@ -19,6 +19,14 @@ class AppConfig:
         self.JIRA_API_TOKEN = os.getenv("JIRA_API_TOKEN")
         self.JIRA_PROJECT_KEY = os.getenv("JIRA_PROJECT_KEY")
         self.EXPECTED_DIM = 768
+        self.EMBED_MODEL = "text-embedding-005"
+        self.EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "./embed_cache")
+        self.KNOWN_IDS_PATH = os.getenv("KNOWN_IDS_PATH", "./known_datapoint_ids.txt")
+        self.CHUNK_MAX_WORDS = int(os.getenv("CHUNK_MAX_WORDS", "200"))
+        self.CHUNK_OVERLAP_WORDS = int(os.getenv("CHUNK_OVERLAP_WORDS", "0"))
+        self.CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "0")) or None
+        self.PDF_CACHE_PATH = os.getenv("PDF_CACHE_PATH", "./pdf_cache")
+        self.PDF_CACHE_MAX_MB = int(os.getenv("PDF_CACHE_MAX_MB", "256"))
 
         self.credentials = service_account.Credentials.from_service_account_file(self.API_KEY_PATH)
 
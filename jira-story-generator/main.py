@@ -12,15 +12,24 @@ from utils.chunker import Chunker
 
 # Initialize config and dependencies
 config = AppConfig()
-vector_store = VectorStore(config)
+
+# Must be the first Streamlit call; cached factories below draw a spinner.
+st.set_page_config(page_title="AI Story + Embedding Ingestor", layout="wide")
+
+
+@st.cache_resource
+def get_vector_store():
+    # One per process: its EmbeddingCache row index must be shared by all sessions.
+    return VectorStore(config)
+
+
+vector_store = get_vector_store()
 confluence = ConfluenceClient(config)
-pdf_processor = PDFProcessor()
+pdf_processor = PDFProcessor(config.PDF_CACHE_PATH, max_cache_bytes=config.PDF_CACHE_MAX_MB * 2**20)
 jira = JiraClient(config)
-chunker = Chunker()
+chunker = Chunker(config.CHUNK_MAX_WORDS, config.CHUNK_OVERLAP_WORDS, config.CHUNK_MAX_TOKENS)
 gen_model = GenerativeModel("gemini-2.5-flash")
 
-st.set_page_config(page_title="AI Story + Embedding Ingestor", layout="wide")
-
 # --- Tabs ---
 tab1, tab2 = st.tabs(["🧠 Generate Jira Story", "📚 Batch Ingestion"])
 
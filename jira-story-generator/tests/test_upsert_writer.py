@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+from google.api_core import exceptions as gexc
+from google.cloud.aiplatform_v1.types import IndexDatapoint
+
+from utils.upsert_writer import UpsertWriter, datapoint_size
+
+INDEX = "projects/p/locations/us-east1/indexes/1"
+
+
+class FakeIndexServiceClient:
+    """Records every UpsertDatapointsRequest; `fail(ids, call)` returns an exception to raise, or None."""
+
+    def __init__(self, fail=None):
+        self.fail = fail
+        self.requests = []
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def upsert_datapoints(self, request):
+        ids = tuple(dp.datapoint_id for dp in request.datapoints)
+        with self._lock:
+            self.calls[ids] = self.calls.get(ids, 0) + 1
+            call = self.calls[ids]
+            self.requests.append(request)
+        err = self.fail(ids, call) if self.fail else None
+        if err is not None:
+            raise err
+
+
+def points(n, dim=8):
+    return [IndexDatapoint(datapoint_id=f"dp-{i}", feature_vector=[0.5] * dim) for i in range(n)]
+
+
+def writer(client, **kw):
+    return UpsertWriter(client, INDEX, min_backoff=0, max_backoff=0, **kw)
+
+
+def test_batches_by_count():
+    client = FakeIndexServiceClient()
+    report = writer(client, max_batch_points=10).write(points(25))
+    assert sorted(len(r.datapoints) for r in client.requests) == [5, 10, 10]
+    assert all(r.index == INDEX for r in client.requests)
+    assert report.upserted == 25 and report.failed == 0 and report.failed_ids == []
+
+
+def test_batches_by_serialized_size():
+    dps = points(20, dim=64)
+    size = datapoint_size(dps[0])
+    client = FakeIndexServiceClient()
+    limit = 3 * size + size // 2  # room for three datapoints, not four
+    report = writer(client, max_batch_bytes=limit).write(dps)
+    assert [b.datapoints for b in report.batches] == [3, 3, 3, 3, 3, 3, 2]
+    assert all(b.bytes <= limit for b in report.batches)
+    assert sum(len(r.datapoints) for r in client.requests) == 20
+
+
+def test_partial_failure_reports_only_the_failed_batch():
+    def fail(ids, call):
+        return gexc.ServiceUnavailable("index busy") if "dp-12" in ids else None
+
+    client = FakeIndexServiceClient(fail)
+    report = writer(client, max_batch_points=5, max_attempts=3).write(points(20))
+    assert report.upserted == 15 and report.failed == 5
+    assert report.failed_ids == [f"dp-{i}" for i in range(10, 15)]
+    failed = [b for b in report.batches if b.error]
+    assert len(failed) == 1 and failed[0].attempts == 3 and "ServiceUnavailable" in failed[0].error
+
+
+def test_transient_errors_are_retried():
+    def fail(ids, call):
+        return gexc.DeadlineExceeded("slow") if call < 3 else None
+
+    client = FakeIndexServiceClient(fail)
+    report = writer(client, max_batch_points=10, max_attempts=4).write(points(10))
+    assert report.upserted == 10
+    assert report.batches[0].attempts == 3 and report.batches[0].error is None
+
+
+@pytest.mark.parametrize("exc", [gexc.InvalidArgument("bad dim"), gexc.PermissionDenied("no access")])
+def test_non_retriable_errors_fail_on_first_attempt(exc):
+    client = FakeIndexServiceClient(lambda ids, call: exc)
+    report = writer(client, max_attempts=4).write(points(3))
+    assert len(client.requests) == 1
+    assert report.batches[0].attempts == 1 and report.failed_ids == ["dp-0", "dp-1", "dp-2"]
@@ -1,4 +1,115 @@
+import re
+from functools import lru_cache
+from typing import Iterator, List, Optional, Tuple
+
+_WORD = re.compile(r"\S+")
+# Longest prefix ending on a whole word (used with endpos to cut at a char budget).
+_WHOLE_WORDS = re.compile(r"[\s\S]*\S(?=\s)")
+
+
+@lru_cache(maxsize=32)
+def _words(n):
+    """Up to n whitespace-separated words, matched in one regex call."""
+    return re.compile(r"\S+(?:\s+\S+){0,%d}" % (n - 1))
+
+
+@lru_cache(maxsize=32)
+def _skip(n):
+    return re.compile(r"(?:\S+\s+){%d}" % n)
+
+
+def iter_spans(text, max_words=200, overlap=0, max_tokens: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+    """
+    Stream (start, end) offsets of word-aligned chunks of `text` without building a word list.
+
+    A chunk ends at `max_words` words, or earlier once it would exceed `max_tokens`
+    (~4 chars per token). The next chunk starts `overlap` words before the end of the
+    previous one; overlap is capped so every chunk advances by at least one word.
+    """
+    text = text or ""
+    max_words = max(1, max_words)
+    overlap = max(0, min(overlap, max_words - 1))
+    max_chars = max_tokens * 4 if max_tokens else None
+    chunk = _words(max_words)
+    pos = 0
+    while True:
+        m = chunk.search(text, pos)
+        if not m:
+            return
+        start, end = m.span()
+        n = max_words
+        if max_chars and end - start > max_chars:
+            cut = _WHOLE_WORDS.match(text, start, start + max_chars + 1)
+            # A single word longer than the budget is kept whole.
+            end = cut.end() if cut else _WORD.match(text, start).end()
+            n = None  # counted below only if overlap needs it
+        yield start, end
+        if not _WORD.search(text, end):
+            return
+        if not overlap:
+            pos = end
+            continue
+        if n is None:
+            n = len(_WORD.findall(text, start, end))
+        keep = min(overlap, n - 1)
+        pos = _skip(n - keep).match(text, start).end() if keep else end
+
+
+def iter_chunks(text, max_words=200, overlap=0, max_tokens: Optional[int] = None) -> Iterator[str]:
+    for start, end in iter_spans(text, max_words, overlap, max_tokens):
+        yield text[start:end]
+
+
+def chunk_text(text, max_words=200, overlap=0, max_tokens: Optional[int] = None) -> List[str]:
+    return list(iter_chunks(text, max_words, overlap, max_tokens))
+
+
 class Chunker:
-    def chunk_text(self, text, max_words=200):
+    def __init__(self, max_words=200, overlap=0, max_tokens: Optional[int] = None):
+        self.max_words = max_words
+        self.overlap = overlap
+        self.max_tokens = max_tokens
+
+    def spans(self, text) -> Iterator[Tuple[int, int]]:
+        return iter_spans(text, self.max_words, self.overlap, self.max_tokens)
+
+    def iter_chunks(self, text) -> Iterator[str]:
+        return iter_chunks(text, self.max_words, self.overlap, self.max_tokens)
+
+    def chunk_text(self, text, max_words=None):
+        return chunk_text(text, max_words or self.max_words, self.overlap, self.max_tokens)
+
+
+if __name__ == "__main__":
+    # Benchmark against the previous split()/join implementation: python -m utils.chunker
+    import time
+    import tracemalloc
+
+    def legacy_chunk_text(text, max_words=200):
         words = text.split()
         return [" ".join(words[i:i + max_words]) for i in range(0, len(words), max_words) if words[i:i + max_words]]
+
+    para = "As a support agent I want tickets routed by product area so that\nresponses are faster.  " * 40
+    doc = "\n\n".join(para for _ in range(2000))
+    print(f"input: {len(doc) / 1e6:.1f} MB")
+
+    def bench(label, fn):
+        t0 = time.perf_counter()
+        n = fn()
+        dt = time.perf_counter() - t0
+        # Peak memory in a second, traced run (tracing distorts timings).
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{label:<34} {n:>6} chunks  {len(doc) / 1e6 / dt:7.1f} MB/s  peak {peak / 1e6:6.1f} MB")
+
+    bench("legacy split/join", lambda: len(legacy_chunk_text(doc)))
+    bench("chunk_text", lambda: len(chunk_text(doc)))
+    bench("iter_spans (offsets)", lambda: sum(1 for _ in iter_spans(doc)))
+    bench("chunk_text overlap=20", lambda: len(chunk_text(doc, overlap=20)))
+    bench("chunk_text max_tokens=256", lambda: len(chunk_text(doc, max_tokens=256)))
+
+    old = legacy_chunk_text(doc)
+    new = [" ".join(c.split()) for c in chunk_text(doc)]
+    print("same words per chunk as legacy:", old == new)
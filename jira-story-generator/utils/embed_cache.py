@@ -0,0 +1,206 @@
+import hashlib
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, run a single writer process
+    fcntl = None
+
+# Identical copy in story-generator-agentic-rag/src/embed_cache.py: the two apps are deployed
+# from their own directories with separate requirements and share no installable
+# package, so the module is duplicated and kept in sync by hand.
+
+
+class EmbeddingCache:
+    """
+    Content-addressed on-disk embedding cache keyed by (model name, dimension, sha256(text)).
+
+    Layout per (model, dim) under `cache_dir`:
+      <model>-<dim>.f32   memory-mapped float32 matrix, one row per cached vector
+      <model>-<dim>.keys  memory-mapped (rows, 32) uint8 sha256 digests
+      <model>-<dim>.tick  memory-mapped int64 last-use counters (0 = empty row)
+      <model>-<dim>.gen   write counter, bumped by every put
+    The file grows by doubling up to `max_entries` rows; once full the least recently
+    used `evict_fraction` of the rows is freed in one pass.
+
+    Processes sharing `cache_dir` (the app, the ingest and generate CLIs) coordinate through
+    flock on <model>-<dim>.lock: lookups hold it shared, puts exclusively, and both reload
+    the in-memory row index first when another process has written since. Within a process
+    use one instance per `cache_dir` (in Streamlit, an st.cache_resource factory), since
+    instances in one process do not lock against each other.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        model_name: str,
+        dim: int,
+        max_entries: int = 200_000,
+        initial_rows: int = 1024,
+        evict_fraction: float = 0.01,
+    ):
+        self.dim = dim
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.evict_fraction = evict_fraction
+        root = Path(cache_dir)
+        root.mkdir(parents=True, exist_ok=True)
+        stem = f"{re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)}-{dim}"
+        self._paths = {ext: root / f"{stem}.{ext}" for ext in ("f32", "keys", "tick", "gen", "lock")}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self._index: Dict[bytes, int] = {}
+        self._free: List[int] = []
+        self._clock = 0
+        self._seen = -1
+        with self._lock, self._file_lock(shared=False):
+            rows = initial_rows
+            if self._paths["tick"].exists():
+                rows = self._paths["tick"].stat().st_size // 8
+            self._open(min(max(rows, 1), max_entries))
+            self._sync()
+
+    # -------- Storage --------
+    @contextmanager
+    def _file_lock(self, shared: bool) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        with open(self._paths["lock"], "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _sync(self) -> None:
+        """Reload the row index if another process wrote since; call with the file lock held."""
+        if int(self._gen[0]) == self._seen:
+            return
+        rows = self._paths["tick"].stat().st_size // 8
+        if rows > len(self._ticks):
+            self._open(rows)
+        self._index = {self._keys[r].tobytes(): int(r) for r in np.flatnonzero(self._ticks)}
+        # Empty rows, popped from the end so the lowest row is used first.
+        self._free = np.flatnonzero(self._ticks == 0)[::-1].tolist()
+        self._clock = max(self._clock, int(self._ticks.max()) if len(self._ticks) else 0)
+        self._seen = int(self._gen[0])
+
+    def _open(self, rows: int) -> None:
+        specs = {"f32": (np.float32, (rows, self.dim)), "keys": (np.uint8, (rows, 32)), "tick": (np.int64, (rows,))}
+        maps = {}
+        for ext, (dtype, shape) in specs.items():
+            path = self._paths[ext]
+            size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            with open(path, "ab") as fh:
+                if fh.tell() < size:
+                    fh.truncate(size)
+            maps[ext] = np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+        self._vecs, self._keys, self._ticks = maps["f32"], maps["keys"], maps["tick"]
+        with open(self._paths["gen"], "ab") as fh:
+            if fh.tell() < 8:
+                fh.truncate(8)
+        self._gen = np.memmap(self._paths["gen"], dtype=np.int64, mode="r+", shape=(1,))
+
+    def _grow(self) -> bool:
+        rows = len(self._ticks)
+        if rows >= self.max_entries:
+            return False
+        self.flush()
+        new_rows = min(rows * 2, self.max_entries)
+        self._open(new_rows)
+        self._free.extend(range(new_rows - 1, rows - 1, -1))
+        return True
+
+    def _evict(self) -> None:
+        """Free the least recently used `evict_fraction` of the rows in one O(rows) pass."""
+        n = max(1, int(len(self._ticks) * self.evict_fraction))
+        victims = np.argpartition(self._ticks, n - 1)[:n]
+        for row in victims:
+            self._index.pop(self._keys[row].tobytes(), None)
+        # Emptied before reuse, so a crash mid-put never pairs a key with an evicted vector.
+        self._ticks[victims] = 0
+        self._free.extend(sorted((int(r) for r in victims), reverse=True))
+
+    def _free_row(self) -> int:
+        if not self._free and not self._grow():
+            self._evict()
+        return self._free.pop()
+
+    def flush(self) -> None:
+        for m in (self._vecs, self._keys, self._ticks, self._gen):
+            m.flush()
+
+    # -------- API --------
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.sha256(text.encode("utf-8", errors="ignore")).digest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        out: List[Optional[List[float]]] = []
+        with self._lock, self._file_lock(shared=True):
+            self._sync()
+            for t in texts:
+                row = self._index.get(self.key(t))
+                if row is None:
+                    self.misses += 1
+                    out.append(None)
+                else:
+                    self.hits += 1
+                    self._clock += 1
+                    self._ticks[row] = self._clock
+                    out.append(self._vecs[row].tolist())
+        return out
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]) -> None:
+        for v in vectors:
+            if len(v) != self.dim:
+                raise ValueError(f"Expected {self.dim}-d vector, got {len(v)}")
+        with self._lock, self._file_lock(shared=False):
+            self._sync()
+            for t, v in zip(texts, vectors):
+                k = self.key(t)
+                row = self._index.get(k)
+                if row is None:
+                    # Free rows have tick 0: vector, then key, then the tick publishes the row.
+                    row = self._free_row()
+                    self._vecs[row] = v
+                    self._keys[row] = np.frombuffer(k, dtype=np.uint8)
+                    self._index[k] = row
+                else:
+                    self._vecs[row] = v
+                self._clock += 1
+                self._ticks[row] = self._clock
+            self._gen[0] += 1
+            self._seen = int(self._gen[0])
+            self.flush()
+
+    def wrap(self, embed_fn: Callable[[List[str]], List[List[float]]]) -> Callable[[List[str]], List[List[float]]]:
+        """Return an embedder that only calls `embed_fn` for texts not already cached."""
+        def cached_embed(texts: List[str]) -> List[List[float]]:
+            out = self.get_many(texts)
+            missing = list(dict.fromkeys(t for t, v in zip(texts, out) if v is None))
+            if missing:
+                fresh = dict(zip(missing, embed_fn(missing)))
+                self.put_many(missing, [fresh[t] for t in missing])
+                out = [v if v is not None else fresh[t] for t, v in zip(texts, out)]
+            return out
+        return cached_embed
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "entries": len(self._index),
+            "capacity": len(self._ticks),
+        }
@@ -0,0 +1,49 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from tenacity import Retrying, stop_after_attempt, wait_exponential
+from vertexai.language_models import TextEmbeddingModel
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_embed_model(name):
+    """Load each embedding model once per process."""
+    with _models_lock:
+        if name not in _models:
+            _models[name] = TextEmbeddingModel.from_pretrained(name)
+        return _models[name]
+
+
+def _embed_batch(model, batch, max_attempts):
+    for attempt in Retrying(
+        reraise=True,
+        stop=stop_after_attempt(max_attempts),
+        wait=wait_exponential(multiplier=1, min=1, max=8),
+    ):
+        with attempt:
+            return [e.values for e in model.get_embeddings(texts=batch)]
+
+
+def embed_batched(model, texts, batch_size=64, max_workers=4, max_attempts=4) -> Tuple[List[Optional[List[float]]], List[Tuple[int, Exception]]]:
+    """
+    Embed `texts` in concurrent batches, retrying each batch on its own.
+    Returns (vectors, failures): vectors are in input order with None for texts whose
+    batch still failed after retries; failures lists (batch start index, exception).
+    """
+    vectors: List[Optional[List[float]]] = [None] * len(texts)
+    failures = []
+    starts = list(range(0, len(texts), batch_size))
+    if not starts:
+        return vectors, failures
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(starts))) as pool:
+        futures = {start: pool.submit(_embed_batch, model, texts[start:start + batch_size], max_attempts) for start in starts}
+        for start, fut in futures.items():
+            try:
+                for offset, values in enumerate(fut.result()):
+                    vectors[start + offset] = values
+            except Exception as e:
+                failures.append((start, e))
+    return vectors, failures
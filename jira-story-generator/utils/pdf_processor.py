@@ -1,11 +1,128 @@
+import gzip
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
 from PyPDF2 import PdfReader
 
+# Twin of story-generator-agentic-rag/src/pdf_extract.py (PdfExtractor) and its
+# content_cache.trim_dir: the two apps are deployed from their own directories with
+# separate requirements and share no installable package, so the page-range pool, the
+# gzip page cache layout and LRU trimming are duplicated. Fixes to either copy (e.g. the
+# per-thread temp file names) must be made in both.
+# -------- Pool workers (parse the document once, then serve page ranges) --------
+_reader = None
+
+
+def _init_worker(data):
+    global _reader
+    _reader = PdfReader(io.BytesIO(data))
+
+
+def _extract_range(start, end):
+    return [_reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def _trim_cache(root, max_bytes):
+    """Delete least recently used cache files (by mtime) until they fit in 90% of max_bytes."""
+    files = []
+    for p in root.glob("*.pages.jsonl.gz"):
+        try:
+            st = p.stat()
+        except FileNotFoundError:
+            continue
+        files.append((st.st_mtime, st.st_size, p))
+    total = sum(size for _, size, _ in files)
+    if total <= max_bytes:
+        return
+    for _, size, p in sorted(files):
+        if total <= max_bytes * 0.9:
+            break
+        p.unlink(missing_ok=True)
+        total -= size
+
+
 class PDFProcessor:
-    def extract_text_chunks(self, uploaded_files, chunker):
-        chunks = []
+    """
+    Streams PDF pages as (page_number, text) and chunks each page as it arrives.
+    Large PDFs (>= parallel_min_pages) are extracted in page ranges on a process pool;
+    with cache_dir, extracted pages are kept gzip-compressed per sha256 of the file and replayed
+    on re-upload; the least recently used entries are dropped beyond max_cache_bytes.
+    """
+
+    def __init__(self, cache_dir=None, workers=None, parallel_min_pages=64, range_size=16, max_cache_bytes=256 * 2**20):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.parallel_min_pages = parallel_min_pages
+        self.range_size = range_size
+        self.max_cache_bytes = max_cache_bytes
+
+    def _extract(self, data):
+        reader = PdfReader(io.BytesIO(data))
+        n = len(reader.pages)
+        if self.workers < 2 or n < self.parallel_min_pages or multiprocessing.parent_process() is not None:
+            for i, page in enumerate(reader.pages):
+                yield i + 1, page.extract_text() or ""
+            return
+        ranges = [(s, min(n, s + self.range_size)) for s in range(0, n, self.range_size)]
+        # Never fork the Streamlit process: its gRPC/vertexai threads can leave locks held in the child.
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        pool = ProcessPoolExecutor(
+            max_workers=min(self.workers, len(ranges)),
+            mp_context=multiprocessing.get_context(method),
+            initializer=_init_worker,
+            initargs=(data,),
+        )
+        try:
+            futures = [pool.submit(_extract_range, s, e) for s, e in ranges]
+            for (start, _), fut in zip(ranges, futures):
+                for offset, text in enumerate(fut.result()):
+                    yield start + offset + 1, text
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def iter_pages(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        if self.cache_dir is None:
+            yield from self._extract(data)
+            return
+        path = self.cache_dir / f"{digest}.pages.jsonl.gz"
+        try:
+            os.utime(path)  # marks the entry as recently used for trimming
+        except FileNotFoundError:
+            pass
+        else:
+            with gzip.open(path, "rt", encoding="utf-8") as fh:
+                for line in fh:
+                    rec = json.loads(line)
+                    yield rec["page"], rec["text"]
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Unique per process and thread: Streamlit sessions share one process.
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with gzip.open(tmp, "wt", encoding="utf-8") as out:
+                for page, text in self._extract(data):
+                    out.write(json.dumps({"page": page, "text": text}) + "\n")
+                    yield page, text
+            tmp.replace(path)  # only complete extractions are cached
+        finally:
+            tmp.unlink(missing_ok=True)
+        _trim_cache(self.cache_dir, self.max_cache_bytes)
+
+    def iter_page_chunks(self, uploaded_files, chunker):
+        """Yields {"file", "page", "text"} per chunk; chunks never span pages."""
         for file in uploaded_files or []:
-            if file.type == "application/pdf":
-                pdf_reader = PdfReader(file)
-                full_text = " ".join(page.extract_text() or "" for page in pdf_reader.pages)
-                chunks.extend(chunker(full_text))
-        return chunks
\ No newline at end of file
+            if file.type != "application/pdf":
+                continue
+            for page, text in self.iter_pages(file.getvalue()):
+                for chunk in chunker(text):
+                    yield {"file": file.name, "page": page, "text": chunk}
+
+    def extract_text_chunks(self, uploaded_files, chunker):
+        return [c["text"] for c in self.iter_page_chunks(uploaded_files, chunker)]
@@ -0,0 +1,129 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from google.api_core import exceptions as gexc
+from tenacity import Retrying, retry_if_not_exception_type, stop_after_attempt, wait_exponential
+
+# Errors that fail the same way on every attempt; retrying them only delays the report.
+NON_RETRIABLE = (
+    gexc.InvalidArgument,
+    gexc.PermissionDenied,
+    gexc.Unauthenticated,
+    gexc.NotFound,
+    gexc.FailedPrecondition,
+    gexc.AlreadyExists,
+    gexc.OutOfRange,
+    gexc.MethodNotImplemented,
+)
+
+
+@dataclass
+class BatchResult:
+    batch: int
+    datapoints: int
+    bytes: int
+    latency: float = 0.0
+    attempts: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class UpsertReport:
+    batches: List[BatchResult] = field(default_factory=list)
+    failed_ids: List[str] = field(default_factory=list)
+
+    @property
+    def upserted(self):
+        return sum(b.datapoints for b in self.batches if b.error is None)
+
+    @property
+    def failed(self):
+        return sum(b.datapoints for b in self.batches if b.error is not None)
+
+
+def datapoint_size(dp) -> int:
+    """Serialized size of a datapoint; falls back to an estimate for non-proto objects."""
+    try:
+        return type(dp).pb(dp).ByteSize()
+    except Exception:
+        vec = getattr(dp, "feature_vector", None) or []
+        meta = getattr(dp, "metadata", None) or {}
+        return 4 * len(vec) + len(str(getattr(dp, "datapoint_id", ""))) + len(str(meta)) + 16
+
+
+class UpsertWriter:
+    """
+    Splits datapoints into batches bounded by serialized bytes and datapoint count,
+    sends them with bounded parallelism and retries each failed batch with backoff
+    (except NON_RETRIABLE errors such as InvalidArgument, which fail the batch at once).
+
+    Either pass an `IndexServiceClient`-like `client` plus `index_name`
+    (sends `UpsertDatapointsRequest`s), or a `send(batch)` callable.
+    """
+
+    def __init__(self, client=None, index_name: Optional[str] = None, send: Optional[Callable[[list], None]] = None,
+                 max_batch_bytes: int = 8_000_000, max_batch_points: int = 1000, max_workers: int = 4, max_attempts: int = 4,
+                 min_backoff: float = 1, max_backoff: float = 16):
+        if send is None and (client is None or not index_name):
+            raise ValueError("UpsertWriter needs either send= or client= and index_name=")
+        self.client = client
+        self.index_name = index_name
+        self._send = send or self._send_request
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_points = max_batch_points
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+
+    def _send_request(self, batch):
+        from google.cloud.aiplatform_v1.types import UpsertDatapointsRequest
+
+        self.client.upsert_datapoints(request=UpsertDatapointsRequest(index=self.index_name, datapoints=batch))
+
+    def plan(self, datapoints):
+        batches, cur, cur_bytes = [], [], 0
+        for dp in datapoints:
+            size = datapoint_size(dp)
+            if cur and (cur_bytes + size > self.max_batch_bytes or len(cur) >= self.max_batch_points):
+                batches.append((cur, cur_bytes))
+                cur, cur_bytes = [], 0
+            cur.append(dp)
+            cur_bytes += size
+        if cur:
+            batches.append((cur, cur_bytes))
+        return batches
+
+    def _write_batch(self, i, batch, nbytes) -> BatchResult:
+        result = BatchResult(batch=i, datapoints=len(batch), bytes=nbytes)
+        try:
+            for attempt in Retrying(
+                reraise=True,
+                retry=retry_if_not_exception_type(NON_RETRIABLE),
+                stop=stop_after_attempt(self.max_attempts),
+                wait=wait_exponential(multiplier=1, min=self.min_backoff, max=self.max_backoff),
+            ):
+                with attempt:
+                    result.attempts += 1
+                    t0 = time.perf_counter()
+                    self._send(batch)
+                    result.latency = time.perf_counter() - t0
+        except Exception as e:
+            result.error = f"{type(e).__name__}: {e}"
+        return result
+
+    def write(self, datapoints) -> UpsertReport:
+        report = UpsertReport()
+        batches = self.plan(datapoints)
+        if not batches:
+            return report
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as pool:
+            futures = [pool.submit(self._write_batch, i, b, n) for i, (b, n) in enumerate(batches)]
+            for (batch, _), fut in zip(batches, futures):
+                res = fut.result()
+                report.batches.append(res)
+                if res.error:
+                    report.failed_ids.extend(str(getattr(dp, "datapoint_id", "")) for dp in batch)
+        return report
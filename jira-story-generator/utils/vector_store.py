@@ -1,9 +1,12 @@
 import hashlib
 import uuid
+from pathlib import Path
 import streamlit as st
 from google.cloud.aiplatform_v1 import IndexServiceClient
-from google.cloud.aiplatform_v1.types import IndexDatapoint, UpsertDatapointsRequest
-from vertexai.language_models import TextEmbeddingModel
+from google.cloud.aiplatform_v1.types import IndexDatapoint
+from utils.embed_cache import EmbeddingCache
+from utils.embedder import get_embed_model, embed_batched
+from utils.upsert_writer import UpsertWriter
 
 class VectorStore:
     def __init__(self, config):
@@ -13,38 +16,58 @@ class VectorStore:
             credentials=self.config.credentials
         )
         self.index = self.client.get_index(name=self.config.INDEX_ID)
-        self.embed_model = TextEmbeddingModel.from_pretrained("text-embedding-005")
+        self.embed_model = get_embed_model(self.config.EMBED_MODEL)
+        self.cache = EmbeddingCache(self.config.EMBED_CACHE_PATH, self.config.EMBED_MODEL, self.config.EXPECTED_DIM)
+        self.writer = UpsertWriter(self.client, self.config.INDEX_ID)
+        self.known_ids = self._load_known_ids()
+        self._index_endpoint = None
 
     def _hash_text(self, text):
-        return hashlib.sha256(text.encode("utf-8")).hexdigest()
-
-    def _get_existing_ids(self, query_vectors):
-        from  google.cloud.aiplatform.matching_engine import MatchingEngineIndexEndpoint 
-
-        index_endpoint = MatchingEngineIndexEndpoint(
-            index_endpoint_name=f"projects/{self.config.PROJECT_ID}/locations/{self.config.REGION}/indexEndpoints/{self.config.ENDPOINT_ID}"
-        )
+        # Ids hash the whitespace-normalized text: chunks used to be re-joined with single
+        # spaces, and datapoints ingested back then must keep matching their ids.
+        return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+    # -------- Known datapoint IDs (ids are sha256(text), so exact duplicates need no RPC) --------
+    def _load_known_ids(self):
+        path = Path(self.config.KNOWN_IDS_PATH)
+        if not path.exists():
+            return set()
+        return {line.strip() for line in path.read_text(encoding="utf-8").splitlines() if line.strip()}
+
+    def _remember_ids(self, ids):
+        new_ids = [i for i in ids if i not in self.known_ids]
+        if not new_ids:
+            return
+        self.known_ids.update(new_ids)
+        path = Path(self.config.KNOWN_IDS_PATH)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a", encoding="utf-8") as fh:
+            fh.write("\n".join(new_ids) + "\n")
+
+    @property
+    def index_endpoint(self):
+        if self._index_endpoint is None:
+            from google.cloud.aiplatform.matching_engine import MatchingEngineIndexEndpoint
+
+            self._index_endpoint = MatchingEngineIndexEndpoint(
+                index_endpoint_name=f"projects/{self.config.PROJECT_ID}/locations/{self.config.REGION}/indexEndpoints/{self.config.ENDPOINT_ID}"
+            )
+        return self._index_endpoint
 
+    def _get_existing_ids(self, query_vectors, batch_size=64):
         existing_ids = set()
-        for vec in query_vectors:
-            results = index_endpoint.find_neighbors(
-            deployed_index_id=self.config.DEPLOYED_INDEX_ID,
-            queries=[vec],
-            num_neighbors=1,
-            return_full_datapoint=True,
-        )
-            if not results:
-                continue  # No results returned, skip
-
-            first_result = results[0]
-
-            if not hasattr(first_result, "neighbors") or not first_result.neighbors:
-                continue  # No neighbors found, skip
-
-            for neighbor in first_result.neighbors:
-            # adjust the threshold for "distance" depending on similarity metric
-                if hasattr(neighbor, 'distance') and neighbor.distance < 0.001:
-                    existing_ids.add(neighbor.datapoint.datapoint_id)
+        for i in range(0, len(query_vectors), batch_size):
+            results = self.index_endpoint.find_neighbors(
+                deployed_index_id=self.config.DEPLOYED_INDEX_ID,
+                queries=query_vectors[i:i + batch_size],
+                num_neighbors=1,
+                return_full_datapoint=False,
+            )
+            for neighbors in results or []:
+                for neighbor in neighbors or []:
+                    # adjust the threshold for "distance" depending on similarity metric
+                    if getattr(neighbor, "distance", None) is not None and neighbor.distance < 0.001:
+                        existing_ids.add(neighbor.id)
         return existing_ids
 
     def embed_and_store_chunks(self, chunks):
@@ -53,17 +76,41 @@ class VectorStore:
             st.warning("⚠️ No valid content to embed.")
             return
 
-        embeddings = []
+        # Exact-text duplicates (already upserted or repeated in this batch) skip embedding and lookup.
+        unique = {}
         for chunk in valid_chunks:
-            try:
-                embedding = self.embed_model.get_embeddings(texts=[chunk])[0]
-                embeddings.append((chunk, embedding))
-            except Exception as e:
-                st.error(f"❌ Failed to embed chunk: {e}")
-                return
-
-        query_vectors = [e[1].values for e in embeddings]
+            vector_id = self._hash_text(chunk)
+            if vector_id not in self.known_ids and vector_id not in unique:
+                unique[vector_id] = chunk
+        if not unique:
+            st.info("ℹ️ No new datapoints to insert (all are duplicates).")
+            return
+        valid_chunks = list(unique.values())
+
+        # Unchanged chunks come straight from the on-disk cache (no embedding call).
+        cached = self.cache.get_many(valid_chunks)
+        missing = [chunk for chunk, vector in zip(valid_chunks, cached) if vector is None]
+        fresh, failures = embed_batched(self.embed_model, missing)
+        for start, e in failures:
+            st.warning(f"⚠️ Failed to embed chunks {start}+ of {len(missing)}: {e}")
+        fresh_by_chunk = dict(zip(missing, fresh))
+
+        embeddings = []
+        for chunk, vector in zip(valid_chunks, cached):
+            vector = vector if vector is not None else fresh_by_chunk.get(chunk)
+            if vector is not None:
+                embeddings.append((chunk, vector))
+        if not embeddings:
+            st.error("❌ Failed to embed any chunk.")
+            return
+
+        valid_fresh = [(c, v) for c, v in zip(missing, fresh) if v is not None and len(v) == self.config.EXPECTED_DIM]
+        if valid_fresh:
+            self.cache.put_many([c for c, _ in valid_fresh], [v for _, v in valid_fresh])
+
+        query_vectors = [e[1] for e in embeddings]
         existing_ids = self._get_existing_ids(query_vectors)
+        self._remember_ids(existing_ids)
 
         datapoints = []
         for chunk, embed in embeddings:
@@ -71,14 +118,14 @@ class VectorStore:
             if vector_id in existing_ids:
                 continue
 
-            if not embed.values or len(embed.values) != self.config.EXPECTED_DIM:
+            if not embed or len(embed) != self.config.EXPECTED_DIM:
                 st.error(f"❌ Invalid embedding dimension for chunk: '{chunk[:30]}...'")
                 continue
 
             datapoints.append(
                 IndexDatapoint(
                     datapoint_id=vector_id,
-                    feature_vector=embed.values,
+                    feature_vector=embed,
                     restricts=[]
                 )
             )
@@ -87,13 +134,16 @@ class VectorStore:
             st.info("ℹ️ No new datapoints to insert (all are duplicates).")
             return
 
-        upsert_request = UpsertDatapointsRequest(
-            index=self.config.INDEX_ID,
-            datapoints=datapoints
-        )
-
-        try:
-            self.client.upsert_datapoints(request=upsert_request)
-            st.success(f"✅ Successfully upserted {len(datapoints)} new datapoints.")
-        except Exception as e:
-            st.error(f"🚫 Failed to upsert datapoints: {e}")
\ No newline at end of file
+        report = self.writer.write(datapoints)
+        upserted_ids = {dp.datapoint_id for dp in datapoints} - set(report.failed_ids)
+        self._remember_ids(upserted_ids)
+        latencies = [b.latency for b in report.batches if b.error is None]
+        if report.upserted:
+            st.success(
+                f"✅ Successfully upserted {report.upserted} new datapoints in {len(latencies)} batches "
+                f"(max batch latency {max(latencies):.2f}s)."
+            )
+        for b in report.batches:
+            if b.error:
+                st.error(f"🚫 Failed to upsert batch {b.batch} ({b.datapoints} datapoints) after {b.attempts} attempts: {b.error}")
+        return report
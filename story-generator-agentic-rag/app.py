@@ -1,8 +1,8 @@
 import os
 import json
-import tempfile
 import logging
 from pathlib import Path
+from typing import Optional
 
 import streamlit as st
 from dotenv import load_dotenv
@@ -11,10 +11,18 @@ from streamlit_extras.stylable_container import stylable_container
 from streamlit_extras.let_it_rain import rain
 
 from src.llm import LLM
+from src.async_llm import AsyncLLM
+from src.response_cache import ResponseCache
 from src.store import VectorStore
-from src.chunks import chunk_text_chars, chunk_code_lines
-from src.ingest import load_pdf, load_text, fetch_confluence_simple, clone_repo, fetch_confluence_bulk
+from src.embed_cache import EmbeddingCache
+from src.content_cache import ContentCache
+from src.chunks import iter_text_chunks
+from src.ingest import fetch_confluence_simple
+from src.confluence_sync import ConfluenceSync
+from src.repo_sync import ingest_repo_incremental
+from src.pipeline import IngestItem, IngestPipeline
 from src.agent import AgenticRAG, StoryDraft
+from src.rerank import CrossEncoderReranker, DEFAULT_MODEL_PATH
 from src.jira_api import JiraClient
 
 # ---------- Bootstrap ----------
@@ -24,19 +32,89 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(na
 PROJECT = os.getenv("GOOGLE_CLOUD_PROJECT")
 LOCATION = os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
 CHROMA_PATH = os.getenv("CHROMA_PATH", "./chroma_data")
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "./embed_cache")
+REPO_MIRROR_PATH = os.getenv("REPO_MIRROR_PATH", "./repo_mirrors")
+CONFLUENCE_STATE_PATH = os.getenv("CONFLUENCE_STATE_PATH", "./confluence_state")
+PDF_CACHE_PATH = os.getenv("PDF_CACHE_PATH", "./pdf_cache")
+PARSE_CACHE_PATH = os.getenv("PARSE_CACHE_PATH", "./parse_cache")
+PARSE_CACHE_MAX_MB = int(os.getenv("PARSE_CACHE_MAX_MB", "512"))
+RERANK_MODEL_PATH = os.getenv("RERANK_MODEL_PATH", DEFAULT_MODEL_PATH)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./llm_cache/responses.sqlite")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_ANY_TEMPERATURE = os.getenv("LLM_CACHE_ANY_TEMPERATURE", "false").lower() in ("1", "true", "yes")
 
 JIRA_BASE_URL = os.getenv("JIRA_BASE_URL", "").rstrip("/")
 JIRA_EMAIL = os.getenv("JIRA_EMAIL", "")
 JIRA_API_TOKEN = os.getenv("JIRA_API_TOKEN", "")
 JIRA_PROJECT_KEY = os.getenv("JIRA_PROJECT_KEY", "")
 
-# Initialize core services (GCP ONLY)
-llm = LLM(project=PROJECT, location=LOCATION, model_name="gemini-1.5-flash", embed_model="text-embedding-004")
-store = VectorStore(persist_path=CHROMA_PATH, embedder=llm.embed_texts)
-agent = AgenticRAG(llm=llm, store=store)
-jira = JiraClient(JIRA_BASE_URL, JIRA_EMAIL, JIRA_API_TOKEN, JIRA_PROJECT_KEY)
-
+# Must be the first Streamlit call; the cached factories below render a spinner on first run.
 st.set_page_config(page_title="Agentic RAG Jira Generator", layout="wide")
+
+# ---------- Services ----------
+# Built once per process and shared by every session and rerun (Streamlit re-executes this
+# script on each interaction): caches, thread pools and gRPC clients must outlive a rerun.
+
+@st.cache_resource
+def get_response_cache() -> Optional[ResponseCache]:
+    if not LLM_CACHE_PATH:
+        return None
+    return ResponseCache(LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, cache_nonzero_temperature=LLM_CACHE_ANY_TEMPERATURE)
+
+
+@st.cache_resource
+def get_llm() -> LLM:
+    return LLM(project=PROJECT, location=LOCATION, model_name="gemini-1.5-flash", embed_model="text-embedding-004", response_cache=get_response_cache())
+
+
+@st.cache_resource
+def get_embed_cache() -> EmbeddingCache:
+    # One per process: sessions must share the row index over the memmapped files.
+    return EmbeddingCache(EMBED_CACHE_PATH, model_name="text-embedding-004", dim=768)
+
+
+@st.cache_resource
+def get_parse_cache() -> ContentCache:
+    return ContentCache(PARSE_CACHE_PATH, max_bytes=PARSE_CACHE_MAX_MB * 2**20)
+
+
+@st.cache_resource
+def get_store() -> VectorStore:
+    return VectorStore(persist_path=CHROMA_PATH, embedder=get_llm().embed_texts, cache=get_embed_cache())
+
+
+@st.cache_resource
+def get_reranker() -> Optional[CrossEncoderReranker]:
+    return CrossEncoderReranker(RERANK_MODEL_PATH) if Path(RERANK_MODEL_PATH).exists() else None
+
+
+@st.cache_resource
+def get_agent() -> AgenticRAG:
+    llm = get_llm()
+    return AgenticRAG(
+        llm=llm,
+        store=get_store(),
+        reranker=get_reranker(),
+        retrieval_mode=RETRIEVAL_MODE,
+        context_budget=CONTEXT_TOKEN_BUDGET,
+        async_llm=AsyncLLM(llm),
+    )
+
+
+@st.cache_resource
+def get_jira() -> JiraClient:
+    return JiraClient(JIRA_BASE_URL, JIRA_EMAIL, JIRA_API_TOKEN, JIRA_PROJECT_KEY)
+
+
+response_cache = get_response_cache()
+embed_cache = get_embed_cache()
+parse_cache = get_parse_cache()
+store = get_store()
+agent = get_agent()
+jira = get_jira()
+
 st.title("🧠 Agentic RAG Jira Generator (Vertex AI + Chroma + Jira)")
 
 tab1, tab2 = st.tabs(["📥 Batch Ingestion", "📝 Story Generator"])
@@ -52,32 +130,23 @@ with tab1:
             if not files:
                 st.warning("Upload at least one file.")
             else:
-                total = 0
-                for f in files:
-                    tmp = tempfile.NamedTemporaryFile(delete=False)
-                    tmp.write(f.read()); tmp.flush(); tmp.close()
-                    name = f.name.lower()
-
-                    try:
-                        if name.endswith(".pdf"):
-                            text = load_pdf(tmp.name)
-                            chunks = chunk_text_chars(text)
-                            metas = [{"source": f.name, "type": "pdf"} for _ in chunks]
-                            total += store.upsert("knowledge_docs", f"pdf:{f.name}", chunks, metas)
-                        else:
-                            text = load_text(tmp.name)
-                            if any(name.endswith(ext) for ext in [".py",".js",".ts",".java",".go",".cpp",".c",".rb",".cs"]):
-                                chunks = chunk_code_lines(text)
-                                metas = [{"source": f.name, "type": "code"} for _ in chunks]
-                                total += store.upsert("code_base", f"code:{f.name}", chunks, metas)
-                            else:
-                                chunks = chunk_text_chars(text)
-                                metas = [{"source": f.name, "type": "text"} for _ in chunks]
-                                total += store.upsert("knowledge_docs", f"text:{f.name}", chunks, metas)
-                        st.success(f"Ingested {f.name}")
-                    except Exception as e:
-                        st.exception(e)
-                st.info(f"Total chunks inserted: {total}")
+                progress = st.progress(0.0, text="Starting ingest...")
+
+                def _on_progress(stats):
+                    progress.progress(
+                        stats.files_done / max(stats.files_total, 1),
+                        text=f"{stats.files_done}/{stats.files_total} files · {stats.chunks_per_sec:.1f} chunks/s",
+                    )
+
+                items = [IngestItem(name=f.name, data=f.getvalue()) for f in files]
+                # A single upload gains nothing from a parse pool; parsing it on a thread lets a
+                # large PDF be extracted in parallel page ranges instead.
+                result = IngestPipeline(store, use_processes=len(items) > 1, pdf_cache_dir=PDF_CACHE_PATH,
+                                        parse_cache=parse_cache, on_progress=_on_progress).run(items)
+                for name, err in result.errors:
+                    st.error(f"Failed {name}: {err}")
+                st.info(f"Total chunks inserted: {result.chunks_written}")
+                st.json(result.report())
 
     with st.expander("Ingest Confluence page(s)"):
         base = st.text_input("Confluence REST base URL (e.g. https://org.atlassian.net/wiki/rest/api/content)")
@@ -89,27 +158,29 @@ with tab1:
         if st.button("Fetch & ingest page"):
             try:
                 res = fetch_confluence_simple(base, pid, user, token)
-                chunks = chunk_text_chars(res["text"])
-                metas = [{"source": f"confluence:{pid}", "title": res["meta"].get("title")} for _ in chunks]
+                parts = list(iter_text_chunks(res["text"]))
+                chunks = [c.text for c in parts]
+                metas = [{"source": f"confluence:{pid}", "title": res["meta"].get("title"),
+                          "start": c.start, "end": c.end, "headings": c.heading_path} for c in parts]
                 n = store.upsert("knowledge_docs", f"confluence:{pid}", chunks, metas)
                 st.success(f"Inserted {n} chunks from Confluence page {res['meta'].get('title')}")
             except Exception as e:
                 st.exception(e)
 
-        st.subheader("Bulk Ingest (all child pages)")
+        st.subheader("Bulk Sync (whole page tree, incremental)")
         parent_pid = st.text_input("Parent Page ID (for bulk ingest)")
         pattern = st.text_input("Page title filter (e.g. *, Design*, API*)", value="*")
-        if st.button("Fetch & ingest all child pages"):
+        if st.button("Sync all descendant pages"):
             try:
-                pages = fetch_confluence_bulk(base, parent_pid, user, token, pattern=pattern)
-                total = 0
-                for page in pages:
-                    pid = page["meta"]["id"]
-                    chunks = chunk_text_chars(page["text"])
-                    metas = [{"source": f"confluence:{pid}", "title": page["meta"].get("title")} for _ in chunks]
-                    total += store.upsert("knowledge_docs", f"confluence:{pid}", chunks, metas)
-                    st.success(f"Ingested {len(chunks)} chunks from {page['meta'].get('title')}")
-                st.info(f"Total chunks inserted from bulk Confluence ingest: {total}")
+                with st.spinner("Listing page tree and syncing changed pages..."):
+                    stats = ConfluenceSync(base, user, token, CONFLUENCE_STATE_PATH).sync(store, parent_pid, pattern=pattern)
+                st.success(
+                    f"{stats['listed']} pages listed: {stats['added']} added, {stats['changed']} changed, "
+                    f"{stats['removed']} removed, {stats['unchanged']} unchanged (skipped)."
+                )
+                st.info(f"Chunks written: {stats['chunks']}, stale chunks deleted: {stats['stale_chunks_deleted']}")
+                if stats["failed"]:
+                    st.warning(f"{stats['failed']} pages failed; they will be retried on the next sync.")
             except Exception as e:
                 st.exception(e)
 
@@ -119,38 +190,32 @@ with tab1:
         branch   = st.text_input("Branch (optional)")
         if st.button("Clone & ingest repo"):
             try:
-                path = clone_repo(repo_url, branch or None)
-                code_cnt, doc_cnt = 0, 0
-                for p in Path(path).rglob("*"):
-                    if p.is_file():
-                        ext = p.suffix.lower()
-                        if ext in {".png",".jpg",".jpeg",".gif",".pdf",".exe",".class",".zip",".bin"}:
-                            continue
-                        try:
-                            txt = p.read_text(encoding="utf-8", errors="ignore")
-                        except Exception:
-                            continue
-                        if ext in {".py",".java",".js",".ts",".go",".cpp",".c",".rb",".cs"}:
-                            chunks = chunk_code_lines(txt)
-                            metas = [{"source": str(p), "repo": repo_url, "path": str(p.relative_to(path))} for _ in chunks]
-                            code_cnt += store.upsert("code_base", f"repo:{Path(path).name}", chunks, metas)
-                        else:
-                            chunks = chunk_text_chars(txt)
-                            metas = [{"source": str(p), "repo": repo_url} for _ in chunks]
-                            doc_cnt += store.upsert("knowledge_docs", f"repo:{Path(path).name}", chunks, metas)
-                st.success(f"Ingested {code_cnt} code chunks, {doc_cnt} doc chunks.")
+                stats = ingest_repo_incremental(store, repo_url, branch or None, REPO_MIRROR_PATH)
+                st.success(
+                    f"Synced {stats['commit'][:12]}: {stats['added']} added, {stats['changed']} changed, "
+                    f"{stats['removed']} removed files; ingested {stats['code_chunks']} code chunks, "
+                    f"{stats['doc_chunks']} doc chunks."
+                )
             except Exception as e:
                 st.exception(e)
 
     with st.expander("Collections & sanity check"):
         cols = store.list_collections()
         st.write("Collections:", cols)
+        st.write("Embedding cache:", embed_cache.stats())
+        st.write("Parse cache:", parse_cache.stats())
+        if response_cache:
+            st.write("LLM response cache:", response_cache.stats())
+        if st.button("Rebuild lexical (BM25) index"):
+            for c in cols:
+                st.write(f"{c}: indexed {store.rebuild_lexical(c)} chunks")
         q = st.text_input("Sample retrieval query", value="login with OAuth2")
+        mode = st.radio("Retrieval mode", ["hybrid", "dense", "lexical"], horizontal=True)
         if st.button("Test retrieval"):
-            docs = store.query("knowledge_docs", q, k=3)
-            code = store.query("code_base", q, k=3)
-            st.write("Docs:", [d["text"][:300] for d in docs])
-            st.write("Code:", [d["text"][:300] for d in code])
+            res = store.query_many({"knowledge_docs": 3, "code_base": 3}, q, mode=mode)
+            st.write("Docs:", [d["text"][:300] for d in res.get("knowledge_docs", [])])
+            st.write("Code:", [d["text"][:300] for d in res.get("code_base", [])])
+            st.caption(f"Query embedding cache: {store.query_embedder.stats()}")
 
 # ---------- TAB 2: Agentic RAG with Jaw-Dropping UI ----------
 with tab2:
@@ -195,19 +260,42 @@ with tab2:
             generate_btn = st.button("✨ Generate Jira Story", use_container_width=True)
 
     if generate_btn and one_liner.strip():
-        with st.spinner("🤖 Generating with AI..."):
-            try:
-                result = agent.generate_draft(
-                    one_liner=one_liner,
-                    include_code=False,
-                    temperature=0.2,
-                    code_lang=None,
-                )
-                st.session_state["draft"] = StoryDraft(**result["draft"])
-                st.session_state["context"] = result["context"]
-                st.success("Draft created. Review below.")
-            except Exception as e:
-                st.exception(e)
+        # Live preview, filled in field by field while the draft streams.
+        preview = st.empty()
+        live = preview.container()
+        title_ph, desc_ph, ac_ph, sub_ph = live.empty(), live.empty(), live.empty(), live.empty()
+        live_lists = {"acceptance_criteria": (ac_ph, "Acceptance criteria", []), "subtasks": (sub_ph, "Subtasks", [])}
+        title_ph.markdown("🤖 Generating with AI...")
+
+        def render_field(path, value):
+            if path == ("title",):
+                title_ph.markdown(f"### 📝 {value}")
+            elif path == ("description",):
+                desc_ph.markdown(value)
+            elif len(path) == 2 and path[0] in live_lists:
+                ph, label, items = live_lists[path[0]]
+                items.append(str(value))
+                ph.markdown(f"**{label}**\n" + "\n".join(f"- {v}" for v in items))
+
+        try:
+            result = agent.generate_draft(
+                one_liner=one_liner,
+                include_code=False,
+                temperature=0.2,
+                code_lang=None,
+                on_field=render_field,
+            )
+            preview.empty()
+            st.session_state["draft"] = StoryDraft(**result["draft"])
+            st.session_state["context"] = result["context"]
+            st.success("Draft created. Review below.")
+            t = result["timings"]
+            st.caption(
+                f"First output after {t['first_output_s']:.1f}s, total {t['total_s']:.1f}s · "
+                f"context: {result['context'].get('packing')}"
+            )
+        except Exception as e:
+            st.exception(e)
 
     if "draft" in st.session_state:
         colored_header("📑 Generated Jira Story", description="Refined, structured, and ready to push to Jira.", color_name="blue-70")
@@ -0,0 +1,85 @@
+"""
+Batch story generation: turn a JSONL/CSV backlog of one-liners into Jira story drafts.
+
+Examples:
+  python generate_cli.py backlog.csv --output drafts.jsonl --concurrency 8
+  python generate_cli.py ../requests.jsonl --include-code --limit 20
+
+Each row needs a one_liner (or summary/title/text) column; key/id/request_id is used as
+the checkpoint key. Drafts are appended to --output as they finish; re-running with the
+same --output resumes and only regenerates missing or failed items.
+Prints a JSON report (latency percentiles, estimated tokens and cost) on stdout.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from src.llm import LLM
+from src.async_llm import AsyncLLM
+from src.store import VectorStore
+from src.embed_cache import EmbeddingCache
+from src.response_cache import ResponseCache
+from src.rerank import CrossEncoderReranker, DEFAULT_MODEL_PATH
+from src.agent import AgenticRAG
+from src.checkpoint import Checkpoint
+from src.batch import BatchGenerator, load_items, DEFAULT_PRICE_IN, DEFAULT_PRICE_OUT
+
+logger = logging.getLogger("generate_cli")
+
+
+def main(argv=None) -> int:
+    load_dotenv()
+    ap = argparse.ArgumentParser(description="Generate Jira story drafts for a JSONL/CSV file of one-liners.")
+    ap.add_argument("input", help="JSONL or CSV file of one-liners")
+    ap.add_argument("--output", default="./batch_drafts.jsonl", help="JSONL checkpoint/output file")
+    ap.add_argument("--concurrency", type=int, default=8, help="Drafts generated at once")
+    ap.add_argument("--temperature", type=float, default=0.15)
+    ap.add_argument("--include-code", action="store_true", help="Also retrieve code context for every item")
+    ap.add_argument("--code-lang", default=None)
+    ap.add_argument("--limit", type=int, default=None, help="Only process the first N items")
+    ap.add_argument("--price-in", type=float, default=DEFAULT_PRICE_IN, help="USD per 1M prompt tokens")
+    ap.add_argument("--price-out", type=float, default=DEFAULT_PRICE_OUT, help="USD per 1M output tokens")
+    ap.add_argument("--log-level", default="INFO")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level, stream=sys.stderr,
+                        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+
+    cache_path = os.getenv("LLM_CACHE_PATH", "./llm_cache/responses.sqlite")
+    response_cache = ResponseCache(cache_path) if cache_path else None
+    llm = LLM(project=os.getenv("GOOGLE_CLOUD_PROJECT"), location=os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1"),
+              model_name="gemini-1.5-flash", embed_model="text-embedding-004", response_cache=response_cache)
+    cache = EmbeddingCache(os.getenv("EMBED_CACHE_PATH", "./embed_cache"), model_name="text-embedding-004", dim=768)
+    store = VectorStore(persist_path=os.getenv("CHROMA_PATH", "./chroma_data"), embedder=llm.embed_texts, cache=cache)
+    rerank_path = os.getenv("RERANK_MODEL_PATH", DEFAULT_MODEL_PATH)
+    agent = AgenticRAG(
+        llm=llm,
+        store=store,
+        reranker=CrossEncoderReranker(rerank_path) if Path(rerank_path).exists() else None,
+        retrieval_mode=os.getenv("RETRIEVAL_MODE", "hybrid"),
+        context_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000")),
+        async_llm=AsyncLLM(llm, max_concurrency=args.concurrency),
+    )
+
+    items = list(load_items(args.input))[: args.limit]
+    for item in items:
+        item.include_code = item.include_code or args.include_code
+        item.code_lang = item.code_lang or args.code_lang
+
+    def _on_result(rec):
+        logger.info("%s %s in %.1fs", rec["key"], rec["status"], rec["latency_s"])
+
+    gen = BatchGenerator(agent, Checkpoint(args.output), concurrency=args.concurrency, temperature=args.temperature,
+                         price_in=args.price_in, price_out=args.price_out, on_result=_on_result)
+    report = gen.run(items)
+    print(json.dumps(report, indent=2))
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+Headless bulk ingestion into the agentic RAG Chroma store.
+
+Examples:
+  python ingest_cli.py docs/ "specs/**/*.md" --checkpoint ./ingest_checkpoint.jsonl
+  python ingest_cli.py --confluence-parent 123456 --pattern "Design*"
+  python ingest_cli.py --repo https://github.com/org/repo --branch main
+  python ingest_cli.py --compact --purge
+
+Prints a JSON summary (chunks/sec, embed latency percentiles, bytes processed) on stdout.
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Iterator, List
+
+from dotenv import load_dotenv
+
+from src.llm import LLM
+from src.store import VectorStore
+from src.embed_cache import EmbeddingCache
+from src.content_cache import ContentCache
+from src.ingest import BINARY_EXTS
+from src.confluence_sync import ConfluenceSync
+from src.repo_sync import ingest_repo_incremental
+from src.pipeline import IngestItem, IngestPipeline, PipelineStats
+from src.checkpoint import Checkpoint
+from src.metrics import percentiles
+
+logger = logging.getLogger("ingest_cli")
+
+
+def expand_paths(specs: List[str]) -> Iterator[Path]:
+    for spec in specs:
+        p = Path(spec)
+        if p.is_dir():
+            matches = (str(x) for x in p.rglob("*"))
+        elif any(ch in spec for ch in "*?["):
+            matches = glob.iglob(spec, recursive=True)
+        else:
+            matches = [spec]
+        for m in matches:
+            mp = Path(m)
+            ext = mp.suffix.lower()
+            if mp.is_file() and (ext == ".pdf" or ext not in BINARY_EXTS):
+                yield mp
+
+
+def file_items(specs: List[str], checkpoint: Checkpoint) -> Iterator[IngestItem]:
+    seen = set()
+    for p in expand_paths(specs):
+        st = p.stat()
+        # One identity per file however it was reached (relative, absolute, via symlink):
+        # the checkpoint key and the store's source key must both match on later runs.
+        path = str(p.resolve())
+        if path in seen:
+            continue
+        seen.add(path)
+        key, fp = f"file:{path}", f"{st.st_size}:{st.st_mtime_ns}"
+        rec = checkpoint.get(key)
+        if rec and rec.get("fingerprint") == fp:
+            continue
+        yield IngestItem(name=path, path=path, tag={"key": key, "fingerprint": fp})
+
+
+def main(argv=None) -> int:
+    load_dotenv()
+    ap = argparse.ArgumentParser(description="Bulk-ingest files, Confluence trees and git repos into Chroma.")
+    ap.add_argument("paths", nargs="*", help="Files, directories or glob patterns")
+    ap.add_argument("--confluence-parent", action="append", default=[], help="Confluence parent page ID (repeatable)")
+    ap.add_argument("--confluence-base", default=os.getenv("CONFLUENCE_BASE_URL", ""))
+    ap.add_argument("--confluence-user", default=os.getenv("CONFLUENCE_USER", os.getenv("JIRA_EMAIL", "")))
+    ap.add_argument("--confluence-token", default=os.getenv("CONFLUENCE_API_TOKEN", os.getenv("JIRA_API_TOKEN", "")))
+    ap.add_argument("--pattern", default="*", help="Confluence page title filter")
+    ap.add_argument("--repo", action="append", default=[], help="Git repo URL (repeatable)")
+    ap.add_argument("--branch", default=None)
+    ap.add_argument("--checkpoint", default="./ingest_checkpoint.jsonl", help="JSONL checkpoint for resumable runs")
+    ap.add_argument("--parse-workers", type=int, default=os.cpu_count() or 4)
+    ap.add_argument("--embed-concurrency", type=int, default=4)
+    ap.add_argument("--write-batch", type=int, default=512)
+    ap.add_argument("--rebuild-lexical", action="store_true", help="Re-index all stored chunks into the BM25 index")
+    ap.add_argument("--compact", action="store_true", help="Report orphaned chunks (old versions of tracked sources)")
+    ap.add_argument("--purge", action="store_true", help="With --compact, delete the orphaned chunks")
+    ap.add_argument("--log-level", default="INFO")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level, stream=sys.stderr,
+                        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+
+    llm = LLM(project=os.getenv("GOOGLE_CLOUD_PROJECT"), location=os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1"),
+              model_name="gemini-1.5-flash", embed_model="text-embedding-004",
+              embed_concurrency=args.embed_concurrency)
+    cache = EmbeddingCache(os.getenv("EMBED_CACHE_PATH", "./embed_cache"), model_name="text-embedding-004", dim=768)
+    store = VectorStore(persist_path=os.getenv("CHROMA_PATH", "./chroma_data"), embedder=llm.embed_texts, cache=cache)
+    parse_cache = ContentCache(os.getenv("PARSE_CACHE_PATH", "./parse_cache"),
+                               max_bytes=int(os.getenv("PARSE_CACHE_MAX_MB", "512")) * 2**20)
+    checkpoint = Checkpoint(args.checkpoint)
+
+    def _on_doc(doc):
+        if doc.tag:
+            checkpoint.append({**doc.tag, "chunks": len(doc.chunks), "ts": time.time()})
+
+    def _on_progress(stats: PipelineStats):
+        logger.info("progress %s", stats.report())
+
+    def _pipeline() -> IngestPipeline:
+        return IngestPipeline(store, parse_workers=args.parse_workers, embed_concurrency=args.embed_concurrency,
+                              write_batch=args.write_batch, pdf_cache_dir=os.getenv("PDF_CACHE_PATH", "./pdf_cache"),
+                              parse_cache=parse_cache, on_progress=_on_progress, on_doc=_on_doc)
+
+    t0 = time.perf_counter()
+    runs, repos = [], []
+    if args.paths:
+        runs.append(_pipeline().run(file_items(args.paths, checkpoint)))
+    confluence = []
+    if args.confluence_parent:
+        sync = ConfluenceSync(args.confluence_base, args.confluence_user, args.confluence_token,
+                              os.getenv("CONFLUENCE_STATE_PATH", "./confluence_state"))
+        for parent in args.confluence_parent:
+            confluence.append(sync.sync(store, parent, pattern=args.pattern, pipeline=_pipeline()))
+    for url in args.repo:
+        pipe = _pipeline()
+        repos.append(ingest_repo_incremental(store, url, args.branch, os.getenv("REPO_MIRROR_PATH", "./repo_mirrors"), pipe))
+    if args.rebuild_lexical:
+        for name in store.list_collections():
+            logger.info("BM25 index %s: %d chunks", name, store.rebuild_lexical(name))
+    compaction = [store.compact(name, purge=args.purge) for name in store.list_collections()] if args.compact else []
+    elapsed = time.perf_counter() - t0
+
+    chunks = (sum(r.chunks_written for r in runs) + sum(r["code_chunks"] + r["doc_chunks"] for r in repos)
+              + sum(c["chunks"] for c in confluence))
+    summary = {
+        "elapsed_s": round(elapsed, 3),
+        "files": sum(r.files_done for r in runs),
+        "failed": sum(r.files_failed for r in runs) + sum(r["failed"] for r in repos) + sum(c["failed"] for c in confluence),
+        "chunks": chunks,
+        "chunks_per_sec": round(chunks / elapsed, 2) if elapsed else 0.0,
+        "bytes_processed": (sum(r.bytes_read for r in runs) + sum(r["bytes_read"] for r in repos)
+                            + sum(c["bytes_read"] for c in confluence)),
+        "embed_batch_latency_ms": percentiles(llm.embedder.latencies),
+        "embed_doc_latency_ms": percentiles(l for r in runs for l in r.embed_latencies),
+        "embed_cache": cache.stats(),
+        "parse_cache": parse_cache.stats(),
+        "repos": repos,
+        "confluence": confluence,
+        "compaction": compaction,
+        "errors": [e for r in runs for e in r.errors],
+    }
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,19 @@
+import asyncio
 import json
-from typing import Dict, Any, Optional, List
+import logging
+import math
+import time
+from typing import Callable, Dict, Any, Optional, List
 from pydantic import BaseModel, Field, validator
 
 from .llm import LLM
 from .store import VectorStore
+from .rerank import CrossEncoderReranker
+from .context import pack_context
+from .tokens import estimate_tokens
+from .async_llm import AsyncLLM
+
+logger = logging.getLogger(__name__)
 
 SYSTEM_JSON_SPEC = """
 You are an expert Product Owner & Tech Lead. 
@@ -29,35 +39,98 @@ class StoryDraft(BaseModel):
 
 
 class AgenticRAG:
-    def __init__(self, llm: LLM, store: VectorStore):
+    def __init__(
+        self,
+        llm: LLM,
+        store: VectorStore,
+        reranker: Optional[CrossEncoderReranker] = None,
+        rerank_candidates: int = 50,
+        retrieval_mode: str = "dense",
+        doc_collections: Optional[Dict[str, int]] = None,
+        code_collections: Optional[Dict[str, int]] = None,
+        retrieval_timeout: float = 10.0,
+        context_budget: int = 6000,
+        async_llm: Optional[AsyncLLM] = None,
+    ):
         self.llm = llm
         self.store = store
+        self.retrieval_mode = retrieval_mode
+        self.reranker = reranker
+        self.rerank_candidates = rerank_candidates
+        # {collection name: k}; any number of collections can be fanned out to.
+        self.doc_collections = doc_collections or {"knowledge_docs": 6}
+        self.code_collections = code_collections or {"code_base": 4}
+        self.retrieval_timeout = retrieval_timeout
+        # Estimated tokens of retrieved context per prompt.
+        self.context_budget = context_budget
+        self.async_llm = async_llm
+
+    def _rank(self, query: str, docs: List[Dict[str, Any]], k: int) -> List[Dict[str, Any]]:
+        """Keep the top-k of one collection's candidates (cross-encoder order when available)."""
+        if not self.reranker:
+            return docs[:k]
+        try:
+            return self.reranker.rerank(query, docs, k)
+        except Exception as e:
+            logger.warning("Rerank failed, falling back to vector order: %s", e)
+            return docs[:k]
+
+    @staticmethod
+    def _normalize(docs: List[Dict[str, Any]]) -> List[float]:
+        """
+        Map the merged candidates of all collections to [0, 1], lower is better. Scaled once
+        over the union: distances from the same embedding model (and cross-encoder logits)
+        are already comparable across collections, so their order must be kept.
+        """
+        if docs and all("rerank_score" in d for d in docs):
+            return [1.0 / (1.0 + math.exp(d["rerank_score"])) for d in docs]
+        scores = [d["score"] for d in docs]
+        lo, hi = (min(scores), max(scores)) if scores else (0.0, 0.0)
+        return [(s - lo) / (hi - lo) if hi > lo else 0.0 for s in scores]
 
-    def _retrieve(self, query: str, include_code: bool, k_docs: int = 6, k_code: int = 4) -> Dict[str, Any]:
-        ctx = {"docs": [], "code": []}
-        ctx["docs"] = self.store.query("knowledge_docs", query, k=k_docs)
+    def _retrieve(
+        self,
+        query: str,
+        include_code: bool,
+        k_docs: Optional[int] = None,
+        k_code: Optional[int] = None,
+        q_emb: Optional[List[float]] = None,
+    ) -> Dict[str, Any]:
+        targets = {name: (k_docs or k) for name, k in self.doc_collections.items()}
         if include_code:
-            ctx["code"] = self.store.query("code_base", query, k=k_code)
-        return ctx
+            targets.update({name: (k_code or k) for name, k in self.code_collections.items()})
+        fetch = {name: max(k, self.rerank_candidates) if self.reranker else k for name, k in targets.items()}
+        results = self.store.query_many(fetch, query, mode=self.retrieval_mode, timeout=self.retrieval_timeout, q_emb=q_emb)
+
+        ranked = []
+        for name, docs in results.items():
+            kind = "code" if name in self.code_collections else "docs"
+            ranked += [{**d, "collection": name, "kind": kind} for d in self._rank(query, docs, targets[name])]
+        for d, norm in zip(ranked, self._normalize(ranked)):
+            d["norm_score"] = norm
+        ranked.sort(key=lambda d: d["norm_score"])
+
+        return {
+            "docs": [d for d in ranked if d["kind"] == "docs"],
+            "code": [d for d in ranked if d["kind"] == "code"],
+            "ranked": ranked,
+            "missing": [name for name in targets if name not in results],
+        }
 
     def _context_to_text(self, ctx: Dict[str, Any]) -> str:
-        parts = []
-        for d in ctx.get("docs", []):
-            parts.append(f"[DOC] {d['meta']} :: {d['text']}")
-        for c in ctx.get("code", []):
-            parts.append(f"[CODE] {c['meta']} ::\n{c['text']}")
-        return "\n\n".join(parts)
+        """Pack the ranked context into the token budget; records the packing stats on ctx."""
+        items = ctx.get("ranked")
+        if items is None:
+            items = [{**d, "kind": "docs"} for d in ctx.get("docs", [])] + [{**c, "kind": "code"} for c in ctx.get("code", [])]
+        packed = pack_context(items, budget=self.context_budget)
+        ctx["packed_tokens"] = packed.tokens
+        ctx["packing"] = packed.stats()
+        logger.info("Packed context: %s", packed.stats())
+        return packed.text
 
-    def generate_draft(
-        self, 
-        one_liner: str, 
-        include_code: bool, 
-        temperature: float = 0.15, 
-        code_lang: Optional[str] = None
-    ) -> Dict[str, Any]:
-        ctx = self._retrieve(one_liner, include_code)
-        ctx_text = self._context_to_text(ctx)
-        instruction = f"""
+    @staticmethod
+    def _draft_instruction(one_liner: str, ctx_text: str, code_lang: Optional[str]) -> str:
+        return f"""
 Using the following user request and retrieved context, generate a Jira story JSON.
 
 USER REQUEST:
@@ -74,9 +147,69 @@ RULES:
 {"- Include a small code example in " + code_lang + " within the description." if code_lang else ""}
         """.strip()
 
-        raw = self.llm.generate_json(system=SYSTEM_JSON_SPEC, instruction=instruction, temperature=temperature)
+    def generate_draft(
+        self, 
+        one_liner: str, 
+        include_code: bool, 
+        temperature: float = 0.15, 
+        code_lang: Optional[str] = None,
+        on_field: Optional[Callable[[tuple, Any], None]] = None,
+    ) -> Dict[str, Any]:
+        """
+        With `on_field`, the draft is streamed and `on_field(path, value)` fires as each
+        field (title, description, every acceptance criterion/subtask) completes.
+        """
+        t0 = time.perf_counter()
+        ctx = self._retrieve(one_liner, include_code)
+        ctx_text = self._context_to_text(ctx)
+        instruction = self._draft_instruction(one_liner, ctx_text, code_lang)
+
+        timings = {"retrieve_s": time.perf_counter() - t0}
+        if on_field:
+            def _on_field(path: tuple, value: Any) -> None:
+                timings.setdefault("first_output_s", time.perf_counter() - t0)
+                on_field(path, value)
+
+            raw = self.llm.generate_json_stream(
+                system=SYSTEM_JSON_SPEC, instruction=instruction, temperature=temperature, on_field=_on_field
+            )
+        else:
+            raw = self.llm.generate_json(system=SYSTEM_JSON_SPEC, instruction=instruction, temperature=temperature)
         draft = StoryDraft(**raw)  # validate
-        return {"draft": draft.model_dump(), "context": ctx}
+        timings["total_s"] = time.perf_counter() - t0
+        timings.setdefault("first_output_s", timings["total_s"])
+        logger.info(
+            "Draft generated: retrieve %.2fs, first output %.2fs, total %.2fs",
+            timings["retrieve_s"], timings["first_output_s"], timings["total_s"],
+        )
+        return {"draft": draft.model_dump(), "context": ctx, "timings": timings}
+
+    async def agenerate_draft(
+        self,
+        one_liner: str,
+        include_code: bool,
+        temperature: float = 0.15,
+        code_lang: Optional[str] = None,
+        q_emb: Optional[List[float]] = None,
+    ) -> Dict[str, Any]:
+        """
+        generate_draft for asyncio callers; many drafts can run concurrently on one loop.
+        Pass a precomputed query embedding as `q_emb` to skip the per-query embed call.
+        """
+        if self.async_llm is None:
+            raise RuntimeError("AgenticRAG was created without async_llm")
+        t0 = time.perf_counter()
+        ctx = await asyncio.to_thread(self._retrieve, one_liner, include_code, q_emb=q_emb)
+        instruction = self._draft_instruction(one_liner, self._context_to_text(ctx), code_lang)
+        timings = {"retrieve_s": time.perf_counter() - t0}
+        raw = await self.async_llm.generate_json(system=SYSTEM_JSON_SPEC, instruction=instruction, temperature=temperature)
+        draft = StoryDraft(**raw)
+        timings["total_s"] = timings["first_output_s"] = time.perf_counter() - t0
+        usage = {
+            "prompt_tokens": estimate_tokens(self.llm._json_prompt(SYSTEM_JSON_SPEC, instruction)),
+            "output_tokens": estimate_tokens(json.dumps(raw, ensure_ascii=False)),
+        }
+        return {"draft": draft.model_dump(), "context": ctx, "timings": timings, "usage": usage}
 
     def apply_feedback(
         self, 
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Any, Awaitable, Dict, List, Optional, Tuple, TypeVar
+
+from tenacity import AsyncRetrying, stop_after_attempt, wait_exponential
+
+from .llm import LLM
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Per event loop: {model name: (semaphore, limit)}. Shared by every AsyncLLM in the process
+# so the concurrency cap holds per model, not per caller; the first caller's limit wins.
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Tuple[asyncio.Semaphore, int]]]" = weakref.WeakKeyDictionary()
+_semaphores_lock = threading.Lock()
+_limit_warned = set()
+
+
+def install_uvloop() -> bool:
+    """Use uvloop as the asyncio event loop policy when it is installed (not on Windows)."""
+    try:
+        import uvloop
+    except ImportError:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+
+def run(coro: Awaitable[T]) -> T:
+    """asyncio.run on uvloop where available."""
+    install_uvloop()
+    return asyncio.run(coro)
+
+
+def _semaphore(model: str, limit: int) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    with _semaphores_lock:
+        per_loop = _semaphores.setdefault(loop, {})
+        if model not in per_loop:
+            per_loop[model] = (asyncio.Semaphore(limit), limit)
+        sem, cap = per_loop[model]
+        if cap != limit and (model, limit) not in _limit_warned:
+            _limit_warned.add((model, limit))
+            logger.warning("Concurrency limit %d for %s ignored: already capped at %d by an earlier caller", limit, model, cap)
+        return sem
+
+
+class AsyncLLM:
+    """
+    asyncio facade over an `LLM`: reuses its Vertex model clients (one gRPC channel
+    each), safety settings, prompt helpers and response cache, and adds a per-model
+    concurrency cap and per-call timeouts so many requests can run from one event loop.
+    """
+
+    def __init__(self, llm: LLM, max_concurrency: int = 8, embed_concurrency: int = 4, timeout: float = 60.0, max_attempts: int = 4):
+        self.llm = llm
+        self.max_concurrency = max_concurrency
+        self.embed_concurrency = embed_concurrency
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+
+    def _retrying(self) -> AsyncRetrying:
+        return AsyncRetrying(
+            reraise=True,
+            stop=stop_after_attempt(self.max_attempts),
+            wait=wait_exponential(multiplier=1, min=1, max=8),
+        )
+
+    async def _call(self, model: str, limit: int, make: Any, timeout: Optional[float]) -> Any:
+        sem = _semaphore(model, limit)
+        async for attempt in self._retrying():
+            with attempt:
+                async with sem:
+                    return await asyncio.wait_for(make(), timeout or self.timeout)
+
+    # -------- Generation --------
+    async def generate(self, prompt: str, temperature: float = 0.15, max_output_tokens: int = 2048, timeout: Optional[float] = None) -> str:
+        llm = self.llm
+        resp = await self._call(
+            llm.model_name,
+            self.max_concurrency,
+            lambda: llm.model.generate_content_async(
+                prompt,
+                generation_config={"temperature": temperature, "max_output_tokens": max_output_tokens},
+                safety_settings=llm.safety,
+            ),
+            timeout,
+        )
+        return resp.text or ""
+
+    async def generate_json(
+        self,
+        system: str,
+        instruction: str,
+        temperature: float = 0.15,
+        max_output_tokens: int = 2048,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        llm = self.llm
+        prompt = llm._json_prompt(system, instruction)
+        key = llm._cache_key(prompt, temperature, max_output_tokens)
+        if key:
+            cached = llm.response_cache.get(key)
+            if cached is not None:
+                return cached
+        out = llm._parse_json(await self.generate(prompt, temperature, max_output_tokens, timeout))
+        if key:
+            llm.response_cache.put(key, llm.model_name, out)
+        return out
+
+    # -------- Embeddings --------
+    async def embed(self, texts: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+        """Same batching as LLM.embed_texts, with batches awaited concurrently; order preserved."""
+        if not texts:
+            return []
+        engine, model = self.llm.embedder, self.llm.embed_model
+
+        async def _batch(idx: List[int]) -> List[List[float]]:
+            batch = [texts[i] for i in idx]
+            if engine.limiter:
+                await asyncio.to_thread(engine.limiter.acquire)
+            resp = await self._call(
+                self.llm.embed_model_name,
+                self.embed_concurrency,
+                lambda: model.get_embeddings_async(batch),
+                timeout,
+            )
+            return [r.values for r in resp]
+
+        batches = engine.plan_batches(texts)
+        results = await asyncio.gather(*(_batch(idx) for idx in batches))
+        out: List[Optional[List[float]]] = [None] * len(texts)
+        for idx, vecs in zip(batches, results):
+            for i, v in zip(idx, vecs):
+                out[i] = v
+        return out
@@ -0,0 +1,162 @@
+import asyncio
+import csv
+import json
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .agent import AgenticRAG
+from .async_llm import run
+from .checkpoint import Checkpoint
+from .metrics import percentiles
+
+logger = logging.getLogger(__name__)
+
+# Estimated USD per 1M tokens (gemini-1.5-flash, prompts <= 128k); override per run.
+DEFAULT_PRICE_IN = 0.075
+DEFAULT_PRICE_OUT = 0.30
+
+_TEXT_FIELDS = ("one_liner", "summary", "title", "text")
+_DETAIL_FIELDS = ("body", "description", "details")
+_KEY_FIELDS = ("key", "id", "request_id")
+
+
+@dataclass
+class BatchItem:
+    key: str
+    one_liner: str
+    include_code: bool = False
+    code_lang: Optional[str] = None
+
+
+def _to_item(row: Dict[str, Any], n: int) -> Optional[BatchItem]:
+    text = next((str(row[f]).strip() for f in _TEXT_FIELDS if row.get(f)), "")
+    if not text:
+        return None
+    details = next((str(row[f]).strip() for f in _DETAIL_FIELDS if row.get(f)), "")
+    if details:
+        text = f"{text}\n\n{details}"
+    key = next((str(row[f]) for f in _KEY_FIELDS if row.get(f)), f"row-{n}")
+    include_code = str(row.get("include_code", "")).lower() in ("1", "true", "yes")
+    return BatchItem(key=key, one_liner=text, include_code=include_code, code_lang=row.get("code_lang") or None)
+
+
+def load_items(path: str) -> Iterator[BatchItem]:
+    """
+    Read one-liners from JSONL or CSV. Recognised columns: one_liner/summary/title/text,
+    optional body/description/details (appended), key/id/request_id, include_code, code_lang.
+    """
+    p = Path(path)
+    with p.open(encoding="utf-8", newline="") as fh:
+        if p.suffix.lower() == ".csv":
+            rows = csv.DictReader(fh)
+        else:
+            rows = (json.loads(line) for line in fh if line.strip())
+        for n, row in enumerate(rows, 1):
+            item = _to_item(row, n)
+            if item is None:
+                logger.warning("Skipping row %d of %s: no one-liner", n, path)
+                continue
+            yield item
+
+
+class BatchGenerator:
+    """
+    Turns many one-liners into story drafts:
+      1. embeds every pending query in one batched embedding call,
+      2. retrieves and generates up to `concurrency` drafts at a time on one event loop,
+      3. appends each result to a JSONL checkpoint, so a re-run skips items already done.
+    """
+
+    def __init__(
+        self,
+        agent: AgenticRAG,
+        checkpoint: Checkpoint,
+        concurrency: int = 8,
+        temperature: float = 0.15,
+        price_in: float = DEFAULT_PRICE_IN,
+        price_out: float = DEFAULT_PRICE_OUT,
+        on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        if agent.async_llm is None:
+            raise ValueError("BatchGenerator needs an AgenticRAG created with async_llm")
+        self.agent = agent
+        self.checkpoint = checkpoint
+        self.concurrency = concurrency
+        self.temperature = temperature
+        self.price_in = price_in
+        self.price_out = price_out
+        self.on_result = on_result
+
+    def _cost(self, usage: Dict[str, int]) -> float:
+        return (usage["prompt_tokens"] * self.price_in + usage["output_tokens"] * self.price_out) / 1e6
+
+    async def _one(self, item: BatchItem, q_emb: Optional[List[float]], sem: asyncio.Semaphore) -> Dict[str, Any]:
+        async with sem:
+            t0 = time.perf_counter()
+            record: Dict[str, Any] = {"key": item.key, "one_liner": item.one_liner}
+            try:
+                res = await self.agent.agenerate_draft(
+                    item.one_liner, item.include_code, temperature=self.temperature, code_lang=item.code_lang, q_emb=q_emb
+                )
+                record.update(
+                    status="ok",
+                    draft=res["draft"],
+                    sources=[d.get("id") for d in res["context"].get("ranked", [])],
+                    missing=res["context"].get("missing", []),
+                    packed_tokens=res["context"].get("packed_tokens"),
+                    retrieve_s=round(res["timings"]["retrieve_s"], 3),
+                    **res["usage"],
+                    cost_usd=round(self._cost(res["usage"]), 6),
+                )
+            except Exception as e:
+                logger.warning("Draft %s failed: %s", item.key, e)
+                record.update(status="error", error=f"{type(e).__name__}: {e}")
+            record["latency_s"] = round(time.perf_counter() - t0, 3)
+            record["ts"] = time.time()
+            self.checkpoint.append(record)
+            if self.on_result:
+                self.on_result(record)
+            return record
+
+    async def arun(self, items: List[BatchItem]) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        done = [i for i in items if (self.checkpoint.get(i.key) or {}).get("status") == "ok"]
+        todo = [i for i in items if (self.checkpoint.get(i.key) or {}).get("status") != "ok"]
+        logger.info("Batch: %d items, %d already done, %d to generate", len(items), len(done), len(todo))
+
+        vectors: List[Optional[List[float]]] = [None] * len(todo)
+        if todo and self.agent.retrieval_mode != "lexical":
+            try:
+                vectors = await self.agent.async_llm.embed([i.one_liner for i in todo])
+            except Exception as e:
+                # Retrieval falls back to embedding each query on its own.
+                logger.warning("Batched query embedding failed: %s", e)
+        embed_s = time.perf_counter() - t0
+
+        sem = asyncio.Semaphore(self.concurrency)
+        records = await asyncio.gather(*(self._one(i, v, sem) for i, v in zip(todo, vectors)))
+        return self.report(records, skipped=len(done), embed_s=embed_s, elapsed=time.perf_counter() - t0)
+
+    def run(self, items: List[BatchItem]) -> Dict[str, Any]:
+        return run(self.arun(items))
+
+    @staticmethod
+    def report(records: List[Dict[str, Any]], skipped: int, embed_s: float, elapsed: float) -> Dict[str, Any]:
+        ok = [r for r in records if r["status"] == "ok"]
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "query_embed_s": round(embed_s, 3),
+            "generated": len(ok),
+            "failed": len(records) - len(ok),
+            "skipped": skipped,
+            "drafts_per_min": round(60 * len(ok) / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": percentiles(r["latency_s"] for r in records),
+            "retrieve_ms": percentiles(r["retrieve_s"] for r in ok),
+            "prompt_tokens": sum(r["prompt_tokens"] for r in ok),
+            "output_tokens": sum(r["output_tokens"] for r in ok),
+            "est_cost_usd": round(sum(r["cost_usd"] for r in ok), 4),
+            "errors": [{"key": r["key"], "error": r["error"]} for r in records if r["status"] != "ok"],
+        }
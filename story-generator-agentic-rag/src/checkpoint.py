@@ -0,0 +1,39 @@
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+
+class Checkpoint:
+    """
+    Append-only JSONL checkpoint. Each record has a unique "key"; the last record
+    for a key wins on load, so re-running a job resumes where it stopped.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self.records: Dict[str, Dict[str, Any]] = {}
+        if self.path and self.path.exists():
+            with self.path.open(encoding="utf-8") as fh:
+                for line in fh:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # torn write from a crashed run
+                    self.records[rec["key"]] = rec
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.records.get(key)
+
+    def append(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self.records[record["key"]] = record
+            if not self.path:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as fh:
+                fh.write(json.dumps(record, ensure_ascii=False) + "\n")
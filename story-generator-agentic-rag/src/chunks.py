@@ -1,7 +1,15 @@
-from typing import List
+import ast
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from .tokens import estimate_tokens
 
 def chunk_text_chars(text: str, max_chars: int = 1500, overlap: int = 200) -> List[str]:
     text = text or ""
+    # Overlap beyond half a chunk would make the step (and chunk count) degenerate.
+    overlap = min(overlap, max_chars // 2)
     chunks = []
     i, n = 0, len(text)
     while i < n:
@@ -14,8 +22,519 @@ def chunk_code_lines(text: str, max_lines: int = 180, overlap: int = 20) -> List
     lines = (text or "").splitlines()
     chunks = []
     i, n = 0, len(lines)
+    # overlap >= max_lines used to stall the loop forever.
+    step = max(1, max_lines - max(0, overlap))
     while i < n:
         part = lines[i:i + max_lines]
         chunks.append("\n".join(part))
-        i += max_lines - overlap
+        i += step
     return chunks
+
+
+# -------- Structure-aware text chunking --------
+_PARA_SEP = re.compile(r"\n[ \t]*\n\s*")
+_MD_HEADING = re.compile(r"^(#{1,6})[ \t]+(.+?)[ \t#]*$")
+_HTML_HEADING = re.compile(r"^\s*<h([1-6])[^>]*>(.*?)</h\1>\s*$", re.I | re.S)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=\S)")
+_TAG = re.compile(r"<[^>]+>")
+
+
+@dataclass
+class Chunk:
+    """A chunk of a larger text; `start`/`end` are UTF-8 byte offsets into the original."""
+    text: str
+    start: int
+    end: int
+    headings: List[str] = field(default_factory=list)
+
+    @property
+    def heading_path(self) -> str:
+        return " > ".join(self.headings)
+
+
+@dataclass
+class _Unit:
+    start: int  # char offsets
+    end: int
+    tokens: int
+
+
+class _ByteOffsets:
+    """
+    Char -> UTF-8 byte offsets via a cursor that moves from the last position asked for,
+    so each call costs the distance moved: forward over a chunk, back over its overlap.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.ascii = text.isascii()
+        self.char = 0
+        self.byte = 0
+
+    def __call__(self, pos: int) -> int:
+        if self.ascii:
+            return pos
+        if pos < self.char:
+            self.byte -= len(self.text[pos:self.char].encode("utf-8"))
+        else:
+            self.byte += len(self.text[self.char:pos].encode("utf-8"))
+        self.char = pos
+        return self.byte
+
+
+def _heading(block: str) -> Optional[Tuple[int, str]]:
+    if "\n" in block.strip():
+        return None
+    m = _MD_HEADING.match(block.strip())
+    if m:
+        return len(m.group(1)), m.group(2).strip()
+    m = _HTML_HEADING.match(block)
+    if m:
+        return int(m.group(1)), _TAG.sub("", m.group(2)).strip()
+    return None
+
+
+def _blocks(text: str) -> Iterator[Tuple[int, int]]:
+    """Paragraph spans (char offsets); heading lines are split off into their own blocks."""
+    pos = 0
+    for m in _PARA_SEP.finditer(text):
+        yield from _split_headings(text, pos, m.start())
+        pos = m.end()
+    if pos < len(text):
+        yield from _split_headings(text, pos, len(text))
+
+
+def _split_headings(text: str, start: int, end: int) -> Iterator[Tuple[int, int]]:
+    block = text[start:end]
+    if "#" not in block and "<h" not in block.lower():
+        yield start, end
+        return
+    pos = start
+    for line in block.splitlines(keepends=True):
+        line_end = pos + len(line)
+        if _heading(line.rstrip("\n")):
+            if pos > start:
+                yield start, pos
+            yield pos, line_end
+            start = line_end
+        pos = line_end
+    if start < end:
+        yield start, end
+
+
+def _units(text: str, start: int, end: int, max_tokens: int) -> Iterator[_Unit]:
+    """Split an oversized block at sentence boundaries, hard-splitting runaway sentences."""
+    pos = start
+    for m in _SENTENCE_END.finditer(text, start, end):
+        yield from _hard_split(pos, m.start(), max_tokens)
+        pos = m.end()
+    if pos < end:
+        yield from _hard_split(pos, end, max_tokens)
+
+
+def _hard_split(start: int, end: int, max_tokens: int) -> Iterator[_Unit]:
+    step = max_tokens * 4  # estimate_tokens is ~4 chars per token
+    for s in range(start, end, step):
+        e = min(end, s + step)
+        yield _Unit(s, e, (e - s + 3) // 4)
+
+
+def iter_text_chunks(
+    text: str,
+    target_tokens: int = 350,
+    max_tokens: int = 512,
+    overlap_tokens: int = 50,
+) -> Iterator[Chunk]:
+    """
+    Lazily chunk prose/Markdown/HTML-ish text on heading, paragraph and sentence boundaries.
+
+    Paragraphs are packed up to `target_tokens` (estimate_tokens), never past `max_tokens`;
+    paragraphs larger than that are split into sentences. Headings start a new chunk and
+    are tracked as a heading path. Consecutive chunks in a section share up to
+    `overlap_tokens` of trailing sentences/paragraphs; the overlap is capped at half the
+    target so every chunk advances by at least target/2 tokens, which bounds the chunk
+    count at about n / (target - overlap).
+    """
+    text = text or ""
+    overlap_tokens = min(overlap_tokens, target_tokens // 2)
+    max_tokens = max(max_tokens, target_tokens)
+    to_bytes = _ByteOffsets(text)
+    headings: List[Tuple[int, str]] = []
+    cur: List[_Unit] = []
+    cur_tokens = 0
+    fresh = 0  # tokens in `cur` not carried over from the previous chunk
+
+    def _emit() -> Chunk:
+        s, e = cur[0].start, cur[-1].end
+        return Chunk(text[s:e], to_bytes(s), to_bytes(e), [h for _, h in headings])
+
+    def _carry() -> List[_Unit]:
+        kept, total = [], 0
+        for u in reversed(cur):
+            if total + u.tokens > overlap_tokens:
+                break
+            kept.insert(0, u)
+            total += u.tokens
+        return kept
+
+    for start, end in _blocks(text):
+        head = _heading(text[start:end].rstrip("\n"))
+        if head:
+            if fresh:
+                yield _emit()
+            cur, cur_tokens, fresh = [], 0, 0
+            level, title = head
+            headings = [(lv, h) for lv, h in headings if lv < level] + [(level, title)]
+            continue
+        # Trim surrounding whitespace so offsets point at content.
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start == end:
+            continue
+        n = estimate_tokens(text[start:end])
+        units = [_Unit(start, end, n)] if n <= max_tokens else list(_units(text, start, end, max_tokens))
+        for u in units:
+            if fresh and cur_tokens + u.tokens > target_tokens:
+                yield _emit()
+                cur = _carry()
+                cur_tokens = sum(x.tokens for x in cur)
+                fresh = 0
+                if cur_tokens + u.tokens > max_tokens:
+                    cur, cur_tokens = [], 0
+            cur.append(u)
+            cur_tokens += u.tokens
+            fresh += u.tokens
+    if fresh:
+        yield _emit()
+
+
+# -------- Syntax-aware code chunking --------
+_BRACE_EXTS = {".java", ".js", ".ts", ".go", ".cpp", ".c", ".cs"}
+_REGEX_EXTS = {".js", ".ts"}
+# A "/" after one of these starts a JS regex literal rather than a division.
+_REGEX_AFTER = set("=(,:[!&|?;{}")
+_DECL = re.compile(
+    r"\b(?:class|interface|struct|enum|record|namespace|impl|type|func|function|fn|const|let|var)\s+"
+    r"(?:\([^)]*\)\s*)?([A-Za-z_$][\w$]*)"
+)
+_CALL = re.compile(r"([A-Za-z_$~][\w$:.~]*)\s*\(")
+_INDENT_DEF = re.compile(r"^([ \t]*)(?:async[ \t]+def|def|class|module)[ \t]+([\w.?!]+)")
+_LEADING = ("//", "/*", "*", "@", "#")
+_NOT_SYMBOLS = {"if", "for", "while", "switch", "catch", "else", "do", "try", "return", "new", "sizeof"}
+
+
+@dataclass
+class CodeChunk:
+    """A run of whole functions/classes (or top-level code); lines are 1-based and inclusive."""
+    text: str
+    start_line: int
+    end_line: int
+    symbols: List[str] = field(default_factory=list)
+
+    @property
+    def symbol(self) -> str:
+        return ", ".join(self.symbols)
+
+
+@dataclass
+class _Block:
+    start: int  # 0-based line index, inclusive
+    end: int  # exclusive
+    symbol: Optional[str]
+    children: Callable[[], List["_Block"]] = lambda: []
+
+
+@dataclass
+class _Span:
+    start: int
+    end: int
+    symbol: Optional[str]
+    tokens: int
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip())
+
+
+def _with_leading(lines: List[str], start: int, lo: int) -> int:
+    """Pull decorators, annotations and doc comments directly above a block into it."""
+    while start > lo and lines[start - 1].strip().startswith(_LEADING):
+        start -= 1
+    return start
+
+
+def _py_blocks(nodes: List[ast.stmt], prefix: str = "") -> List[_Block]:
+    out = []
+    for node in nodes:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            start = min([d.lineno for d in node.decorator_list] + [node.lineno]) - 1
+            name = prefix + node.name
+            children = (lambda n=node, p=name: _py_blocks(n.body, p + ".")) if isinstance(node, ast.ClassDef) else (lambda: [])
+            out.append(_Block(start, node.end_lineno, name, children))
+    return out
+
+
+def _regex_end(line: str, i: int) -> Optional[int]:
+    """Index of the "/" closing a regex literal opened at line[i], or None if it isn't one."""
+    if line[:i].rstrip()[-1:] not in _REGEX_AFTER:
+        return None
+    j, n, in_class = i + 1, len(line), False
+    while j < n:
+        ch = line[j]
+        if ch == "\\":
+            j += 1
+        elif ch == "[":
+            in_class = True
+        elif ch == "]":
+            in_class = False
+        elif ch == "/" and not in_class:
+            return j if j > i + 1 else None
+        j += 1
+    return None
+
+
+def _brace_depths(lines: List[str], regex: bool = False) -> List[int]:
+    """
+    depths[i] = brace depth at the start of line i (strings and comments ignored, and with
+    `regex` JS regex literals such as /\\{/g too).
+    """
+    depths, depth, in_comment = [], 0, False
+    for line in lines:
+        depths.append(depth)
+        i, n, quote = 0, len(line), None
+        while i < n:
+            ch = line[i]
+            if in_comment:
+                if line.startswith("*/", i):
+                    in_comment = False
+                    i += 1
+            elif quote:
+                if ch == "\\":
+                    i += 1
+                elif ch == quote:
+                    quote = None
+            elif line.startswith("//", i):
+                break
+            elif line.startswith("/*", i):
+                in_comment = True
+                i += 1
+            elif ch in "\"'`":
+                quote = ch
+            elif ch == "/" and regex:
+                i = _regex_end(line, i) or i
+            elif ch == "{":
+                depth += 1
+            elif ch == "}":
+                depth = max(0, depth - 1)
+            i += 1
+    depths.append(depth)
+    return depths
+
+
+def _brace_symbol(header: str, prefix: str) -> Optional[str]:
+    m = _DECL.search(header)
+    name = m.group(1) if m else None
+    if name is None:
+        calls = [c for c in _CALL.findall(header) if c not in _NOT_SYMBOLS]
+        name = calls[0] if calls else None
+    return prefix + name if name else None
+
+
+def _brace_blocks(lines: List[str], depths: List[int], lo: int, hi: int, depth: int, prefix: str = "") -> List[_Block]:
+    out, i = [], lo
+    while i < hi:
+        if depths[i] != depth:
+            i += 1
+            continue
+        if depths[i + 1] <= depth:
+            # A definition opened and closed on one line: function f() { return 1; }
+            name = _brace_symbol(lines[i].split("{", 1)[0], prefix) if "{" in lines[i] else None
+            if name and name != prefix:
+                out.append(_Block(i, i + 1, name))
+            i += 1
+            continue
+        j = i + 1
+        while j < hi and depths[j] > depth:
+            j += 1
+        start = i
+        # Allman style: the declaration sits on the line(s) above the opening brace.
+        if lines[i].strip().startswith("{") and i > lo and lines[i - 1].strip():
+            start = i - 1
+        header = " ".join(l.strip() for l in lines[start:i + 1])
+        header = header.split("{", 1)[0]
+        name = _brace_symbol(header, prefix)
+        if name is None or name == prefix:
+            name = prefix.rstrip(".") or None
+        children = lambda a=i + 1, b=j, n=name: _brace_blocks(lines, depths, a, b, depth + 1, (n + ".") if n else "")
+        out.append(_Block(start, j, name, children))
+        i = j
+    return out
+
+
+def _indent_blocks(lines: List[str], lo: int, hi: int, prefix: str = "") -> List[_Block]:
+    """def/class/module blocks by indentation (Ruby, or Python that does not parse)."""
+    defs = []
+    for i in range(lo, hi):
+        m = _INDENT_DEF.match(lines[i])
+        if m:
+            defs.append((i, len(m.group(1).expandtabs()), m.group(2)))
+    if not defs:
+        return []
+    level = min(d[1] for d in defs)
+    out, after = [], lo
+    for i, ind, name in defs:
+        if ind != level or i < after:
+            continue
+        j = i + 1
+        while j < hi and (not lines[j].strip() or _indent(lines[j].expandtabs()) > level):
+            j += 1
+        if j < hi and _indent(lines[j].expandtabs()) == level and lines[j].strip().split(" ", 1)[0] == "end":
+            j += 1
+        while j - 1 > i and not lines[j - 1].strip():
+            j -= 1
+        full = prefix + name
+        out.append(_Block(i, j, full, lambda a=i + 1, b=j, p=full: _indent_blocks(lines, a, b, p + ".")))
+        after = j
+    return out
+
+
+def iter_code_chunks(
+    text: str,
+    path: str = "",
+    target_tokens: int = 1100,
+    max_tokens: int = 1500,
+) -> Iterator[CodeChunk]:
+    """
+    Chunk source code on function/class boundaries.
+
+    Python is parsed with `ast`; brace languages (Java, JS/TS, Go, C/C++, C#) use a
+    brace-depth scanner; Ruby and anything else fall back to indentation. Adjacent
+    top-level definitions (and the module-level code between them) are packed together
+    up to `target_tokens`. A definition over `max_tokens` is split into its members
+    (class -> methods); one with no members is cut at line boundaries. Token counts are
+    ~4-chars-per-token estimates and code tokenizes denser than that, so the default max
+    leaves headroom under text-embedding-004's 2048-token input limit.
+    """
+    lines = (text or "").splitlines()
+    if not lines:
+        return
+    max_tokens = max(max_tokens, target_tokens)
+    cum = [0]
+    for line in lines:
+        cum.append(cum[-1] + len(line) + 1)
+
+    def _tokens(a: int, b: int) -> int:
+        return (cum[b] - cum[a] + 2) // 4
+
+    def _split(a: int, b: int, symbol: Optional[str]) -> List[_Span]:
+        out, start = [], a
+        for i in range(a, b):
+            if i > start and _tokens(start, i + 1) > max_tokens:
+                out.append(_Span(start, i, symbol, _tokens(start, i)))
+                start = i
+        out.append(_Span(start, b, symbol, _tokens(start, b)))
+        return out
+
+    def _gap(a: int, b: int, symbol: Optional[str]) -> List[_Span]:
+        if not any(lines[i].strip() for i in range(a, b)):
+            return []
+        return _split(a, b, symbol)
+
+    def _cover(blocks: List[_Block], lo: int, hi: int, parent: Optional[str]) -> List[_Span]:
+        spans, pos = [], lo
+        for b in blocks:
+            if b.start < pos:
+                continue
+            start = _with_leading(lines, b.start, pos)
+            spans.extend(_gap(pos, start, parent))
+            size = _tokens(start, b.end)
+            if size <= max_tokens:
+                spans.append(_Span(start, b.end, b.symbol, size))
+            else:
+                kids = b.children()
+                spans.extend(_cover(kids, start, b.end, b.symbol) if kids else _split(start, b.end, b.symbol))
+            pos = b.end
+        spans.extend(_gap(pos, hi, parent))
+        return spans
+
+    ext = os.path.splitext(path)[1].lower()
+    blocks = None
+    if ext == ".py":
+        try:
+            blocks = _py_blocks(ast.parse(text).body)
+        except (SyntaxError, ValueError):
+            blocks = None
+    if blocks is None:
+        if ext in _BRACE_EXTS:
+            blocks = _brace_blocks(lines, _brace_depths(lines, ext in _REGEX_EXTS), 0, len(lines), 0)
+        else:
+            blocks = _indent_blocks(lines, 0, len(lines))
+
+    def _emit(run: List[_Span]) -> CodeChunk:
+        symbols = []
+        for s in run:
+            if s.symbol and s.symbol not in symbols:
+                symbols.append(s.symbol)
+        a, b = run[0].start, run[-1].end
+        return CodeChunk("\n".join(lines[a:b]), a + 1, b, symbols)
+
+    run: List[_Span] = []
+    for span in _cover(blocks, 0, len(lines), None):
+        if run:
+            have, total = _tokens(run[0].start, run[-1].end), _tokens(run[0].start, span.end)
+            # A small run (imports, a short helper) rides along with the next big definition.
+            if total > max_tokens or (total > target_tokens and have >= target_tokens // 4):
+                yield _emit(run)
+                run = []
+        run.append(span)
+    if run:
+        yield _emit(run)
+
+
+if __name__ == "__main__":
+    # Benchmark on multi-MB Markdown and on this package's own sources: python -m src.chunks
+    import glob
+    import time
+
+    para = "The login service validates OAuth2 tokens. Refresh tokens rotate on use! Does revocation propagate? " * 4
+    sections = []
+    for i in range(6000):
+        sections.append(f"## Section {i}\n\n" + "\n\n".join(para for _ in range(3)))
+    doc = "# Design\n\n" + "\n\n".join(sections)
+    print(f"input: {len(doc) / 1e6:.1f} MB")
+
+    t0 = time.perf_counter()
+    old = chunk_text_chars(doc)
+    dt_old = time.perf_counter() - t0
+    print(f"chunk_text_chars:  {len(old):>6} chunks  {len(doc) / 1e6 / dt_old:8.1f} MB/s")
+
+    t0 = time.perf_counter()
+    new = list(iter_text_chunks(doc))
+    dt_new = time.perf_counter() - t0
+    print(f"iter_text_chunks:  {len(new):>6} chunks  {len(doc) / 1e6 / dt_new:8.1f} MB/s  "
+          f"(avg {sum(estimate_tokens(c.text) for c in new) / len(new):.0f} tokens, e.g. {new[5].heading_path!r})")
+
+    # Non-ASCII text with overlap: byte offsets must not re-encode the prefix per chunk.
+    para_ru = "Сервис входа проверяет токены OAuth2. Токены обновления меняются при каждом использовании! "
+    doc_ru = "\n\n".join(f"## Раздел {i}\n\n" + "\n\n".join(para_ru for _ in range(40)) for i in range(600))
+    t0 = time.perf_counter()
+    ru = list(iter_text_chunks(doc_ru))
+    dt_ru = time.perf_counter() - t0
+    raw = doc_ru.encode("utf-8")
+    assert all(raw[c.start:c.end].decode("utf-8") == c.text for c in ru)
+    print(f"iter_text_chunks, non-ASCII {len(raw) / 1e6:.1f} MB:  {len(ru):>6} chunks  {len(raw) / 1e6 / dt_ru:8.1f} MB/s")
+
+    t0 = time.perf_counter()
+    degenerate = sum(1 for _ in iter_text_chunks(doc[:200_000], target_tokens=20, overlap_tokens=500))
+    print(f"small target / large overlap on 200 KB: {degenerate} chunks in {time.perf_counter() - t0:.2f}s")
+
+    files = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py")))
+    sources = [(p, open(p, encoding="utf-8").read()) for p in files]
+    old_code = [c for _, t in sources for c in chunk_code_lines(t)]
+    t0 = time.perf_counter()
+    new_code = [c for p, t in sources for c in iter_code_chunks(t, p)]
+    dt_code = time.perf_counter() - t0
+    print(f"code, {len(files)} files: chunk_code_lines {len(old_code)} chunks / {sum(estimate_tokens(c) for c in old_code)} tokens, "
+          f"iter_code_chunks {len(new_code)} chunks / {sum(estimate_tokens(c.text) for c in new_code)} tokens in {dt_code * 1000:.0f} ms")
@@ -0,0 +1,176 @@
+import fnmatch
+import json
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .ingest import confluence_page_text
+from .pipeline import IngestItem, IngestPipeline
+from .store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "knowledge_docs"
+
+
+class ConfluenceSync:
+    """
+    Incremental sync of a Confluence page tree into the store.
+
+    The whole tree under `root_id` is listed with version numbers only (paginated,
+    no bodies). Pages whose version matches the manifest are skipped; changed pages
+    are fetched concurrently over a pooled session and re-chunked; the pipeline replaces
+    each page's chunk set, so only chunk ids that no longer exist in the new version are
+    deleted. Pages that disappeared from the tree lose all their chunks; pages that merely
+    don't match this run's title `pattern` are left as they are, so syncs of one tree with
+    different filters can share the manifest.
+    Manifest: {"pages": {id: {"version", "title"}}}.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        username: str,
+        token: str,
+        state_root: str,
+        max_workers: int = 8,
+        page_size: int = 100,
+        timeout: float = 30.0,
+    ):
+        self.base = base_url.rstrip("/")
+        self.state_root = Path(state_root)
+        self.max_workers = max_workers
+        self.page_size = page_size
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.auth = (username, token)
+        self.session.headers.update({"Accept": "application/json"})
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    # -------- Manifest --------
+    def _manifest_path(self, root_id: str) -> Path:
+        host = re.sub(r"[^A-Za-z0-9_.-]+", "_", re.sub(r"^\w+://", "", self.base))
+        return self.state_root / f"confluence_{host}_{root_id}.manifest.json"
+
+    def load_manifest(self, root_id: str) -> Dict[str, Any]:
+        p = self._manifest_path(root_id)
+        if p.exists():
+            return json.loads(p.read_text(encoding="utf-8"))
+        return {"base_url": self.base, "root": root_id, "pages": {}}
+
+    def save_manifest(self, root_id: str, manifest: Dict[str, Any]) -> None:
+        p = self._manifest_path(root_id)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_suffix(".tmp")
+        tmp.write_text(json.dumps(manifest, indent=1), encoding="utf-8")
+        tmp.replace(p)
+
+    # -------- REST --------
+    def _get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        r = self.session.get(f"{self.base}{path}", params=params, timeout=self.timeout)
+        r.raise_for_status()
+        return r.json()
+
+    def list_tree(self, root_id: str, include_root: bool = False) -> Iterator[Dict[str, Any]]:
+        """Every descendant page (all levels) as {"id", "title", "version"}; no bodies."""
+        if include_root:
+            data = self._get(f"/rest/api/content/{root_id}", {"expand": "version"})
+            yield {"id": str(data["id"]), "title": data.get("title", ""), "version": data.get("version", {}).get("number")}
+        start = 0
+        while True:
+            data = self._get(
+                f"/rest/api/content/{root_id}/descendant/page",
+                {"expand": "version", "limit": self.page_size, "start": start},
+            )
+            results = data.get("results", [])
+            for page in results:
+                yield {"id": str(page["id"]), "title": page.get("title", ""), "version": page.get("version", {}).get("number")}
+            if not results or "next" not in data.get("_links", {}):
+                return
+            start += len(results)
+
+    def fetch_page(self, page_id: str) -> Dict[str, Any]:
+        data = self._get(f"/rest/api/content/{page_id}", {"expand": "body.storage,version"})
+        return confluence_page_text(data, page_id)
+
+    # -------- Sync --------
+    def sync(
+        self,
+        store: VectorStore,
+        root_id: str,
+        pattern: str = "*",
+        include_root: bool = False,
+        pipeline: Optional[IngestPipeline] = None,
+    ) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        manifest = self.load_manifest(root_id)
+        old: Dict[str, Dict[str, Any]] = manifest.get("pages", {})
+        listing = list(self.list_tree(root_id, include_root))
+        tree = {p["id"]: p for p in listing if fnmatch.fnmatch(p["title"], pattern)}
+
+        # Removal is decided on the unfiltered tree (the root counts as present even when it
+        # isn't listed): a narrower filter must not delete pages ingested by a wider one.
+        present = {p["id"] for p in listing} | {str(root_id)}
+        removed = [pid for pid in old if pid not in present]
+        changed = [pid for pid, p in tree.items() if old.get(pid, {}).get("version") != p["version"]]
+        stats = {"root": root_id, "listed": len(tree), "filtered_out": len(listing) - len(tree),
+                 "unchanged": len(tree) - len(changed),
+                 "added": sum(1 for pid in changed if pid not in old), "changed": sum(1 for pid in changed if pid in old),
+                 "removed": len(removed), "chunks": 0, "stale_chunks_deleted": 0, "failed": 0, "bytes_read": 0}
+
+        try:
+            for pid in removed:
+                store.remove_source(COLLECTION, f"confluence:{pid}")
+                old.pop(pid, None)
+
+            pages, failed = {}, set()
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                futures = {pool.submit(self.fetch_page, pid): pid for pid in changed}
+                for fut in as_completed(futures):
+                    pid = futures[fut]
+                    try:
+                        pages[pid] = fut.result()
+                    except Exception as e:
+                        logger.warning("Fetching Confluence page %s failed: %s", pid, e)
+                        failed.add(pid)
+
+            items = []
+            for pid, page in pages.items():
+                key = f"confluence:{pid}"
+                items.append(IngestItem(
+                    name=key,
+                    data=page["text"].encode("utf-8"),
+                    source_key=key,
+                    meta={"source": key, "title": page["meta"].get("title")},
+                ))
+
+            def _count(doc):
+                stats["chunks"] += len(doc.chunks)
+
+            pipeline = pipeline or IngestPipeline(store)
+            pipeline.on_doc = _count
+            result = pipeline.run(items)
+            failed |= {name.split(":", 1)[1] for name, _ in result.errors}
+            stats["stale_chunks_deleted"] = result.chunks_deleted
+            stats["bytes_read"] = result.bytes_read
+
+            for pid in pages:
+                if pid not in failed:
+                    old[pid] = {"version": tree[pid]["version"], "title": tree[pid]["title"]}
+            stats["failed"] = len(failed)
+        finally:
+            manifest["pages"] = old
+            manifest["synced_at"] = time.time()
+            self.save_manifest(root_id, manifest)
+
+        stats["elapsed_s"] = round(time.perf_counter() - t0, 3)
+        logger.info("Confluence %s/%s: %s", self.base, root_id, stats)
+        return stats
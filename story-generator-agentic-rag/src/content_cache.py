@@ -0,0 +1,100 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def trim_dir(root: Path, max_bytes: int, pattern: str = "*.gz") -> int:
+    """Delete least recently used files (by mtime) under `root` until they fit in 90% of max_bytes."""
+    files = []
+    for p in root.rglob(pattern):
+        try:
+            st = p.stat()
+        except FileNotFoundError:
+            continue
+        files.append((st.st_mtime, st.st_size, p))
+    total = sum(size for _, size, _ in files)
+    if total <= max_bytes:
+        return total
+    files.sort()
+    target = int(max_bytes * 0.9)
+    for _, size, p in files:
+        if total <= target:
+            break
+        p.unlink(missing_ok=True)
+        total -= size
+    return total
+
+
+class ContentCache:
+    """
+    Content-addressed store of parsed documents (chunk texts + their metadata), one
+    gzip-compressed JSON file per key. Keys combine the SHA-256 of the file bytes with a
+    fingerprint of everything else that shapes the output (extension, chunker settings), so
+    an identical re-upload is served without parsing or chunking. Reads refresh the file's
+    mtime; once the directory exceeds `max_bytes` the least recently used entries are dropped.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 512 * 2**20):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._bytes = trim_dir(self.root, max_bytes)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(data: bytes, fingerprint: str) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        return f"{digest}-{hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()[:16]}"
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json.gz"
+
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as fh:
+                value = json.load(fh)
+            os.utime(path)
+        except (FileNotFoundError, OSError, ValueError):
+            # Missing, evicted mid-read or corrupt: treat as a miss.
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as fh:
+                json.dump(value, fh, separators=(",", ":"))
+            size = tmp.stat().st_size
+            tmp.replace(path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        with self._lock:
+            self._bytes += size
+            if self._bytes > self.max_bytes:
+                self._bytes = trim_dir(self.root, self.max_bytes)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "bytes": self._bytes,
+            }
@@ -0,0 +1,183 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from .tokens import estimate_tokens
+
+# Shortest shared edge treated as chunk overlap. iter_text_chunks repeats up to 50 tokens of
+# whole trailing sentences or paragraphs (about 200 chars) at the start of the next chunk.
+MIN_OVERLAP = 32
+
+
+@dataclass
+class Segment:
+    kind: str
+    source: str
+    label: str
+    text: str
+    score: float
+    ids: List[str] = field(default_factory=list)
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+
+@dataclass
+class PackedContext:
+    text: str
+    tokens: int
+    budget: int
+    candidates: int
+    segments: int
+    dropped: int
+    truncated: int
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "packed_tokens": self.tokens,
+            "budget": self.budget,
+            "candidates": self.candidates,
+            "segments": self.segments,
+            "dropped": self.dropped,
+            "truncated": self.truncated,
+        }
+
+
+def _overlap(a: str, b: str, min_len: int = MIN_OVERLAP) -> int:
+    """Length of the longest suffix of `a` that is a prefix of `b` (0 if shorter than min_len)."""
+    if len(a) < min_len or len(b) < min_len:
+        return 0
+    probe = b[:min_len]
+    pos = a.find(probe)
+    while pos != -1:
+        tail = len(a) - pos
+        if tail <= len(b) and a[pos:] == b[:tail]:
+            return tail
+        pos = a.find(probe, pos + 1)
+    return 0
+
+
+def _label(d: Dict[str, Any]) -> str:
+    meta = d.get("meta") or {}
+    if meta.get("path") and meta.get("start_line"):
+        return f"{meta['path']}:{meta['start_line']}-{meta['end_line']}"
+    for key in ("title", "path", "source"):
+        if meta.get(key):
+            return str(meta[key])
+    return d.get("id", "")
+
+
+def _merge_source(kind: str, source: str, docs: List[Dict[str, Any]]) -> List[Segment]:
+    """Drop contained duplicates and stitch chunks whose edges overlap into contiguous segments."""
+    kept: List[Dict[str, Any]] = []
+    for d in docs:
+        text = d["text"] or ""
+        if not text.strip() or any(text in k["text"] for k in kept):
+            continue
+        kept = [k for k in kept if k["text"] not in text]
+        kept.append(d)
+
+    # successor[i] = (j, overlap) when kept[i]'s tail is kept[j]'s head
+    successor: Dict[int, tuple] = {}
+    has_pred = set()
+    for i, a in enumerate(kept):
+        best = None
+        for j, b in enumerate(kept):
+            if i == j or j in has_pred:
+                continue
+            ov = _overlap(a["text"], b["text"])
+            if ov and (best is None or ov > best[1]):
+                best = (j, ov)
+        if best:
+            successor[i] = best
+            has_pred.add(best[0])
+
+    segments = []
+    seen = set()
+    for head in range(len(kept)):
+        if head in has_pred or head in seen:
+            continue
+        i, text, ids, score = head, kept[head]["text"], [], float("inf")
+        while i is not None and i not in seen:
+            seen.add(i)
+            ids.append(kept[i].get("id", ""))
+            score = min(score, kept[i].get("norm_score", kept[i].get("score", 0.0)))
+            nxt = successor.get(i)
+            if nxt and nxt[0] not in seen:
+                text += kept[nxt[0]]["text"][nxt[1]:]
+                i = nxt[0]
+            else:
+                i = None
+        segments.append(Segment(kind, source, _label(kept[head]), text, score, ids))
+    # Cycles (only possible with repeated text) have no head; keep them as-is.
+    for i, d in enumerate(kept):
+        if i not in seen:
+            segments.append(Segment(kind, source, _label(d), d["text"], d.get("norm_score", d.get("score", 0.0)), [d.get("id", "")]))
+    return segments
+
+
+def _format(seg: Segment, text: Optional[str] = None) -> str:
+    body = seg.text if text is None else text
+    if seg.kind == "code":
+        return f"[CODE] {seg.label}\n{body}"
+    return f"[DOC] {seg.label} :: {body}"
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Cut `text` to roughly `max_tokens`, preferring a line or sentence boundary."""
+    limit = max(max_tokens * 4 - 2, 0)
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    for sep in ("\n", ". "):
+        at = cut.rfind(sep)
+        if at > limit // 2:
+            return cut[:at + len(sep)].rstrip() + " …"
+    return cut.rstrip() + " …"
+
+
+def pack_context(ranked: List[Dict[str, Any]], budget: int = 6000, min_fragment: int = 64) -> PackedContext:
+    """
+    Pack retrieved chunks into at most `budget` estimated tokens.
+
+    `ranked` is best-first (as returned by AgenticRAG._retrieve). Chunks from the same
+    source are de-duplicated and overlapping neighbours stitched together; the resulting
+    segments are added by relevance until the budget is full. A segment that does not fit
+    is truncated when at least `min_fragment` tokens remain, otherwise dropped.
+    """
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for d in ranked:
+        meta = d.get("meta") or {}
+        key = (d.get("kind", "docs"), meta.get("source") or d.get("collection") or "")
+        groups.setdefault(key, []).append(d)
+
+    segments = [s for (kind, source), docs in groups.items() for s in _merge_source(kind, source, docs)]
+    segments.sort(key=lambda s: s.score)
+
+    parts, used, dropped, truncated = [], 0, 0, 0
+    for seg in segments:
+        sep = 1 if parts else 0  # blank line between entries
+        cost = estimate_tokens(_format(seg)) + sep
+        if used + cost <= budget:
+            parts.append(_format(seg))
+            used += cost
+            continue
+        room = budget - used - sep - estimate_tokens(_format(seg, ""))
+        if room >= min_fragment:
+            part = _format(seg, _truncate(seg.text, room))
+            parts.append(part)
+            used += estimate_tokens(part) + sep
+            truncated += 1
+        else:
+            dropped += 1
+
+    text = "\n\n".join(parts)
+    return PackedContext(
+        text=text,
+        tokens=estimate_tokens(text),
+        budget=budget,
+        candidates=len(ranked),
+        segments=len(parts),
+        dropped=dropped,
+        truncated=truncated,
+    )
@@ -0,0 +1,172 @@
+import hashlib
+import logging
+import random
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from tenacity import Retrying, stop_after_attempt, wait_exponential
+
+from .tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+EmbedBackend = Callable[[List[str]], List[List[float]]]
+
+
+# -------- Rate limiting --------
+class TokenBucket:
+    """
+    Thread-safe token bucket. `rate` tokens are added per second up to `capacity`;
+    `acquire` blocks until enough tokens are available.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# -------- Engine --------
+class EmbeddingEngine:
+    """
+    Concurrent batch embedder.
+    - Batches are sized by estimated token budget (and a max text count per request).
+    - Up to `max_in_flight` batches run at once; an optional token bucket caps requests/min.
+    - Each batch is retried on its own, so one transient failure does not re-embed the rest.
+    - Vectors are returned in input order.
+    """
+
+    def __init__(
+        self,
+        backend: EmbedBackend,
+        max_batch_tokens: int = 15000,
+        max_batch_texts: int = 250,
+        max_in_flight: int = 4,
+        requests_per_minute: Optional[int] = None,
+        max_attempts: int = 5,
+    ):
+        self.backend = backend
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_texts = max_batch_texts
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_attempts = max_attempts
+        self.limiter = TokenBucket(requests_per_minute / 60.0) if requests_per_minute else None
+        # Recent per-batch latencies (seconds), for reporting.
+        self.latencies = deque(maxlen=10000)
+        self._lat_lock = threading.Lock()
+
+    def plan_batches(self, texts: List[str]) -> List[List[int]]:
+        batches, cur, cur_tokens = [], [], 0
+        for i, t in enumerate(texts):
+            n = max(1, estimate_tokens(t))
+            if cur and (cur_tokens + n > self.max_batch_tokens or len(cur) >= self.max_batch_texts):
+                batches.append(cur)
+                cur, cur_tokens = [], 0
+            cur.append(i)
+            cur_tokens += n
+        if cur:
+            batches.append(cur)
+        return batches
+
+    def _run_batch(self, batch: List[str]) -> List[List[float]]:
+        for attempt in Retrying(
+            reraise=True,
+            stop=stop_after_attempt(self.max_attempts),
+            wait=wait_exponential(multiplier=1, min=1, max=8),
+        ):
+            with attempt:
+                if self.limiter:
+                    self.limiter.acquire()
+                t0 = time.perf_counter()
+                vecs = self.backend(batch)
+                if len(vecs) != len(batch):
+                    raise RuntimeError(f"Embedding backend returned {len(vecs)} vectors for {len(batch)} texts")
+                with self._lat_lock:
+                    self.latencies.append(time.perf_counter() - t0)
+        return vecs
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        batches = self.plan_batches(texts)
+        out: List[Optional[List[float]]] = [None] * len(texts)
+        if len(batches) == 1:
+            for i, v in zip(batches[0], self._run_batch(list(texts))):
+                out[i] = v
+            return out
+        with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(batches))) as pool:
+            futures = [(idx, pool.submit(self._run_batch, [texts[i] for i in idx])) for idx in batches]
+            for idx, fut in futures:
+                for i, v in zip(idx, fut.result()):
+                    out[i] = v
+        return out
+
+    __call__ = embed
+
+
+# -------- Fake backend (offline benchmarking) --------
+class FakeEmbedder:
+    """
+    Deterministic offline embedder: vectors derive from SHA-256 of the text.
+    Simulates request latency (`base_latency` + `per_token_latency` * tokens)
+    and optional transient failures (`failure_rate`).
+    """
+
+    def __init__(self, dim: int = 768, base_latency: float = 0.05, per_token_latency: float = 0.0,
+                 failure_rate: float = 0.0, seed: int = 0):
+        self.dim = dim
+        self.base_latency = base_latency
+        self.per_token_latency = per_token_latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _vector(self, text: str) -> List[float]:
+        vals, counter = [], 0
+        while len(vals) < self.dim:
+            h = hashlib.sha256(f"{counter}:{text}".encode("utf-8", errors="ignore")).digest()
+            vals.extend(x / 2**31 for x in struct.unpack("<8i", h))
+            counter += 1
+        return vals[:self.dim]
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            self.calls += 1
+            fail = self._rng.random() < self.failure_rate
+        time.sleep(self.base_latency + self.per_token_latency * sum(estimate_tokens(t) for t in texts))
+        if fail:
+            raise RuntimeError("FakeEmbedder: simulated transient failure")
+        return [self._vector(t) for t in texts]
+
+
+if __name__ == "__main__":
+    # Offline throughput benchmark: python -m src.embedder
+    texts = [f"chunk {i} " + "lorem ipsum dolor sit amet " * 60 for i in range(5000)]
+    for in_flight in (1, 4, 8, 16):
+        fake = FakeEmbedder(base_latency=0.05, per_token_latency=2e-6)
+        engine = EmbeddingEngine(fake, max_in_flight=in_flight)
+        t0 = time.perf_counter()
+        vecs = engine.embed(texts)
+        dt = time.perf_counter() - t0
+        print(f"in_flight={in_flight:>2} batches={fake.calls:>4} texts/s={len(vecs) / dt:,.0f} elapsed={dt:.2f}s")
@@ -1,8 +1,12 @@
 # feedback_agent.py
+import asyncio
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from google import genai
 
+from .llm import LLM
+from .async_llm import AsyncLLM
+
 logger = logging.getLogger(__name__)
 
 class FeedbackAgent:
@@ -15,13 +19,42 @@ class FeedbackAgent:
     - reject: Flag draft as unsuitable
     """
 
-    def __init__(self, credentials, model="gemini-1.5-flash"):
-        self.client = genai.Client(credentials=credentials)
+    def __init__(
+        self,
+        credentials=None,
+        model="gemini-1.5-flash",
+        client: Optional[genai.Client] = None,
+        llm: Optional[LLM] = None,
+        async_llm: Optional[AsyncLLM] = None,
+    ):
+        """
+        Pass `llm`/`async_llm` (or an existing `client`) to share connections and
+        concurrency limits with the rest of the app instead of opening a new client.
+        """
+        self.llm = llm or (async_llm.llm if async_llm else None)
+        self.async_llm = async_llm
+        self.client = client or (genai.Client(credentials=credentials) if self.llm is None else None)
         self.model = model
 
-    def _decide_action(self, draft: Dict[str, Any], feedback: str) -> str:
-        """Decide whether to approve, edit, regenerate, or reject."""
-        prompt = f"""
+    # -------- Model calls --------
+    def _generate(self, prompt: str) -> str:
+        if self.llm is not None:
+            return self.llm.generate(prompt)
+        resp = self.client.models.generate_content(model=self.model, contents=prompt)
+        return resp.text
+
+    async def _agenerate(self, prompt: str) -> str:
+        if self.async_llm is not None:
+            return await self.async_llm.generate(prompt)
+        if self.client is not None:
+            resp = await self.client.aio.models.generate_content(model=self.model, contents=prompt)
+            return resp.text
+        return await asyncio.to_thread(self.llm.generate, prompt)
+
+    # -------- Prompts --------
+    @staticmethod
+    def _decide_prompt(draft: Dict[str, Any], feedback: str) -> str:
+        return f"""
         You are a Jira story reviewer.
         Given the draft and feedback, decide ONLY one action:
         - "approve": Feedback is minor or not needed, keep as is.
@@ -38,17 +71,9 @@ class FeedbackAgent:
         Respond with just the action word.
         """
 
-        resp = self.client.models.generate_content(
-            model=self.model,
-            contents=prompt
-        )
-        decision = resp.text.strip().lower()
-        logger.info(f"FeedbackAgent decision: {decision}")
-        return decision
-
-    def _apply_edit(self, draft: Dict[str, Any], feedback: str) -> Dict[str, Any]:
-        """Apply targeted edits to the draft."""
-        prompt = f"""
+    @staticmethod
+    def _edit_prompt(draft: Dict[str, Any], feedback: str) -> str:
+        return f"""
         Edit the following Jira story based on feedback. Keep structure intact.
         Draft:
         {draft}
@@ -58,15 +83,9 @@ class FeedbackAgent:
         Return JSON with keys: title, description.
         """
 
-        resp = self.client.models.generate_content(
-            model=self.model,
-            contents=prompt
-        )
-        return self._safe_parse(resp.text, draft)
-
-    def _regenerate(self, feedback: str) -> Dict[str, Any]:
-        """Regenerate a fresh draft based on feedback."""
-        prompt = f"""
+    @staticmethod
+    def _regenerate_prompt(feedback: str) -> str:
+        return f"""
         Generate a new Jira story from scratch. 
         Follow agile story best practices.
         Incorporate the feedback:
@@ -74,11 +93,20 @@ class FeedbackAgent:
 
         Return JSON with keys: title, description.
         """
-        resp = self.client.models.generate_content(
-            model=self.model,
-            contents=prompt
-        )
-        return self._safe_parse(resp.text, {"title": "Untitled", "description": ""})
+
+    def _decide_action(self, draft: Dict[str, Any], feedback: str) -> str:
+        """Decide whether to approve, edit, regenerate, or reject."""
+        decision = self._generate(self._decide_prompt(draft, feedback)).strip().lower()
+        logger.info(f"FeedbackAgent decision: {decision}")
+        return decision
+
+    def _apply_edit(self, draft: Dict[str, Any], feedback: str) -> Dict[str, Any]:
+        """Apply targeted edits to the draft."""
+        return self._safe_parse(self._generate(self._edit_prompt(draft, feedback)), draft)
+
+    def _regenerate(self, feedback: str) -> Dict[str, Any]:
+        """Regenerate a fresh draft based on feedback."""
+        return self._safe_parse(self._generate(self._regenerate_prompt(feedback)), {"title": "Untitled", "description": ""})
 
     def _safe_parse(self, text: str, fallback: Dict[str, Any]) -> Dict[str, Any]:
         import json
@@ -91,7 +119,21 @@ class FeedbackAgent:
     def process_feedback(self, draft: Dict[str, Any], feedback: str) -> Dict[str, Any]:
         """Main entry: decides and executes the action."""
         action = self._decide_action(draft, feedback)
-
+        return self._execute(action, draft, feedback)
+
+    async def aprocess_feedback(self, draft: Dict[str, Any], feedback: str) -> Dict[str, Any]:
+        """Async variant of process_feedback, for reviewing many drafts from one event loop."""
+        action = (await self._agenerate(self._decide_prompt(draft, feedback))).strip().lower()
+        logger.info(f"FeedbackAgent decision: {action}")
+        if action == "edit":
+            text = await self._agenerate(self._edit_prompt(draft, feedback))
+            return {"action": "edit", "draft": self._safe_parse(text, draft)}
+        if action == "regenerate":
+            text = await self._agenerate(self._regenerate_prompt(feedback))
+            return {"action": "regenerate", "draft": self._safe_parse(text, {"title": "Untitled", "description": ""})}
+        return self._execute(action, draft, feedback)
+
+    def _execute(self, action: str, draft: Dict[str, Any], feedback: str) -> Dict[str, Any]:
         if action == "approve":
             return {"action": "approve", "draft": draft}
         elif action == "edit":
@@ -1,32 +1,34 @@
 from pathlib import Path
-from typing import Dict, Any, Optional, List, Union
+from typing import Dict, Any, Optional, List, Union, BinaryIO
 import tempfile
 import requests
-from PyPDF2 import PdfReader
 from bs4 import BeautifulSoup
 from git import Repo
 import fnmatch
 
+from .pdf_extract import PdfExtractor
+
+# Extensions routed to the `code_base` collection / skipped entirely on repo ingest.
+CODE_EXTS = {".py", ".java", ".js", ".ts", ".go", ".cpp", ".c", ".rb", ".cs"}
+BINARY_EXTS = {".png", ".jpg", ".jpeg", ".gif", ".pdf", ".exe", ".class", ".zip", ".bin"}
+
 # -------- PDF --------
-def load_pdf(path: str) -> str:
-    r = PdfReader(path)
-    out = []
-    for p in r.pages:
-        out.append(p.extract_text() or "")
-    return "\n\n".join(out)
+def load_pdf(path: Union[str, BinaryIO], cache_dir: Optional[str] = None) -> str:
+    """Whole-document text; use PdfExtractor.iter_pages to stream page by page instead."""
+    return PdfExtractor(cache_dir).extract_text(path)
 
 # -------- Text --------
 def load_text(path: str) -> str:
     return Path(path).read_text(encoding="utf-8", errors="ignore")
 
 # -------- Confluence: single page --------
-def fetch_confluence_simple(base_url: str, page_id: str, username: str, token: str) -> Dict[str, Any]:
-    url = f"{base_url.rstrip('/')}/rest/api/content/{page_id}?expand=body.storage,version"
-    resp = requests.get(url, auth=(username, token))
-    resp.raise_for_status()
-    data = resp.json()
+def confluence_page_text(data: Dict[str, Any], page_id: str) -> Dict[str, Any]:
+    """Plain text + meta from a content JSON fetched with expand=body.storage,version."""
     html = data.get("body", {}).get("storage", {}).get("value", "")
     soup = BeautifulSoup(html, "html.parser")
+    # Keep headings as Markdown so the chunker can split on them and record the heading path.
+    for h in soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6"]):
+        h.replace_with(f"\n\n{'#' * int(h.name[1])} {h.get_text(' ', strip=True)}\n\n")
     text = soup.get_text("\n")
     return {
         "text": text,
@@ -37,23 +39,35 @@ def fetch_confluence_simple(base_url: str, page_id: str, username: str, token: s
         }
     }
 
+def fetch_confluence_simple(base_url: str, page_id: str, username: str, token: str) -> Dict[str, Any]:
+    url = f"{base_url.rstrip('/')}/rest/api/content/{page_id}?expand=body.storage,version"
+    resp = requests.get(url, auth=(username, token))
+    resp.raise_for_status()
+    return confluence_page_text(resp.json(), page_id)
+
 # -------- Confluence: batch ingestion with regex --------
 def fetch_confluence_bulk(base_url: str, parent_page_id: str, username: str, token: str, pattern: str = "*") -> List[Dict[str, Any]]:
     """
     Fetch all child pages under a parent in Confluence.
     Supports filtering with fnmatch-style regex (e.g., "*" or "Design*").
     """
-    url = f"{base_url.rstrip('/')}/rest/api/content/{parent_page_id}/child/page?expand=body.storage,version"
-    resp = requests.get(url, auth=(username, token))
-    resp.raise_for_status()
-    data = resp.json()
-
-    results = []
-    for child in data.get("results", []):
-        title = child.get("title", "")
-        if fnmatch.fnmatch(title, pattern):  # regex filtering
-            child_id = child.get("id")
-            results.append(fetch_confluence_simple(base_url, child_id, username, token))
+    url = f"{base_url.rstrip('/')}/rest/api/content/{parent_page_id}/child/page"
+    results, start = [], 0
+    with requests.Session() as session:
+        session.auth = (username, token)
+        while True:
+            resp = session.get(url, params={"expand": "body.storage,version", "limit": 100, "start": start})
+            resp.raise_for_status()
+            data = resp.json()
+            children = data.get("results", [])
+            for child in children:
+                title = child.get("title", "")
+                if fnmatch.fnmatch(title, pattern):  # regex filtering
+                    # Bodies were expanded in the listing; no per-page refetch needed.
+                    results.append(confluence_page_text(child, child.get("id")))
+            if not children or "next" not in data.get("_links", {}):
+                break
+            start += len(children)
     return results
 
 # -------- Git Repos --------
@@ -1,6 +1,17 @@
 import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
 from typing import Dict, List, Tuple
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# Jira Cloud accepts at most 50 issues per /issue/bulk request.
+BULK_LIMIT = 50
 
 def _adf_paragraph(text: str) -> dict:
     return {"type":"paragraph","content":[{"type":"text","text": text or ""}]}
@@ -18,12 +29,60 @@ def build_adf(description: str, acceptance: List[str]) -> dict:
         content.append(_adf_bullet_list(acceptance))
     return {"type":"doc","version":1,"content":content}
 
+def _retry_after(resp: requests.Response, default: float) -> float:
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return default
+
+
+def _chunks(items: List, size: int) -> List[List]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
 class JiraClient:
-    def __init__(self, base_url: str, email: str, api_token: str, project_key: str):
+    """
+    Jira Cloud REST client over one pooled `requests.Session` (keep-alive, shared
+    connection pool). Issues are created through /rest/api/3/issue/bulk where possible;
+    429/503 responses are retried after the server's Retry-After delay. Transport errors
+    are only retried while connecting: once a POST may have reached Jira, retrying it
+    could create duplicate issues.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        email: str,
+        api_token: str,
+        project_key: str,
+        pool_size: int = 10,
+        max_workers: int = 4,
+        max_attempts: int = 5,
+        max_retry_wait: float = 60.0,
+        timeout: float = 30.0,
+    ):
         self.base = (base_url or "").rstrip("/")
         self.email = email
         self.token = api_token
         self.project = project_key
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.max_retry_wait = max_retry_wait
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.auth = self._auth()
+        self.session.headers.update(self._headers())
+        # urllib3 retries connect failures (nothing was sent) but never read errors.
+        retry = Retry(total=None, connect=max_attempts - 1, read=0, status=0, other=0, redirect=0, backoff_factor=0.5)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
     def is_configured(self) -> bool:
         return all([self.base, self.email, self.token, self.project])
@@ -34,13 +93,26 @@ class JiraClient:
     def _auth(self) -> Tuple[str,str]:
         return (self.email, self.token)
 
-    def create_story(self, story_json: Dict, create_subtasks: bool = True) -> Dict:
+    # -------- HTTP --------
+    def _post(self, path: str, payload: Dict) -> requests.Response:
+        """POST with retries on 429/503 (honouring Retry-After); connect errors are retried by the adapter."""
+        url = f"{self.base}{path}"
+        for attempt in range(1, self.max_attempts + 1):
+            backoff = min(2 ** (attempt - 1), self.max_retry_wait)
+            r = self.session.post(url, data=json.dumps(payload), timeout=self.timeout)
+            if r.status_code not in (429, 503) or attempt == self.max_attempts:
+                return r
+            wait = min(_retry_after(r, backoff), self.max_retry_wait)
+            logger.warning("Jira %s returned %s; retrying in %.1fs", path, r.status_code, wait)
+            time.sleep(wait)
+        return r
+
+    # -------- Payloads --------
+    def _story_fields(self, story_json: Dict) -> Dict:
         title = story_json.get("title") or "Auto-generated Story"
         desc = story_json.get("description") or ""
         ac   = story_json.get("acceptance_criteria") or []
-        subs = story_json.get("subtasks") or []
-
-        payload = {
+        return {
             "fields": {
                 "project": {"key": self.project},
                 "summary": title,
@@ -48,28 +120,88 @@ class JiraClient:
                 "description": build_adf(desc, ac)
             }
         }
-        url = f"{self.base}/rest/api/3/issue"
-        r = requests.post(url, auth=self._auth(), headers=self._headers(), data=json.dumps(payload))
+
+    def _subtask_fields(self, summary, parent_key: str) -> Dict:
+        return {
+            "fields": {
+                "project": {"key": self.project},
+                "summary": summary if isinstance(summary, str) else str(summary),
+                "issuetype": {"name": "Sub-task"},
+                "parent": {"key": parent_key},
+            }
+        }
+
+    # -------- Creation --------
+    def _create_one(self, payload: Dict) -> str:
+        r = self._post("/rest/api/3/issue", payload)
+        if r.status_code in (200, 201):
+            return r.json().get("key")
+        return f"ERROR:{r.status_code}"
+
+    def _create_bulk_chunk(self, payloads: List[Dict]) -> List[str]:
+        """One /issue/bulk call; returns a key or "ERROR:<status>" per payload, in order."""
+        r = self._post("/rest/api/3/issue/bulk", {"issueUpdates": payloads})
+        if r.status_code == 404:
+            # Bulk endpoint unavailable (e.g. older Jira Server): create one by one.
+            return [self._create_one(p) for p in payloads]
+        if r.status_code not in (200, 201):
+            return [f"ERROR:{r.status_code}"] * len(payloads)
+        body = r.json()
+        failed = {e.get("failedElementNumber"): e.get("status", r.status_code) for e in body.get("errors", [])}
+        issues = iter(body.get("issues", []))
+        out = []
+        for i in range(len(payloads)):
+            if i in failed:
+                out.append(f"ERROR:{failed[i]}")
+            else:
+                issue = next(issues, None)
+                out.append(issue.get("key") if issue else "ERROR:missing")
+        return out
+
+    def create_issues(self, payloads: List[Dict]) -> List[str]:
+        """Create issues in bulk chunks of 50, chunks in parallel; results in input order."""
+        chunks = _chunks(payloads, BULK_LIMIT)
+        if not chunks:
+            return []
+        if len(chunks) == 1:
+            return self._create_bulk_chunk(chunks[0])
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as pool:
+            return [key for keys in pool.map(self._create_bulk_chunk, chunks) for key in keys]
+
+    def create_story(self, story_json: Dict, create_subtasks: bool = True) -> Dict:
+        payload = self._story_fields(story_json)
+        r = self._post("/rest/api/3/issue", payload)
         if r.status_code not in (200, 201):
             raise RuntimeError(f"Jira create failed: {r.status_code} {r.text}")
-        story = r.json()
-        story_key = story.get("key")
+        story_key = r.json().get("key")
 
+        subs = story_json.get("subtasks") or []
         created_subtasks = []
         if create_subtasks and subs:
-            for s in subs:
-                sp = {
-                    "fields": {
-                        "project": {"key": self.project},
-                        "summary": s if isinstance(s, str) else str(s),
-                        "issuetype": {"name": "Sub-task"},
-                        "parent": {"key": story_key},
-                    }
-                }
-                rs = requests.post(url, auth=self._auth(), headers=self._headers(), data=json.dumps(sp))
-                if rs.status_code in (200, 201):
-                    created_subtasks.append(rs.json().get("key"))
-                else:
-                    created_subtasks.append(f"ERROR:{rs.status_code}")
+            created_subtasks = self.create_issues([self._subtask_fields(s, story_key) for s in subs])
 
         return {"story_key": story_key, "subtasks": created_subtasks, "payload": payload}
+
+    def create_stories(self, stories: List[Dict], create_subtasks: bool = True) -> List[Dict]:
+        """
+        Create many stories: all stories in bulk, then all of their subtasks in bulk.
+        Returns one {"story_key", "subtasks", "error"} per input story, in order.
+        """
+        keys = self.create_issues([self._story_fields(s) for s in stories])
+        # A 2xx reply without a key (or a null one) counts as a failure, not a crash.
+        keys = [k if isinstance(k, str) and k else "ERROR:missing" for k in keys]
+        results = [
+            {"story_key": None if k.startswith("ERROR:") else k, "subtasks": [], "error": k if k.startswith("ERROR:") else None}
+            for k in keys
+        ]
+        if not create_subtasks:
+            return results
+        owners, payloads = [], []
+        for i, (story, res) in enumerate(zip(stories, results)):
+            if res["story_key"]:
+                for s in story.get("subtasks") or []:
+                    owners.append(i)
+                    payloads.append(self._subtask_fields(s, res["story_key"]))
+        for i, key in zip(owners, self.create_issues(payloads)):
+            results[i]["subtasks"].append(key)
+        return results
@@ -0,0 +1,103 @@
+import json
+from typing import Any, List, Tuple
+
+Path = Tuple[Any, ...]
+
+
+class JsonStreamParser:
+    """
+    Incremental JSON parser for streamed model output.
+
+    `feed(text)` accepts arbitrary fragments and returns the scalar values that were
+    completed by that fragment as `(path, value)` pairs, e.g.
+    `(("title",), "Login")` or `(("acceptance_criteria", 0), "Given ...")`.
+    Anything before the first `{`/`[` (prose, ```json fences) is skipped, as is
+    anything after the top-level value closes.
+    """
+
+    def __init__(self):
+        self._stack: List[dict] = []
+        self._started = False
+        self.done = False
+        self._in_str = False
+        self._esc = False
+        self._buf: List[str] = []
+        self._scalar: List[str] = []
+
+    def _path(self) -> Path:
+        out = []
+        for frame in self._stack:
+            out.append(frame["key"] if frame["type"] == "obj" else frame["index"])
+        return tuple(out)
+
+    def _emit(self, value: Any, events: list) -> None:
+        top = self._stack[-1]
+        if top["type"] == "obj" and top["expect_key"]:
+            top["key"] = value
+            return
+        events.append((self._path(), value))
+
+    def _flush_scalar(self, events: list) -> None:
+        if not self._scalar:
+            return
+        raw = "".join(self._scalar)
+        self._scalar = []
+        try:
+            self._emit(json.loads(raw), events)
+        except ValueError:
+            pass
+
+    def feed(self, text: str) -> List[Tuple[Path, Any]]:
+        events: List[Tuple[Path, Any]] = []
+        for ch in text:
+            if self.done:
+                break
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                    self._buf.append(ch)
+                elif ch == "\\":
+                    self._esc = True
+                    self._buf.append(ch)
+                elif ch == '"':
+                    self._in_str = False
+                    try:
+                        value = json.loads('"' + "".join(self._buf) + '"')
+                    except ValueError:
+                        value = "".join(self._buf)
+                    self._emit(value, events)
+                else:
+                    self._buf.append(ch)
+                continue
+            if not self._started:
+                if ch in "{[":
+                    self._started = True
+                    self._stack.append(self._frame(ch))
+                continue
+            if ch == '"':
+                self._in_str, self._buf = True, []
+            elif ch in "{[":
+                self._stack.append(self._frame(ch))
+            elif ch in ",}]":
+                self._flush_scalar(events)
+                if ch == ",":
+                    top = self._stack[-1]
+                    if top["type"] == "obj":
+                        top["expect_key"] = True
+                    else:
+                        top["index"] += 1
+                else:
+                    self._stack.pop()
+                    if not self._stack:
+                        self.done = True
+            elif ch == ":":
+                self._stack[-1]["expect_key"] = False
+            elif not ch.isspace():
+                self._scalar.append(ch)
+        return events
+
+    @staticmethod
+    def _frame(ch: str) -> dict:
+        if ch == "{":
+            return {"type": "obj", "key": None, "expect_key": True}
+        return {"type": "arr", "index": 0}
@@ -0,0 +1,312 @@
+import json
+import math
+import os
+import re
+import shutil
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, run a single writer process
+    fcntl = None
+
+_TOKEN_RE = re.compile(r"[A-Za-z0-9]+(?:[-_.:/][A-Za-z0-9]+)*")
+_PART_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Identifier-friendly tokenizer: keeps compound tokens whole ("jira-1234",
+    "chunk_code_lines", "embedtexts") and also emits their parts
+    ("jira", "1234", "chunk", "code", "lines", "embed", "texts").
+    """
+    out = []
+    for m in _TOKEN_RE.finditer(text or ""):
+        tok = m.group()
+        out.append(tok.lower())
+        parts = _PART_RE.findall(tok)
+        if len(parts) > 1:
+            out.extend(p.lower() for p in parts)
+    return out
+
+
+class LexicalIndex:
+    """
+    Incremental BM25 index for one collection, shareable by several processes.
+
+    On disk (under `path`):
+      CURRENT             name of the live generation directory
+      gen-NNNNNN/         immutable base segment of that generation:
+        terms.json        {term: [offset, count]} into the postings arrays
+        postings.i32      doc numbers, memory-mapped
+        tfs.i32           term frequencies, memory-mapped
+        doclen.i32        token count per doc number, memory-mapped
+        docs.json         doc number -> chunk id
+        delta.jsonl       append-only log of adds/deletes since the generation was built
+      .lock               flock()ed around every log append, catch-up and merge
+    New docs live in an in-memory delta (replayed from delta.jsonl) and are merged into a
+    new generation once `merge_threshold` docs accumulate. A merge is published by
+    atomically replacing CURRENT, so a crash mid-merge leaves the previous generation
+    intact. Before each operation an instance catches up with log records and merges
+    written by other processes (e.g. the Streamlit app and ingest_cli).
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75, merge_threshold: int = 20000):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.k1, self.b = k1, b
+        self.merge_threshold = merge_threshold
+        self._lock = threading.RLock()
+        self.gen = None
+        with self._file_lock(shared=True):
+            self._sync()
+
+    # -------- Persistence --------
+    @contextmanager
+    def _file_lock(self, shared: bool = False) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        with open(self.path / ".lock", "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _gen_dir(self, gen: str) -> Path:
+        # "" is the pre-generation layout with the segment files directly under `path`.
+        return self.path / gen if gen else self.path
+
+    def _current(self) -> str:
+        try:
+            return (self.path / "CURRENT").read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            return ""
+
+    def _sync(self) -> None:
+        """Catch up with other processes; call with the file lock held."""
+        gen = self._current()
+        if gen != self.gen:
+            self._load_base(gen)
+        self._replay_delta()
+
+    def _load_base(self, gen: str) -> None:
+        self.gen = gen
+        base = self._gen_dir(gen)
+        terms = base / "terms.json"
+        self.terms: Dict[str, Tuple[int, int]] = json.loads(terms.read_text()) if terms.exists() else {}
+        docs = base / "docs.json"
+        self.doc_ids: List[str] = json.loads(docs.read_text()) if docs.exists() else []
+        self.base_docs = len(self.doc_ids)
+        self.postings = self._mmap(base / "postings.i32")
+        self.tfs = self._mmap(base / "tfs.i32")
+        self.doclen = np.array(self._mmap(base / "doclen.i32"), dtype=np.int32)
+        self.deleted = np.zeros(self.base_docs, dtype=bool)
+        self.id_to_doc = {cid: n for n, cid in enumerate(self.doc_ids)}
+        # Delta segment
+        self.delta_postings: Dict[str, Dict[int, int]] = {}
+        self.delta_len: List[int] = []
+        self._delta_pos = 0  # bytes of delta.jsonl already applied
+
+    @staticmethod
+    def _mmap(p: Path) -> np.ndarray:
+        if not p.exists() or p.stat().st_size == 0:
+            return np.zeros(0, dtype=np.int32)
+        return np.memmap(p, dtype=np.int32, mode="r")
+
+    def _replay_delta(self) -> None:
+        log = self._gen_dir(self.gen) / "delta.jsonl"
+        if not log.exists() or log.stat().st_size == self._delta_pos:
+            return
+        with log.open("rb") as fh:
+            fh.seek(self._delta_pos)
+            data = fh.read()
+        end = data.rfind(b"\n") + 1  # only whole lines
+        for line in data[:end].splitlines():
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if "del" in rec:
+                self._delete_one(rec["del"])
+            else:
+                self._add_one(rec["id"], rec["tf"], rec["len"])
+        self._delta_pos += end
+
+    def _append_log(self, records: Iterable[dict]) -> None:
+        # Called after _sync() under the exclusive lock, so the log ends at _delta_pos.
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+        with (self._gen_dir(self.gen) / "delta.jsonl").open("ab") as fh:
+            fh.write(data)
+        self._delta_pos += len(data)
+
+    # -------- Mutation --------
+    def _ensure_deleted_size(self) -> None:
+        total = self.base_docs + len(self.delta_len)
+        if len(self.deleted) < total:
+            self.deleted = np.concatenate([self.deleted, np.zeros(max(total - len(self.deleted), 1024), dtype=bool)])
+
+    def _delete_one(self, chunk_id: str) -> None:
+        n = self.id_to_doc.pop(chunk_id, None)
+        if n is not None:
+            self._ensure_deleted_size()
+            self.deleted[n] = True
+
+    def _add_one(self, chunk_id: str, tf: Dict[str, int], length: int) -> None:
+        self._delete_one(chunk_id)
+        n = self.base_docs + len(self.delta_len)
+        self.doc_ids.append(chunk_id)
+        self.delta_len.append(length)
+        self.id_to_doc[chunk_id] = n
+        self._ensure_deleted_size()
+        for term, c in tf.items():
+            self.delta_postings.setdefault(term, {})[n] = c
+
+    def add(self, ids: List[str], texts: List[str]) -> None:
+        records = []
+        for cid, text in zip(ids, texts):
+            toks = tokenize(text)
+            records.append({"id": cid, "tf": dict(Counter(toks)), "len": len(toks)})
+        with self._lock, self._file_lock():
+            self._sync()
+            self._append_log(records)
+            for r in records:
+                self._add_one(r["id"], r["tf"], r["len"])
+            if len(self.delta_len) >= self.merge_threshold:
+                self._merge()
+
+    def delete(self, ids: List[str]) -> None:
+        with self._lock, self._file_lock():
+            self._sync()
+            ids = [i for i in ids if i in self.id_to_doc]
+            if not ids:
+                return
+            self._append_log({"del": i} for i in ids)
+            for i in ids:
+                self._delete_one(i)
+
+    def merge(self) -> None:
+        """Fold the delta into a new compacted generation (drops deleted docs)."""
+        with self._lock, self._file_lock():
+            self._sync()
+            self._merge()
+
+    def _merge(self) -> None:
+        total = self.base_docs + len(self.delta_len)
+        live = np.flatnonzero(~self.deleted[:total])
+        remap = np.full(total, -1, dtype=np.int64)
+        remap[live] = np.arange(len(live))
+        lengths = np.concatenate([np.asarray(self.doclen, dtype=np.int32), np.asarray(self.delta_len, dtype=np.int32)])
+
+        all_terms = set(self.terms) | set(self.delta_postings)
+        terms, post_parts, tf_parts, offset = {}, [], [], 0
+        for term in sorted(all_terms):
+            docs, tfs = [], []
+            if term in self.terms:
+                off, cnt = self.terms[term]
+                docs.append(np.asarray(self.postings[off:off + cnt], dtype=np.int64))
+                tfs.append(np.asarray(self.tfs[off:off + cnt], dtype=np.int32))
+            if term in self.delta_postings:
+                d = self.delta_postings[term]
+                docs.append(np.fromiter(d.keys(), dtype=np.int64, count=len(d)))
+                tfs.append(np.fromiter(d.values(), dtype=np.int32, count=len(d)))
+            docs_a, tfs_a = np.concatenate(docs), np.concatenate(tfs)
+            new_docs = remap[docs_a]
+            keep = new_docs >= 0
+            if not keep.any():
+                continue
+            post_parts.append(new_docs[keep].astype(np.int32))
+            tf_parts.append(tfs_a[keep])
+            terms[term] = (offset, int(keep.sum()))
+            offset += int(keep.sum())
+
+        gen = f"gen-{int(self.gen[4:] or 0) + 1:06d}" if self.gen else "gen-000001"
+        out = self.path / gen
+        shutil.rmtree(out, ignore_errors=True)  # leftover of a crashed merge
+        out.mkdir()
+
+        def _write(name: str, data: bytes) -> None:
+            with (out / name).open("wb") as fh:
+                fh.write(data)
+                fh.flush()
+                os.fsync(fh.fileno())
+
+        _write("postings.i32", (np.concatenate(post_parts) if post_parts else np.zeros(0)).astype(np.int32).tobytes())
+        _write("tfs.i32", (np.concatenate(tf_parts) if tf_parts else np.zeros(0)).astype(np.int32).tobytes())
+        _write("doclen.i32", lengths[live].astype(np.int32).tobytes())
+        _write("terms.json", json.dumps(terms, ensure_ascii=False).encode("utf-8"))
+        _write("docs.json", json.dumps([self.doc_ids[n] for n in live], ensure_ascii=False).encode("utf-8"))
+        # Publish: the new generation becomes visible in one atomic rename.
+        tmp = self.path / "CURRENT.tmp"
+        with tmp.open("w", encoding="utf-8") as fh:
+            fh.write(gen)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, self.path / "CURRENT")
+        old = self.gen
+        self._load_base(gen)
+        self._drop_generation(old)
+
+    def _drop_generation(self, gen: str) -> None:
+        # Readers of the old generation re-sync under the lock before touching it again;
+        # open mmaps of removed files stay valid on POSIX.
+        if gen:
+            shutil.rmtree(self.path / gen, ignore_errors=True)
+            return
+        for name in ("terms.json", "postings.i32", "tfs.i32", "doclen.i32", "docs.json", "delta.jsonl"):
+            try:
+                (self.path / name).unlink(missing_ok=True)
+            except OSError:  # still mapped (Windows); harmless, CURRENT no longer points here
+                pass
+
+    # -------- Query --------
+    def __len__(self) -> int:
+        return len(self.id_to_doc)
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        q_terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            with self._file_lock(shared=True):
+                self._sync()
+            total = self.base_docs + len(self.delta_len)
+            n_live = len(self.id_to_doc)
+            if not q_terms or not n_live:
+                return []
+            lengths = np.concatenate([np.asarray(self.doclen, dtype=np.float32), np.asarray(self.delta_len, dtype=np.float32)])
+            avgdl = float(lengths[~self.deleted[:total]].mean()) or 1.0
+            norm = self.k1 * (1 - self.b + self.b * lengths / avgdl)
+            scores = np.zeros(total, dtype=np.float32)
+            for term in q_terms:
+                docs, tfs = [], []
+                if term in self.terms:
+                    off, cnt = self.terms[term]
+                    docs.append(np.asarray(self.postings[off:off + cnt], dtype=np.int64))
+                    tfs.append(np.asarray(self.tfs[off:off + cnt], dtype=np.float32))
+                if term in self.delta_postings:
+                    d = self.delta_postings[term]
+                    docs.append(np.fromiter(d.keys(), dtype=np.int64, count=len(d)))
+                    tfs.append(np.fromiter(d.values(), dtype=np.float32, count=len(d)))
+                if not docs:
+                    continue
+                docs_a, tfs_a = np.concatenate(docs), np.concatenate(tfs)
+                # Deleted docs stay in the postings until the next merge; they must not count
+                # towards document frequency.
+                live = ~self.deleted[docs_a]
+                docs_a, tfs_a = docs_a[live], tfs_a[live]
+                df = len(docs_a)
+                if not df:
+                    continue
+                idf = math.log(1 + (n_live - df + 0.5) / (df + 0.5))
+                np.add.at(scores, docs_a, idf * tfs_a * (self.k1 + 1) / (tfs_a + norm[docs_a]))
+            hits = np.flatnonzero(scores > 0)
+            if not len(hits):
+                return []
+            top = hits[np.argsort(-scores[hits], kind="stable")[:k]]
+            return [(self.doc_ids[n], float(scores[n])) for n in top]
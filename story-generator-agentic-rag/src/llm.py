@@ -1,23 +1,44 @@
+import json
 import logging
-from typing import List, Dict, Any
+import time
+from typing import Callable, Iterator, List, Dict, Any, Optional
 
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from tenacity import Retrying, retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
 import vertexai
 from vertexai.generative_models import GenerativeModel, SafetySetting
 from vertexai.language_models import TextEmbeddingModel
 
+from .embedder import EmbeddingEngine
+from .jsonstream import JsonStreamParser
+from .response_cache import ResponseCache
+
 logger = logging.getLogger(__name__)
 
 class LLM:
-    def __init__(self, project: str, location: str, model_name: str = "gemini-1.5-flash", embed_model: str = "text-embedding-004"):
+    def __init__(
+        self,
+        project: str,
+        location: str,
+        model_name: str = "gemini-1.5-flash",
+        embed_model: str = "text-embedding-004",
+        embed_concurrency: int = 4,
+        embed_rpm: Optional[int] = None,
+        response_cache: Optional[ResponseCache] = None,
+    ):
         if not project:
             raise RuntimeError("GOOGLE_CLOUD_PROJECT not set.")
         vertexai.init(project=project, location=location or "us-central1")
         self.model_name = model_name
         self.embed_model_name = embed_model
         self.model = GenerativeModel(model_name)
+        self.response_cache = response_cache
         self.embed_model = TextEmbeddingModel.from_pretrained(embed_model)
+        self.embedder = EmbeddingEngine(
+            self._embed_batch,
+            max_in_flight=embed_concurrency,
+            requests_per_minute=embed_rpm,
+        )
 
         # Permissive safety settings for enterprise use
         self.safety = [
@@ -28,19 +49,12 @@ class LLM:
         ]
 
     # -------- Embeddings --------
-    @retry(
-        reraise=True,
-        stop=stop_after_attempt(5),
-        wait=wait_exponential(multiplier=1, min=1, max=8),
-    )
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        return [r.values for r in self.embed_model.get_embeddings(batch)]
+
     def embed_texts(self, texts: List[str]) -> List[List[float]]:
-        vectors = []
-        batch_size = 32
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i+batch_size]
-            res = self.embed_model.get_embeddings(batch)
-            vectors.extend([r.values for r in res])
-        return vectors
+        """Token-budgeted, concurrent, per-batch-retried embedding; order preserved."""
+        return self.embedder.embed(texts)
 
     # -------- Generation --------
     @retry(
@@ -56,11 +70,41 @@ class LLM:
         )
         return resp.text or ""
 
-    def generate_json(self, system: str, instruction: str, temperature: float = 0.15) -> Dict[str, Any]:
+    def generate_stream(self, prompt: str, temperature: float = 0.15, max_output_tokens: int = 2048) -> Iterator[str]:
         """
-        Ask the model to output strictly JSON. Includes a fixer pass if JSON is invalid.
+        Yield text fragments as the model produces them. Opening the stream is retried;
+        once fragments have been yielded a failure is raised to the caller.
         """
-        prompt = f"""You are a strictly-JSON responder. 
+        for attempt in Retrying(
+            reraise=True,
+            stop=stop_after_attempt(5),
+            wait=wait_exponential(multiplier=1, min=1, max=8),
+        ):
+            with attempt:
+                responses = iter(self.model.generate_content(
+                    prompt,
+                    generation_config={"temperature": temperature, "max_output_tokens": max_output_tokens},
+                    safety_settings=self.safety,
+                    stream=True,
+                ))
+                first = next(responses, None)
+        if first is not None:
+            yield from self._chunk_text(first)
+        for resp in responses:
+            yield from self._chunk_text(resp)
+
+    @staticmethod
+    def _chunk_text(resp) -> Iterator[str]:
+        try:
+            text = resp.text
+        except ValueError:  # chunk without text parts (e.g. final safety/finish chunk)
+            return
+        if text:
+            yield text
+
+    @staticmethod
+    def _json_prompt(system: str, instruction: str) -> str:
+        return f"""You are a strictly-JSON responder. 
 Return ONLY valid JSON. Do not add explanations.
 
 SYSTEM:
@@ -68,8 +112,9 @@ SYSTEM:
 
 TASK:
 {instruction}"""
-        out = self.generate(prompt, temperature=temperature)
-        import json
+
+    @staticmethod
+    def _parse_json(out: str) -> Dict[str, Any]:
         try:
             return json.loads(out)
         except Exception:
@@ -79,3 +124,71 @@ TASK:
             except Exception:
                 logger.error("Failed to parse JSON from model. Output was:\n%s", out)
                 raise
+
+    def _cache_key(self, prompt: str, temperature: float, max_output_tokens: int) -> Optional[str]:
+        if self.response_cache is None or not self.response_cache.allows(temperature):
+            return None
+        return self.response_cache.make_key(self.model_name, prompt, temperature, max_output_tokens)
+
+    def generate_json(self, system: str, instruction: str, temperature: float = 0.15, max_output_tokens: int = 2048) -> Dict[str, Any]:
+        """
+        Ask the model to output strictly JSON. Includes a fixer pass if JSON is invalid.
+        Parsed responses are served from / stored in the response cache when configured.
+        """
+        prompt = self._json_prompt(system, instruction)
+        key = self._cache_key(prompt, temperature, max_output_tokens)
+        if key:
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                return cached
+        out = self._parse_json(self.generate(prompt, temperature=temperature, max_output_tokens=max_output_tokens))
+        if key:
+            self.response_cache.put(key, self.model_name, out)
+        return out
+
+    def generate_json_stream(
+        self,
+        system: str,
+        instruction: str,
+        temperature: float = 0.15,
+        on_field: Optional[Callable[[tuple, Any], None]] = None,
+        max_output_tokens: int = 2048,
+    ) -> Dict[str, Any]:
+        """
+        Streaming variant of generate_json: `on_field(path, value)` is called for every
+        JSON value as soon as it completes (e.g. ("title",), ("acceptance_criteria", 2)).
+        Returns the full parsed object. Cache hits are replayed through `on_field`.
+        """
+        parser = JsonStreamParser()
+        prompt = self._json_prompt(system, instruction)
+        key = self._cache_key(prompt, temperature, max_output_tokens)
+        if key:
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                for path, value in parser.feed(json.dumps(cached)):
+                    if on_field:
+                        on_field(path, value)
+                return cached
+        parts: List[str] = []
+        t0 = time.perf_counter()
+        first_token = first_field = None
+        for text in self.generate_stream(prompt, temperature=temperature, max_output_tokens=max_output_tokens):
+            if first_token is None:
+                first_token = time.perf_counter() - t0
+            parts.append(text)
+            for path, value in parser.feed(text):
+                if first_field is None:
+                    first_field = time.perf_counter() - t0
+                if on_field:
+                    on_field(path, value)
+        total = time.perf_counter() - t0
+        logger.info(
+            "Streamed JSON: first token %.2fs, first field %s, total %.2fs",
+            first_token or total,
+            f"{first_field:.2f}s" if first_field is not None else "n/a",
+            total,
+        )
+        out = self._parse_json("".join(parts))
+        if key:
+            self.response_cache.put(key, self.model_name, out)
+        return out
@@ -0,0 +1,13 @@
+import math
+from typing import Dict, Iterable
+
+
+def percentiles(values: Iterable[float], points=(50, 90, 99), scale: float = 1000.0) -> Dict[str, float]:
+    """Nearest-rank percentiles, scaled (default seconds -> ms)."""
+    vals = sorted(values)
+    if not vals:
+        return {f"p{p}": 0.0 for p in points}
+    return {
+        f"p{p}": round(vals[min(len(vals), max(1, math.ceil(p / 100.0 * len(vals)))) - 1] * scale, 2)
+        for p in points
+    }
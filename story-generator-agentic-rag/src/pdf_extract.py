@@ -0,0 +1,141 @@
+import gzip
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Tuple, Union
+
+from PyPDF2 import PdfReader
+
+from .content_cache import trim_dir
+from .procs import pool_context
+
+logger = logging.getLogger(__name__)
+
+# jira-story-generator/utils/pdf_processor.py duplicates this module (and trim_dir) for the
+# separately deployed jira app; keep fixes to extraction and the page cache in sync there.
+
+PdfSource = Union[str, bytes, BinaryIO]
+
+# -------- Pool workers --------
+_reader: Optional[PdfReader] = None
+
+
+def _init_worker(data: bytes) -> None:
+    # Each worker parses the document once and then serves page ranges from it.
+    global _reader
+    _reader = PdfReader(io.BytesIO(data))
+
+
+def _extract_range(start: int, end: int) -> List[str]:
+    return [_reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def _read(src: PdfSource) -> bytes:
+    if isinstance(src, bytes):
+        return src
+    if isinstance(src, str):
+        return Path(src).read_bytes()
+    src.seek(0)
+    return src.read()
+
+
+class PdfExtractor:
+    """
+    Page-streaming PDF text extraction.
+
+    iter_pages() yields (page_number, text) as pages are extracted, so callers can chunk
+    page by page instead of holding the joined document. PDFs with at least
+    `parallel_min_pages` pages are split into ranges of `range_size` pages and extracted on
+    `workers` processes (default: up to 4 CPUs; serial when already inside a pool worker).
+    With `cache_dir`, extracted pages are stored gzip-compressed per SHA-256 of the file and
+    replayed; the directory is trimmed (least recently used first) to `max_cache_bytes`.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        workers: Optional[int] = None,
+        parallel_min_pages: int = 64,
+        range_size: int = 16,
+        max_cache_bytes: int = 256 * 2**20,
+    ):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.parallel_min_pages = parallel_min_pages
+        self.range_size = range_size
+        self.max_cache_bytes = max_cache_bytes
+
+    # -------- Cache --------
+    def _cache_path(self, digest: str) -> Optional[Path]:
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / digest[:2] / f"{digest}.pages.jsonl.gz"
+
+    @staticmethod
+    def _replay(path: Path) -> Iterator[Tuple[int, str]]:
+        with gzip.open(path, "rt", encoding="utf-8") as fh:
+            for line in fh:
+                rec = json.loads(line)
+                yield rec["page"], rec["text"]
+
+    # -------- Extraction --------
+    def iter_pages(self, src: PdfSource) -> Iterator[Tuple[int, str]]:
+        data = _read(src)
+        path = self._cache_path(hashlib.sha256(data).hexdigest())
+        if path is None:
+            yield from self._extract(data)
+            return
+        try:
+            os.utime(path)  # marks the entry as recently used for trimming
+        except FileNotFoundError:
+            pass
+        else:
+            yield from self._replay(path)
+            return
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Unique per process and thread: Streamlit sessions share one process.
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with gzip.open(tmp, "wt", encoding="utf-8") as out:
+                for page, text in self._extract(data):
+                    out.write(json.dumps({"page": page, "text": text}) + "\n")
+                    yield page, text
+            # Only fully extracted documents are published to the cache.
+            tmp.replace(path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        trim_dir(self.cache_dir, self.max_cache_bytes, "*.pages.jsonl.gz")
+
+    def _extract(self, data: bytes) -> Iterator[Tuple[int, str]]:
+        reader = PdfReader(io.BytesIO(data))
+        n = len(reader.pages)
+        if self.workers > 1 and n >= self.parallel_min_pages and multiprocessing.parent_process() is None:
+            yield from self._extract_parallel(data, n)
+            return
+        for i, page in enumerate(reader.pages):
+            yield i + 1, page.extract_text() or ""
+
+    def _extract_parallel(self, data: bytes, n: int) -> Iterator[Tuple[int, str]]:
+        ranges = [(s, min(n, s + self.range_size)) for s in range(0, n, self.range_size)]
+        logger.debug("Extracting %d pages in %d ranges on %d processes", n, len(ranges), self.workers)
+        pool = ProcessPoolExecutor(
+            max_workers=min(self.workers, len(ranges)), mp_context=pool_context(), initializer=_init_worker, initargs=(data,)
+        )
+        try:
+            futures = [pool.submit(_extract_range, s, e) for s, e in ranges]
+            # Ranges finish out of order; pages are still yielded in document order.
+            for (start, _), fut in zip(ranges, futures):
+                for offset, text in enumerate(fut.result()):
+                    yield start + offset + 1, text
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def extract_text(self, src: PdfSource) -> str:
+        return "\n\n".join(text for _, text in self.iter_pages(src))
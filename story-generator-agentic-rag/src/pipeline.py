@@ -0,0 +1,387 @@
+import json
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
+
+from .chunks import iter_code_chunks, iter_text_chunks
+from .content_cache import ContentCache
+from .ingest import CODE_EXTS
+from .pdf_extract import PdfExtractor
+from .procs import pool_context
+from .store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+# Chunker settings used by parse_content; they are part of the parse-cache key, so bump
+# PARSER_VERSION whenever extraction or chunking output changes.
+PARSER_VERSION = 2
+TEXT_CHUNKING = {"target_tokens": 350, "max_tokens": 512, "overlap_tokens": 50}
+CODE_CHUNKING = {"target_tokens": 1100, "max_tokens": 1500}
+
+
+@dataclass
+class IngestItem:
+    """One input document. Either `path` or in-memory `data` must be set."""
+    name: str
+    path: Optional[str] = None
+    data: Optional[bytes] = None
+    source_key: Optional[str] = None
+    meta: Dict[str, Any] = field(default_factory=dict)
+    tag: Any = None  # opaque caller data handed back via on_doc (not stored)
+
+
+@dataclass
+class ParsedDoc:
+    name: str
+    collection: str
+    source_key: str
+    chunks: List[str]
+    metas: List[dict]
+    nbytes: int
+    embeddings: Optional[List[List[float]]] = None
+    tag: Any = None
+    # Set by the embed stage: the source's distinct chunk ids, positions of chunks not
+    # stored yet (`embeddings` is aligned with `new_pos`) and of stored chunks whose
+    # metadata changed.
+    ids: Optional[List[str]] = None
+    new_pos: Optional[List[int]] = None
+    stale_pos: Optional[List[int]] = None
+
+
+@dataclass
+class PipelineStats:
+    files_total: int = 0
+    files_done: int = 0
+    files_failed: int = 0
+    files_cached: int = 0
+    chunks_written: int = 0
+    chunks_unchanged: int = 0
+    chunks_meta_updated: int = 0
+    chunks_deleted: int = 0
+    bytes_read: int = 0
+    upserts: int = 0
+    started: float = field(default_factory=time.perf_counter)
+    finished: Optional[float] = None
+    embed_latencies: List[float] = field(default_factory=list)
+    errors: List[Tuple[str, str]] = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def chunks_per_sec(self) -> float:
+        return self.chunks_written / self.elapsed if self.elapsed else 0.0
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "files_total": self.files_total,
+            "files_done": self.files_done,
+            "files_failed": self.files_failed,
+            "files_cached": self.files_cached,
+            "chunks_written": self.chunks_written,
+            "chunks_unchanged": self.chunks_unchanged,
+            "chunks_meta_updated": self.chunks_meta_updated,
+            "chunks_deleted": self.chunks_deleted,
+            "bytes_read": self.bytes_read,
+            "upserts": self.upserts,
+            "elapsed_s": round(self.elapsed, 3),
+            "chunks_per_sec": round(self.chunks_per_sec, 2),
+            "mb_per_sec": round(self.bytes_read / 1e6 / self.elapsed, 3) if self.elapsed else 0.0,
+        }
+
+
+def route(name: str) -> Tuple[str, str]:
+    """Map a file name to (collection, type)."""
+    ext = Path(name).suffix.lower()
+    if ext == ".pdf":
+        return "knowledge_docs", "pdf"
+    if ext in CODE_EXTS:
+        return "code_base", "code"
+    return "knowledge_docs", "text"
+
+
+def parse_fingerprint(name: str) -> str:
+    """Everything besides the file bytes that determines parse_content's output for `name`."""
+    return json.dumps([PARSER_VERSION, Path(name).suffix.lower(), TEXT_CHUNKING, CODE_CHUNKING], sort_keys=True)
+
+
+def parse_content(name: str, data: bytes, pdf_cache_dir: Optional[str] = None) -> Tuple[List[str], List[dict]]:
+    """
+    CPU-bound stage; top-level so it can run in a process pool. Returns chunks and their
+    content-derived metadata (offsets, pages, symbols), which depend only on the bytes and
+    parse_fingerprint(name) and can therefore be cached.
+    """
+    _, kind = route(name)
+    chunks, metas = [], []
+    if kind == "pdf":
+        # Chunked page by page as pages are extracted; chunks never span pages.
+        for page, page_text in PdfExtractor(pdf_cache_dir).iter_pages(data):
+            for c in iter_text_chunks(page_text, **TEXT_CHUNKING):
+                chunks.append(c.text)
+                metas.append({"page": page, "start": c.start, "end": c.end, "headings": c.heading_path})
+    elif kind == "code":
+        for c in iter_code_chunks(data.decode("utf-8", errors="ignore"), name, **CODE_CHUNKING):
+            chunks.append(c.text)
+            metas.append({"symbols": c.symbol, "start_line": c.start_line, "end_line": c.end_line})
+    else:
+        for c in iter_text_chunks(data.decode("utf-8", errors="ignore"), **TEXT_CHUNKING):
+            chunks.append(c.text)
+            metas.append({"start": c.start, "end": c.end, "headings": c.heading_path})
+    return chunks, metas
+
+
+def parse_and_chunk(
+    name: str,
+    data: bytes,
+    source_key: Optional[str],
+    meta: Dict[str, Any],
+    pdf_cache_dir: Optional[str] = None,
+    parsed: Optional[Tuple[List[str], List[dict]]] = None,
+) -> ParsedDoc:
+    """parse_content (unless already `parsed`) plus the per-source metadata."""
+    collection, kind = route(name)
+    chunks, chunk_metas = parsed if parsed is not None else parse_content(name, data, pdf_cache_dir)
+    base = {"source": name, "type": kind, **meta}
+    if kind == "code":
+        base["path"] = base.get("path") or name
+    return ParsedDoc(
+        name=name,
+        collection=collection,
+        source_key=source_key or f"{kind}:{name}",
+        chunks=chunks,
+        metas=[{**base, **m} for m in chunk_metas],
+        nbytes=len(data),
+    )
+
+
+class IngestPipeline:
+    """
+    Staged streaming ingest: read -> parse/chunk (process pool) -> embed (thread pool,
+    capped concurrency) -> batched writer. Stages are connected by bounded queues so a
+    slow stage applies backpressure upstream instead of buffering whole corpora in memory.
+    With `use_processes`, files are parsed in parallel but each PDF is extracted serially
+    inside its pool worker; without it, parsing runs on threads and a large PDF is split
+    into page ranges on PdfExtractor's own process pool instead.
+    """
+
+    def __init__(
+        self,
+        store: VectorStore,
+        parse_workers: int = 4,
+        embed_concurrency: int = 4,
+        write_batch: int = 512,
+        queue_size: int = 8,
+        use_processes: bool = True,
+        pdf_cache_dir: Optional[str] = None,
+        parse_cache: Optional[ContentCache] = None,
+        on_progress: Optional[Callable[[PipelineStats], None]] = None,
+        on_doc: Optional[Callable[[ParsedDoc], None]] = None,
+    ):
+        self.store = store
+        self.parse_workers = parse_workers
+        self.embed_concurrency = embed_concurrency
+        self.write_batch = write_batch
+        self.queue_size = queue_size
+        self.use_processes = use_processes
+        self.pdf_cache_dir = pdf_cache_dir
+        # Identical bytes (same extension and chunker settings) skip parsing and chunking.
+        self.parse_cache = parse_cache
+        self.on_progress = on_progress
+        self.on_doc = on_doc
+
+    # -------- Stages --------
+    def _reader(self, items: Iterable[IngestItem], out: queue.Queue, stats: PipelineStats) -> None:
+        try:
+            for item in items:
+                stats.files_total += 1
+                try:
+                    data = item.data if item.data is not None else Path(item.path).read_bytes()
+                except Exception as e:
+                    self._fail(stats, item.name, e)
+                    continue
+                stats.bytes_read += len(data)
+                out.put((item, data))
+        finally:
+            out.put(_DONE)
+
+    def _parser(self, inp: queue.Queue, out: queue.Queue, stats: PipelineStats) -> None:
+        if self.use_processes:
+            pool = ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=pool_context())
+        else:
+            pool = ThreadPoolExecutor(max_workers=self.parse_workers)
+        try:
+            with pool:
+                pending = {}
+                exhausted = False
+                while not exhausted or pending:
+                    # Keep at most 2x workers jobs in flight; the bounded input queue blocks the reader.
+                    while not exhausted and len(pending) < self.parse_workers * 2:
+                        msg = inp.get()
+                        if msg is _DONE:
+                            exhausted = True
+                            break
+                        item, data = msg
+                        key = self.parse_cache.key(data, parse_fingerprint(item.name)) if self.parse_cache else None
+                        cached = self.parse_cache.get(key) if key else None
+                        if cached is not None:
+                            with stats.lock:
+                                stats.files_cached += 1
+                            self._forward(item, data, (cached["chunks"], cached["metas"]), out, stats)
+                            continue
+                        pending[pool.submit(parse_content, item.name, data, self.pdf_cache_dir)] = (item, data, key)
+                    if not pending:
+                        continue
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        item, data, key = pending.pop(fut)
+                        try:
+                            parsed = fut.result()
+                        except Exception as e:
+                            self._fail(stats, item.name, e)
+                            continue
+                        if key:
+                            try:
+                                self.parse_cache.put(key, {"chunks": parsed[0], "metas": parsed[1]})
+                            except OSError as e:
+                                logger.warning("Parse cache write for %s failed: %s", item.name, e)
+                        self._forward(item, data, parsed, out, stats)
+        finally:
+            for _ in range(self.embed_concurrency):
+                out.put(_DONE)
+
+    def _forward(self, item: IngestItem, data: bytes, parsed, out: queue.Queue, stats: PipelineStats) -> None:
+        doc = parse_and_chunk(item.name, data, item.source_key, item.meta, parsed=parsed)
+        doc.tag = item.tag
+        if doc.chunks:
+            out.put(doc)
+            return
+        try:
+            # Emptied document: drop whatever it stored before.
+            deleted = self.store.commit_source(doc.collection, doc.source_key, [])
+        except Exception as e:
+            self._fail(stats, doc.name, e)
+            return
+        with stats.lock:
+            stats.files_done += 1
+            stats.chunks_deleted += deleted
+        if self.on_doc:
+            self.on_doc(doc)
+
+    def _embedder(self, inp: queue.Queue, out: queue.Queue, stats: PipelineStats) -> None:
+        while True:
+            doc = inp.get()
+            if doc is _DONE:
+                out.put(_DONE)
+                return
+            try:
+                doc.ids, doc.new_pos, doc.stale_pos = self.store.diff_source(doc.collection, doc.source_key, doc.chunks, doc.metas)
+                t0 = time.perf_counter()
+                # Chunks already stored under the same id are not re-embedded; only moved ones get new metadata.
+                doc.embeddings = self.store.chunk_embedder([doc.chunks[p] for p in doc.new_pos]) if doc.new_pos else []
+                stats.embed_latencies.append(time.perf_counter() - t0)
+                out.put(doc)
+            except Exception as e:
+                self._fail(stats, doc.name, e)
+
+    def _writer(self, inp: queue.Queue, stats: PipelineStats) -> None:
+        buffers: Dict[str, List[ParsedDoc]] = {}
+        sizes: Dict[str, int] = {}
+        remaining = self.embed_concurrency
+        while remaining:
+            doc = inp.get()
+            if doc is _DONE:
+                remaining -= 1
+                continue
+            buffers.setdefault(doc.collection, []).append(doc)
+            sizes[doc.collection] = sizes.get(doc.collection, 0) + len(doc.chunks)
+            if sizes[doc.collection] >= self.write_batch:
+                self._flush(doc.collection, buffers.pop(doc.collection), stats)
+                sizes[doc.collection] = 0
+        for collection, docs in buffers.items():
+            self._flush(collection, docs, stats)
+
+    def _flush(self, collection: str, docs: List[ParsedDoc], stats: PipelineStats) -> None:
+        ids, chunks, metas, embs = [], [], [], []
+        seen = set()
+        for d in docs:
+            new_chunks = [d.chunks[p] for p in d.new_pos]
+            new_ids = self.store._make_ids(d.source_key, new_chunks)
+            for i, c, p, e in zip(new_ids, new_chunks, d.new_pos, d.embeddings):
+                if i in seen:  # same source queued twice in one batch
+                    continue
+                seen.add(i)
+                ids.append(i)
+                chunks.append(c)
+                metas.append(d.metas[p])
+                embs.append(e)
+        try:
+            self.store.write(collection, ids, chunks, metas, embs)
+        except Exception as e:
+            for d in docs:
+                self._fail(stats, d.name, e)
+            return
+        with stats.lock:
+            stats.upserts += 1
+            stats.chunks_written += len(chunks)
+        for d in docs:
+            try:
+                updated = self.store.update_metadata(
+                    collection, d.source_key, [d.chunks[p] for p in d.stale_pos], [d.metas[p] for p in d.stale_pos]
+                )
+                deleted = self.store.commit_source(collection, d.source_key, d.ids)
+            except Exception as e:
+                self._fail(stats, d.name, e)
+                continue
+            with stats.lock:
+                stats.files_done += 1
+                stats.chunks_unchanged += len(d.ids) - len(d.new_pos)
+                stats.chunks_meta_updated += updated
+                stats.chunks_deleted += deleted
+            if self.on_doc:
+                self.on_doc(d)
+
+    def _fail(self, stats: PipelineStats, name: str, err: Exception) -> None:
+        logger.warning("Ingest failed for %s: %s", name, err)
+        with stats.lock:
+            stats.files_failed += 1
+            stats.errors.append((name, f"{type(err).__name__}: {err}"))
+
+    # -------- Entry --------
+    def run(self, items: Iterable[IngestItem]) -> PipelineStats:
+        stats = PipelineStats()
+        q_parse: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        q_embed: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        q_write: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        threads = [
+            threading.Thread(target=self._reader, args=(items, q_parse, stats), name="ingest-reader"),
+            threading.Thread(target=self._parser, args=(q_parse, q_embed, stats), name="ingest-parser"),
+            threading.Thread(target=self._writer, args=(q_write, stats), name="ingest-writer"),
+        ]
+        threads += [
+            threading.Thread(target=self._embedder, args=(q_embed, q_write, stats), name=f"ingest-embed-{i}")
+            for i in range(self.embed_concurrency)
+        ]
+        for t in threads:
+            t.start()
+        # Progress is reported from the calling thread (Streamlit widgets can only be updated there).
+        last = None
+        while any(t.is_alive() for t in threads):
+            threads[2].join(timeout=0.25)
+            snapshot = (stats.files_done, stats.files_failed, stats.chunks_written)
+            if self.on_progress and snapshot != last:
+                last = snapshot
+                self.on_progress(stats)
+        for t in threads:
+            t.join()
+        stats.finished = time.perf_counter()
+        logger.info("Ingest pipeline finished: %s", stats.report())
+        return stats
@@ -0,0 +1,12 @@
+import multiprocessing
+from multiprocessing.context import BaseContext
+
+
+def pool_context() -> BaseContext:
+    """
+    Start method for our process pools. Never fork: by the time a pool starts, the app
+    already runs gRPC / vertexai threads, and a forked child can deadlock on locks they held.
+    forkserver forks workers from a clean single-threaded server; spawn where it is missing.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
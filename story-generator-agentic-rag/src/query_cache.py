@@ -0,0 +1,59 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+
+class QueryEmbedder:
+    """
+    In-process LRU/TTL cache for query embeddings with single-flight coalescing:
+    concurrent requests for the same text share one embedding call.
+    """
+
+    def __init__(self, embed_fn: Callable[[List[str]], List[List[float]]], max_size: int = 1024, ttl: float = 600.0):
+        self.embed_fn = embed_fn
+        self.max_size = max_size
+        self.ttl = ttl
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def __call__(self, text: str) -> List[float]:
+        with self._lock:
+            entry = self._cache.get(text)
+            if entry and time.monotonic() - entry[0] < self.ttl:
+                self._cache.move_to_end(text)
+                self.hits += 1
+                return entry[1]
+            fut = self._inflight.get(text)
+            if fut is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                fut = self._inflight[text] = Future()
+                self.misses += 1
+                leader = True
+        if not leader:
+            return fut.result()
+        try:
+            vec = self.embed_fn([text])[0]
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(text, None)
+            fut.set_exception(e)
+            raise
+        with self._lock:
+            self._cache[text] = (time.monotonic(), vec)
+            self._cache.move_to_end(text)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+            self._inflight.pop(text, None)
+        fut.set_result(vec)
+        return vec
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced, "entries": len(self._cache)}
@@ -0,0 +1,130 @@
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from git import Repo
+
+from .ingest import CODE_EXTS, BINARY_EXTS
+from .pipeline import IngestItem, IngestPipeline
+from .store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+
+class RepoMirror:
+    """
+    Persistent local mirror of a git repo plus a manifest of what was last ingested:
+    {"repo_url", "branch", "commit", "files": {path: blob_sha}}.
+    """
+
+    def __init__(self, root: str, repo_url: str, branch: Optional[str] = None):
+        self.repo_url = repo_url
+        self.branch = branch
+        self.slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", re.sub(r"^\w+://", "", repo_url.rstrip("/")).removesuffix(".git"))
+        if branch:
+            self.slug += f"@{re.sub(r'[^A-Za-z0-9_.-]+', '_', branch)}"
+        self.root = Path(root)
+        self.path = self.root / self.slug
+        self.manifest_path = self.root / f"{self.slug}.manifest.json"
+
+    def load_manifest(self) -> Dict[str, Any]:
+        if self.manifest_path.exists():
+            return json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        return {"repo_url": self.repo_url, "branch": self.branch, "commit": None, "files": {}}
+
+    def save_manifest(self, manifest: Dict[str, Any]) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(manifest, indent=1), encoding="utf-8")
+        tmp.replace(self.manifest_path)
+
+    def sync(self) -> Repo:
+        """Clone on first use, otherwise fetch and hard-reset to the remote head."""
+        if (self.path / ".git").exists():
+            repo = Repo(str(self.path))
+            repo.remotes.origin.fetch()
+        else:
+            self.root.mkdir(parents=True, exist_ok=True)
+            kwargs = {"branch": self.branch} if self.branch else {}
+            repo = Repo.clone_from(self.repo_url, str(self.path), **kwargs)
+        target = f"origin/{self.branch}" if self.branch else "origin/HEAD"
+        repo.git.reset("--hard", target)
+        repo.git.clean("-fdx")
+        return repo
+
+    @staticmethod
+    def blob_shas(repo: Repo) -> Dict[str, str]:
+        return {b.path: b.hexsha for b in repo.head.commit.tree.traverse() if b.type == "blob"}
+
+
+def ingest_repo_incremental(
+    store: VectorStore,
+    repo_url: str,
+    branch: Optional[str],
+    mirror_root: str,
+    pipeline: Optional[IngestPipeline] = None,
+) -> Dict[str, Any]:
+    """
+    Fetch the mirror, diff blob SHAs against the manifest and only (re)ingest
+    added/changed files. Changed files are replaced per source (unchanged chunks are
+    kept, stale ones deleted); removed files lose all their chunks.
+    """
+    mirror = RepoMirror(mirror_root, repo_url, branch)
+    repo = mirror.sync()
+    head = repo.head.commit.hexsha
+    manifest = mirror.load_manifest()
+    old, new = manifest.get("files", {}), mirror.blob_shas(repo)
+
+    removed = [p for p in old if p not in new]
+    changed = [p for p, sha in new.items() if old.get(p) != sha]
+    stats = {"commit": head, "previous_commit": manifest.get("commit"), "added": 0, "changed": 0,
+             "removed": len(removed), "code_chunks": 0, "doc_chunks": 0, "stale_chunks_deleted": 0, "failed": 0, "bytes_read": 0}
+
+    try:
+        for rel in removed:
+            _delete_file(store, mirror.slug, rel)
+            old.pop(rel, None)
+
+        items = []
+        for rel in changed:
+            if rel in old:
+                stats["changed"] += 1
+            else:
+                stats["added"] += 1
+            p = mirror.path / rel
+            if p.suffix.lower() in BINARY_EXTS or not p.is_file():
+                _delete_file(store, mirror.slug, rel)
+                old[rel] = new[rel]
+                continue
+            key = f"repo:{mirror.slug}:{rel}"
+            items.append(IngestItem(name=rel, path=str(p), source_key=key,
+                                    meta={"source": key, "repo": repo_url, "path": rel}))
+
+        def _count(doc):
+            stats["code_chunks" if doc.collection == "code_base" else "doc_chunks"] += len(doc.chunks)
+
+        pipeline = pipeline or IngestPipeline(store)
+        pipeline.on_doc = _count
+        result = pipeline.run(items)
+        failed = {name for name, _ in result.errors}
+        stats["failed"] = len(failed)
+        stats["stale_chunks_deleted"] = result.chunks_deleted
+        stats["bytes_read"] = result.bytes_read
+        for item in items:
+            if item.name not in failed:
+                old[item.name] = new[item.name]
+        if not failed:
+            manifest["commit"] = head
+    finally:
+        manifest["files"] = old
+        mirror.save_manifest(manifest)
+
+    logger.info("Repo %s @ %s: %s", repo_url, head[:12], stats)
+    return stats
+
+
+def _delete_file(store: VectorStore, slug: str, rel: str) -> None:
+    collection = "code_base" if Path(rel).suffix.lower() in CODE_EXTS else "knowledge_docs"
+    store.remove_source(collection, f"repo:{slug}:{rel}")
@@ -0,0 +1,71 @@
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_PATH = str(Path(__file__).resolve().parents[2] / "models" / "cross-encoder-msmarco-MiniLM-L6-v2")
+
+_models: Dict[str, object] = {}
+_models_lock = threading.Lock()
+
+
+def _load_cross_encoder(model_path: str, num_threads: int):
+    """Load the local cross-encoder once per process (first call pays the cost)."""
+    with _models_lock:
+        if model_path not in _models:
+            import torch
+            from sentence_transformers import CrossEncoder
+
+            torch.set_num_threads(num_threads)
+            _models[model_path] = CrossEncoder(model_path, device="cpu", max_length=512)
+            logger.info("Loaded cross-encoder from %s", model_path)
+        return _models[model_path]
+
+
+class CrossEncoderReranker:
+    """
+    Re-scores (query, passage) pairs with the bundled MiniLM cross-encoder on CPU.
+    Scores are cached per (query, chunk id) so repeated drafts over the same
+    context only score new candidates.
+    """
+
+    def __init__(self, model_path: str = DEFAULT_MODEL_PATH, batch_size: int = 32, num_threads: int = 2, cache_size: int = 4096):
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[tuple, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _score(self, query: str, docs: List[Dict]) -> List[float]:
+        scores: List[float] = [0.0] * len(docs)
+        todo = []
+        with self._lock:
+            for i, d in enumerate(docs):
+                key = (query, d.get("id") or d["text"])
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[i] = self._cache[key]
+                else:
+                    todo.append((i, key))
+        if todo:
+            model = _load_cross_encoder(self.model_path, self.num_threads)
+            pairs = [(query, docs[i]["text"]) for i, _ in todo]
+            fresh = model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+            with self._lock:
+                for (i, key), s in zip(todo, fresh):
+                    scores[i] = float(s)
+                    self._cache[key] = float(s)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return scores
+
+    def rerank(self, query: str, docs: List[Dict], k: int) -> List[Dict]:
+        if not docs:
+            return []
+        scores = self._score(query, docs)
+        ranked = sorted(zip(scores, range(len(docs))), key=lambda x: -x[0])[:k]
+        return [{**docs[i], "rerank_score": s} for s, i in ranked]
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+class ResponseCache:
+    """
+    Persistent SQLite cache for parsed LLM JSON responses.
+
+    Keys are sha256(model, prompt hash, temperature, max tokens). Entries expire after
+    `ttl` seconds and the least recently used ones are evicted beyond `max_entries`.
+    Sampling at temperature > 0 is not deterministic, so those calls bypass the cache
+    unless `cache_nonzero_temperature` is set.
+    """
+
+    def __init__(self, path: str, ttl: float = 24 * 3600, max_entries: int = 5000, cache_nonzero_temperature: bool = False):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cache_nonzero_temperature = cache_nonzero_temperature
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT, created REAL, accessed REAL, value TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._puts = 0
+
+    @staticmethod
+    def make_key(model: str, prompt: str, temperature: float, max_output_tokens: int) -> str:
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        raw = json.dumps([model, prompt_hash, round(float(temperature), 4), int(max_output_tokens)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def allows(self, temperature: float) -> bool:
+        if temperature > 0 and not self.cache_nonzero_temperature:
+            with self._lock:
+                self.bypassed += 1
+            return False
+        return True
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT created, value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[0] > self.ttl:
+                if row is not None:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[1])
+
+    def put(self, key: str, model: str, value: Any) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, created, accessed, value) VALUES (?, ?, ?, ?, ?)",
+                (key, model, now, now, json.dumps(value, ensure_ascii=False)),
+            )
+            self._puts += 1
+            if self._puts % 100 == 1:
+                self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
@@ -0,0 +1,73 @@
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable, List, Set
+
+
+class SourceRegistry:
+    """
+    Sidecar SQLite index of which chunk ids belong to which source, per collection.
+    Lets a re-ingested source be diffed against its previous chunk set without
+    scanning the vector store. A source listed in `sources` is "tracked" even when it
+    currently has no chunks.
+    """
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS sources (collection TEXT, source TEXT, PRIMARY KEY (collection, source))")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks (collection TEXT, id TEXT, source TEXT, PRIMARY KEY (collection, id))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS chunks_by_source ON chunks (collection, source)")
+
+    def is_tracked(self, collection: str, source: str) -> bool:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM sources WHERE collection = ? AND source = ?", (collection, source)
+            ).fetchone()
+        return row is not None
+
+    def ids(self, collection: str, source: str) -> Set[str]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id FROM chunks WHERE collection = ? AND source = ?", (collection, source)
+            ).fetchall()
+        return {r[0] for r in rows}
+
+    def set_ids(self, collection: str, source: str, ids: Iterable[str]) -> None:
+        """Replace the recorded chunk set of `source` in one transaction."""
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.execute("INSERT OR IGNORE INTO sources VALUES (?, ?)", (collection, source))
+                self._db.execute("DELETE FROM chunks WHERE collection = ? AND source = ?", (collection, source))
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?)", ((collection, i, source) for i in ids)
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def remove_source(self, collection: str, source: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM chunks WHERE collection = ? AND source = ?", (collection, source))
+            self._db.execute("DELETE FROM sources WHERE collection = ? AND source = ?", (collection, source))
+
+    def remove_ids(self, collection: str, ids: List[str]) -> None:
+        with self._lock:
+            self._db.executemany("DELETE FROM chunks WHERE collection = ? AND id = ?", ((collection, i) for i in ids))
+
+    def sources(self, collection: str) -> Set[str]:
+        with self._lock:
+            rows = self._db.execute("SELECT source FROM sources WHERE collection = ?", (collection,)).fetchall()
+        return {r[0] for r in rows}
+
+    def all_ids(self, collection: str) -> Set[str]:
+        with self._lock:
+            rows = self._db.execute("SELECT id FROM chunks WHERE collection = ?", (collection,)).fetchall()
+        return {r[0] for r in rows}
@@ -1,9 +1,35 @@
 import hashlib
-from typing import List, Dict, Callable
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from typing import Any, List, Dict, Callable, Optional, Set, Tuple
 
 import chromadb
 from chromadb.utils import embedding_functions
 
+from .embed_cache import EmbeddingCache
+from .lexical import LexicalIndex
+from .query_cache import QueryEmbedder
+from .source_registry import SourceRegistry
+
+logger = logging.getLogger(__name__)
+
+RRF_K = 60
+
+
+def _clean_meta(meta: Optional[dict]) -> dict:
+    # Chroma rejects None values; they are left out of written and compared metadata.
+    return {k: v for k, v in (meta or {}).items() if v is not None}
+
+
+def _meta_changed(old: Optional[dict], new: Optional[dict]) -> bool:
+    # Chroma's update merges keys, so only the keys being written can be compared.
+    old = old or {}
+    return any(old.get(k) != v for k, v in _clean_meta(new).items())
+
+
 class _ExternalEmbedder(embedding_functions.EmbeddingFunction):
     def __init__(self, fn: Callable[[List[str]], List[List[float]]]):
         self.fn = fn
@@ -11,17 +37,56 @@ class _ExternalEmbedder(embedding_functions.EmbeddingFunction):
         return self.fn(inputs)
 
 class VectorStore:
-    def __init__(self, persist_path: str, embedder: Callable[[List[str]], List[List[float]]]):
-        self.client = chromadb.PersistentClient(path=persist_path or "./chroma_data")
+    def __init__(
+        self,
+        persist_path: str,
+        embedder: Callable[[List[str]], List[List[float]]],
+        cache: Optional[EmbeddingCache] = None,
+    ):
+        self.persist_path = persist_path or "./chroma_data"
+        self.client = chromadb.PersistentClient(path=self.persist_path)
         self.embedder = embedder
+        self.cache = cache
+        # Ingest path: unchanged chunks are served from the content-addressed cache.
+        self.chunk_embedder = cache.wrap(embedder) if cache else embedder
+        # Query path: LRU/TTL cache + single-flight so identical queries embed once.
+        self.query_embedder = QueryEmbedder(embedder)
+        self._pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="store-query")
         self._collections = {}
+        self._collections_lock = threading.Lock()
+        self._lexical: Dict[str, LexicalIndex] = {}
+        self._lexical_lock = threading.Lock()
+        # Which chunk ids each source_key currently owns (for replace / compaction).
+        self.registry = SourceRegistry(os.path.join(self.persist_path, "sources.sqlite"))
 
     def _get(self, name: str):
         if name in self._collections:
             return self._collections[name]
-        col = self.client.get_or_create_collection(name=name, embedding_function=_ExternalEmbedder(self.embedder))
-        self._collections[name] = col
-        return col
+        # Ingest embedders and query threads race here; Chroma's get_or_create is not atomic.
+        with self._collections_lock:
+            if name not in self._collections:
+                self._collections[name] = self.client.get_or_create_collection(
+                    name=name, embedding_function=_ExternalEmbedder(self.embedder)
+                )
+            return self._collections[name]
+
+    def lexical(self, name: str) -> LexicalIndex:
+        with self._lexical_lock:
+            if name not in self._lexical:
+                self._lexical[name] = LexicalIndex(os.path.join(self.persist_path, "lexical", name))
+            return self._lexical[name]
+
+    def rebuild_lexical(self, collection: str, page_size: int = 1000) -> int:
+        """Index chunks that were stored before the lexical index existed."""
+        coll, lex, offset = self._get(collection), self.lexical(collection), 0
+        while True:
+            page = coll.get(include=["documents"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            lex.add(page["ids"], page["documents"])
+            offset += len(page["ids"])
+        lex.merge()
+        return offset
 
     def list_collections(self) -> List[str]:
         return [c.name for c in self.client.list_collections()]
@@ -34,19 +99,248 @@ class VectorStore:
         return ids
 
     def upsert(self, collection: str, source_key: str, chunks: List[str], metadatas: List[dict]) -> int:
+        """Make `chunks` the full content of `source_key` (see replace_source); returns its chunk count."""
         if not chunks:
             return 0
-        ids = self._make_ids(source_key, chunks)
-        embs = self.embedder(chunks)
-        coll = self._get(collection)
-        coll.upsert(ids=ids, documents=chunks, metadatas=metadatas, embeddings=embs)
+        return self.replace_source(collection, source_key, chunks, metadatas)["chunks"]
+
+    def write(self, collection: str, ids: List[str], chunks: List[str], metadatas: List[dict], embeddings: List[List[float]]) -> int:
+        """Upsert pre-embedded chunks (used by the batched ingest writer)."""
+        if not ids:
+            return 0
+        self._get(collection).upsert(
+            ids=ids, documents=chunks, metadatas=[_clean_meta(m) for m in metadatas], embeddings=embeddings
+        )
+        self.lexical(collection).add(ids, chunks)
+        return len(ids)
+
+    # -------- Per-source replacement --------
+    def existing_ids(self, collection: str, ids: List[str]) -> Set[str]:
+        if not ids:
+            return set()
+        return set(self._get(collection).get(ids=ids, include=[])["ids"])
+
+    def diff_source(
+        self,
+        collection: str,
+        source_key: str,
+        chunks: List[str],
+        metadatas: Optional[List[dict]] = None,
+    ) -> Tuple[List[str], List[int], List[int]]:
+        """
+        Stable ids for `chunks` (repeated text collapses to one id), the positions of the
+        chunks whose ids are not stored yet (only those need embedding and writing) and,
+        given `metadatas`, the positions of stored chunks whose metadata changed: text
+        edited above a chunk moves its offsets/pages/lines without changing its id.
+        """
+        first: Dict[str, int] = {}
+        for pos, cid in enumerate(self._make_ids(source_key, chunks)):
+            first.setdefault(cid, pos)
+        ids = list(first)
+        if not ids:
+            return ids, [], []
+        stored = self._get(collection).get(ids=ids, include=["metadatas"] if metadatas is not None else [])
+        if metadatas is None:
+            existing = set(stored["ids"])
+            return ids, [pos for cid, pos in first.items() if cid not in existing], []
+        old = dict(zip(stored["ids"], stored["metadatas"]))
+        new_pos, stale_pos = [], []
+        for cid, pos in first.items():
+            if cid not in old:
+                new_pos.append(pos)
+            elif _meta_changed(old[cid], metadatas[pos]):
+                stale_pos.append(pos)
+        return ids, new_pos, stale_pos
+
+    def update_metadata(self, collection: str, source_key: str, chunks: List[str], metadatas: List[dict]) -> int:
+        """Rewrite the metadata of already stored chunks in place; no re-embedding."""
+        if not chunks:
+            return 0
+        self._get(collection).update(
+            ids=self._make_ids(source_key, chunks), metadatas=[_clean_meta(m) for m in metadatas]
+        )
         return len(chunks)
 
-    def query(self, collection: str, query: str, k: int = 5) -> List[Dict]:
-        q_emb = self.embedder([query])[0]
+    def commit_source(self, collection: str, source_key: str, ids: List[str]) -> int:
+        """Record `ids` as the chunk set of `source_key` and delete its chunks not in it."""
+        if self.registry.is_tracked(collection, source_key):
+            old = self.registry.ids(collection, source_key)
+        else:
+            # Stored before the registry existed: chunks are found by their source metadata.
+            old = set(self.ids_where(collection, {"source": source_key}))
+        keep = set(ids)
+        stale = [i for i in old if i not in keep]
+        self.delete_ids(collection, stale)
+        self.registry.set_ids(collection, source_key, ids)
+        return len(stale)
+
+    def replace_source(
+        self,
+        collection: str,
+        source_key: str,
+        chunks: List[str],
+        metadatas: List[dict],
+    ) -> Dict[str, int]:
+        """
+        Embed and write only new chunks of `source_key`, refresh the metadata of kept chunks
+        that moved, then drop the ones no longer present.
+        """
+        ids, new_pos, stale_pos = self.diff_source(collection, source_key, chunks, metadatas)
+        if new_pos:
+            new_chunks = [chunks[p] for p in new_pos]
+            embs = self.chunk_embedder(new_chunks)
+            ids_by_pos = self._make_ids(source_key, new_chunks)
+            self.write(collection, ids_by_pos, new_chunks, [metadatas[p] for p in new_pos], embs)
+        updated = self.update_metadata(collection, source_key, [chunks[p] for p in stale_pos], [metadatas[p] for p in stale_pos])
+        deleted = self.commit_source(collection, source_key, ids)
+        return {"chunks": len(ids), "written": len(new_pos), "kept": len(ids) - len(new_pos),
+                "meta_updated": updated, "deleted": deleted}
+
+    def remove_source(self, collection: str, source_key: str) -> int:
+        """Delete every chunk of `source_key`."""
+        deleted = self.commit_source(collection, source_key, [])
+        self.registry.remove_source(collection, source_key)
+        return deleted
+
+    def ids_where(self, collection: str, where: dict) -> List[str]:
+        return self._get(collection).get(where=where, include=[])["ids"]
+
+    def delete_ids(self, collection: str, ids: List[str]) -> None:
+        if ids:
+            self._get(collection).delete(ids=ids)
+            self.lexical(collection).delete(ids)
+            self.registry.remove_ids(collection, ids)
+
+    def delete_where(self, collection: str, where: dict) -> None:
+        self.delete_ids(collection, self.ids_where(collection, where))
+
+    def compact(self, collection: str, purge: bool = False, page_size: int = 1000) -> Dict[str, Any]:
+        """
+        Report (and with purge=True delete) orphaned chunks: chunks whose source is tracked
+        by the registry but which are no longer part of that source's chunk set. Chunks of
+        untracked (legacy) sources are only counted. Registry rows pointing at chunks that
+        are missing from the collection are dropped.
+        """
+        coll = self._get(collection)
+        tracked = self.registry.sources(collection)
+        registered = self.registry.all_ids(collection)
+        orphans, untracked, stored, offset = [], 0, set(), 0
+        while True:
+            page = coll.get(include=["metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            for cid, meta in zip(page["ids"], page["metadatas"]):
+                stored.add(cid)
+                if cid in registered:
+                    continue
+                source = cid.rsplit(":", 1)[0]
+                if source in tracked or (meta or {}).get("source") in tracked:
+                    orphans.append(cid)
+                else:
+                    untracked += 1
+            offset += len(page["ids"])
+        dangling = [cid for cid in registered if cid not in stored]
+        if purge:
+            for i in range(0, len(orphans), page_size):
+                self.delete_ids(collection, orphans[i:i + page_size])
+            self.registry.remove_ids(collection, dangling)
+            self.lexical(collection).merge()
+        report = {
+            "collection": collection,
+            "chunks": len(stored),
+            "tracked_sources": len(tracked),
+            "orphans": len(orphans),
+            "untracked_chunks": untracked,
+            "dangling_registry_rows": len(dangling),
+            "purged": purge,
+        }
+        logger.info("Compaction %s", report)
+        return report
+
+    def query(self, collection: str, query: str, k: int = 5, mode: str = "dense", q_emb: Optional[List[float]] = None) -> List[Dict]:
+        """
+        mode="dense": vector search (score = distance, lower is better).
+        mode="lexical": BM25 only, no embedding call (good for "JIRA-1234" / identifiers).
+        mode="hybrid": reciprocal rank fusion of both lists.
+        Every result has "score" where lower is better.
+        """
+        if mode == "lexical":
+            return self._lexical_query(collection, query, k)
+        if mode == "hybrid":
+            return self._hybrid_query(collection, query, k, q_emb=q_emb)
+        if q_emb is None:
+            q_emb = self.query_embedder(query)
         coll = self._get(collection)
         res = coll.query(query_embeddings=[q_emb], n_results=k, include=["documents","metadatas","distances"])
         docs = []
-        for d, m, s in zip(res.get("documents", [[]])[0], res.get("metadatas", [[]])[0], res.get("distances", [[]])[0]):
-            docs.append({"text": d, "meta": m, "score": float(s)})
+        for i, d, m, s in zip(res.get("ids", [[]])[0], res.get("documents", [[]])[0], res.get("metadatas", [[]])[0], res.get("distances", [[]])[0]):
+            docs.append({"id": i, "text": d, "meta": m, "score": float(s)})
         return docs
+
+    def _fetch(self, collection: str, ids: List[str]) -> Dict[str, Dict]:
+        if not ids:
+            return {}
+        res = self._get(collection).get(ids=ids, include=["documents", "metadatas"])
+        return {i: {"id": i, "text": d, "meta": m} for i, d, m in zip(res["ids"], res["documents"], res["metadatas"])}
+
+    def _lexical_query(self, collection: str, query: str, k: int) -> List[Dict]:
+        hits = self.lexical(collection).search(query, k)
+        found = self._fetch(collection, [i for i, _ in hits])
+        return [{**found[i], "bm25": s, "score": 1.0 / (1.0 + s)} for i, s in hits if i in found]
+
+    def _hybrid_query(self, collection: str, query: str, k: int, depth: int = 50, q_emb: Optional[List[float]] = None) -> List[Dict]:
+        n = max(k, depth)
+        dense = self.query(collection, query, k=n, mode="dense", q_emb=q_emb)
+        lexical = self.lexical(collection).search(query, n)
+        fused: Dict[str, float] = {}
+        for rank, d in enumerate(dense):
+            fused[d["id"]] = fused.get(d["id"], 0.0) + 1.0 / (RRF_K + rank + 1)
+        for rank, (i, _) in enumerate(lexical):
+            fused[i] = fused.get(i, 0.0) + 1.0 / (RRF_K + rank + 1)
+        top = sorted(fused.items(), key=lambda x: -x[1])[:k]
+        by_id = {d["id"]: d for d in dense}
+        by_id.update(self._fetch(collection, [i for i, _ in top if i not in by_id]))
+        best = 2.0 / (RRF_K + 1)  # rank 1 in both lists
+        return [{**by_id[i], "rrf": r, "score": 1.0 - r / best} for i, r in top if i in by_id]
+
+
+    def query_many(
+        self,
+        collections: Dict[str, int],
+        query: str,
+        mode: str = "dense",
+        timeout: Optional[float] = None,
+        q_emb: Optional[List[float]] = None,
+    ) -> Dict[str, List[Dict]]:
+        """
+        Embed `query` once (unless `q_emb` is given) and search every {collection: k} in parallel.
+        The `timeout` deadline covers the query embedding too. Collections that fail or miss it
+        are left out of the result; if the embedding itself misses it, hybrid search falls
+        back to lexical-only and dense search returns nothing.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if q_emb is None and mode != "lexical":
+            try:
+                # Left running on timeout: single-flight + the LRU keep its result for the next call.
+                q_emb = self._pool.submit(self.query_embedder, query).result(timeout=timeout)
+            except FutureTimeout:
+                logger.warning("Query embedding missed the %.1fs deadline", timeout)
+                if mode != "hybrid":
+                    return {}
+                mode = "lexical"
+        futures = {
+            self._pool.submit(self.query, name, query, k, mode, q_emb): name
+            for name, k in collections.items()
+        }
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        done, not_done = wait(futures, timeout=remaining)
+        out = {}
+        for fut in done:
+            name = futures[fut]
+            try:
+                out[name] = fut.result()
+            except Exception as e:
+                logger.warning("Query on collection %s failed: %s", name, e)
+        for fut in not_done:
+            logger.warning("Query on collection %s missed the %.1fs deadline", futures[fut], timeout)
+        return out
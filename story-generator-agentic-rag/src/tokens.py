@@ -0,0 +1,8 @@
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap local token estimate (~4 chars per token for English/code on Gemini tokenizers).
+    Good enough for batching and budgeting; never calls the API.
+    """
+    if not text:
+        return 0
+    return (len(text) + 3) // 4
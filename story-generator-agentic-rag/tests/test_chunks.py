@@ -0,0 +1,25 @@
+from src.chunks import iter_code_chunks
+
+
+def symbols(text, path, max_tokens=2048):
+    out = []
+    for c in iter_code_chunks(text, path, target_tokens=max_tokens, max_tokens=max_tokens):
+        out += [s for s in c.symbols if s not in out]
+    return out
+
+
+def test_one_line_definitions_keep_their_symbol():
+    js = "function f() { return 1; }\nconst g = () => { return 2; };\nfunction h() {\n  return 3;\n}\n"
+    assert symbols(js, "a.js") == ["f", "g", "h"]
+
+
+def test_one_line_methods_nest_under_their_class():
+    java = "class Box {\n  int get() { return v; }\n  void set(int x) { v = x; }\n}\n"
+    # Over max_tokens, so the class is split into its members.
+    assert symbols(java, "Box.java", max_tokens=8) == ["Box", "Box.get", "Box.set"]
+
+
+def test_regex_literals_do_not_open_blocks():
+    js = "const re = /\\{/g;\nfunction a(x) {\n  return x.replace(re, '');\n}\n"
+    found = symbols(js, "a.js")
+    assert "a" in found and not any(s.startswith("re.") for s in found)
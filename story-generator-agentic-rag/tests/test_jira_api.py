@@ -0,0 +1,153 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from src.jira_api import BULK_LIMIT, JiraClient
+
+
+class FakeJira:
+    """
+    Local stand-in for Jira Cloud's issue endpoints. `respond(path, body, n)` may return
+    (status, json_body, headers), or None for the default success reply; n counts requests.
+    "drop" closes the connection after reading the request, without any response.
+    """
+
+    def __init__(self, respond=None):
+        self.respond = respond
+        self.requests = []
+        self._lock = threading.Lock()
+        self._next_key = 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with fake._lock:
+                    fake.requests.append((self.path, body))
+                    n = len(fake.requests)
+                reply = fake.respond(self.path, body, n) if fake.respond else None
+                if reply == "drop":
+                    self.close_connection = True
+                    self.connection.close()
+                    return
+                status, payload, headers = reply or (201, fake.created(self.path, body), {})
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def key(self) -> str:
+        with self._lock:
+            self._next_key += 1
+            return f"PROJ-{self._next_key}"
+
+    def created(self, path, body):
+        if path.endswith("/bulk"):
+            return {"issues": [{"key": self.key()} for _ in body["issueUpdates"]], "errors": []}
+        return {"key": self.key()}
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def fake_jira():
+    servers = []
+
+    def start(respond=None):
+        servers.append(FakeJira(respond))
+        return servers[-1]
+
+    yield start
+    for s in servers:
+        s.close()
+
+
+def client(url, **kw):
+    return JiraClient(url, "me@example.com", "token", "PROJ", **kw)
+
+
+def subtasks(n):
+    return [{"fields": {"summary": f"task {i}"}} for i in range(n)]
+
+
+def test_retry_after_is_honoured(fake_jira):
+    def respond(path, body, n):
+        return (429, {}, {"Retry-After": "0.3"}) if n == 1 else None
+
+    jira = fake_jira(respond)
+    t0 = time.perf_counter()
+    res = client(jira.url).create_story({"title": "Login", "description": "OAuth2 login"}, create_subtasks=False)
+    assert time.perf_counter() - t0 >= 0.3
+    assert res["story_key"] == "PROJ-1"
+    assert len(jira.requests) == 2
+
+
+def test_503_gives_up_after_max_attempts(fake_jira):
+    jira = fake_jira(lambda path, body, n: (503, {}, {"Retry-After": "0"}))
+    assert client(jira.url, max_attempts=3).create_issues(subtasks(2)) == ["ERROR:503", "ERROR:503"]
+    assert len(jira.requests) == 3
+
+
+def test_bulk_requests_are_chunked_at_50(fake_jira):
+    jira = fake_jira()
+    keys = client(jira.url).create_issues(subtasks(2 * BULK_LIMIT + 20))
+    sizes = sorted(len(body["issueUpdates"]) for path, body in jira.requests)
+    assert all(path == "/rest/api/3/issue/bulk" for path, _ in jira.requests)
+    assert sizes == [20, BULK_LIMIT, BULK_LIMIT]
+    assert len(keys) == 120 and len(set(keys)) == 120
+
+
+def test_partial_bulk_errors_map_to_their_payloads(fake_jira):
+    def respond(path, body, n):
+        issues = body["issueUpdates"]
+        return (201, {
+            "issues": [{"key": f"PROJ-{i}"} for i in range(len(issues)) if i not in (1, 3)],
+            "errors": [{"failedElementNumber": 1, "status": 400}, {"failedElementNumber": 3, "status": 403}],
+        }, {})
+
+    jira = fake_jira(respond)
+    assert client(jira.url).create_issues(subtasks(5)) == ["PROJ-0", "ERROR:400", "PROJ-2", "ERROR:403", "PROJ-4"]
+
+
+def test_dropped_connection_after_send_is_not_retried(fake_jira):
+    # Jira may already have created the issues; a retry would duplicate them.
+    jira = fake_jira(lambda path, body, n: "drop")
+    with pytest.raises(requests.ConnectionError):
+        client(jira.url).create_issues(subtasks(3))
+    assert len(jira.requests) == 1
+
+
+def test_connect_errors_are_retried(fake_jira):
+    jira = fake_jira()
+    url = jira.url
+    jira.close()  # nothing listens on the port: the connection is refused before anything is sent
+    t0 = time.perf_counter()
+    with pytest.raises(requests.ConnectionError):
+        client(url, max_attempts=3).create_issues(subtasks(1))
+    assert time.perf_counter() - t0 >= 0.5  # two connect retries with backoff
+
+
+def test_null_story_keys_are_reported_as_errors(fake_jira):
+    def respond(path, body, n):
+        return (201, {"issues": [{"key": None}, {"key": "PROJ-7"}], "errors": []}, {})
+
+    jira = fake_jira(respond)
+    res = client(jira.url).create_stories([{"title": "a"}, {"title": "b"}], create_subtasks=False)
+    assert [(r["story_key"], r["error"]) for r in res] == [(None, "ERROR:missing"), ("PROJ-7", None)]